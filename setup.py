@@ -42,5 +42,5 @@ setup(
     packages=["tm2py"],
     include_package_data=True,
     install_requires=install_requires,
-    scripts=["bin/tm2py", "bin/get_test_data"],
+    scripts=["bin/tm2py", "bin/get_test_data", "bin/benchmark_omx"],
 )
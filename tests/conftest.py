@@ -0,0 +1,20 @@
+import sys
+from unittest.mock import MagicMock
+
+import pytest
+
+
+@pytest.fixture
+def mock_emme():
+    """Replace the INRO libraries with MagicMock if (and only if) Emme is not installed."""
+    try:
+        import inro.emme.database.emmebank
+    except ModuleNotFoundError:
+        sys.modules["inro.emme.database.emmebank"] = MagicMock()
+        sys.modules["inro.emme.network"] = MagicMock()
+        sys.modules["inro.emme.database.scenario"] = MagicMock()
+        sys.modules["inro.emme.database.matrix"] = MagicMock()
+        sys.modules["inro.emme.network.node"] = MagicMock()
+        sys.modules["inro.emme.desktop.app"] = MagicMock()
+        sys.modules["inro"] = MagicMock()
+        sys.modules["inro.modeller"] = MagicMock()
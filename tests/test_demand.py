@@ -0,0 +1,24 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+pytestmark = pytest.mark.usefixtures("mock_emme")
+
+
+def test_prepare_highway_demand_clears_read_cache(tmp_path):
+    """The OMX read cache should be cleared once the highway demand is prepared."""
+    from tm2py.components.demand.demand import PrepareHighwayDemand
+
+    controller = MagicMock(run_dir=str(tmp_path))
+    controller.config.emme.highway_database_path = "emmebank"
+    component = PrepareHighwayDemand(controller)
+    component._create_zero_matrix = MagicMock()
+    component._prepare_period_demand = MagicMock()
+    component.time_period_names = MagicMock(return_value=["am", "pm"])
+    component.run()
+
+    assert [c.args for c in component._prepare_period_demand.call_args_list] == [
+        ("am",),
+        ("pm",),
+    ]
+    controller.omx_read_cache.clear.assert_called_once_with()
@@ -0,0 +1,229 @@
+import os
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+pytestmark = pytest.mark.usefixtures("mock_emme")
+
+
+class _Matrix:
+    """Minimal stand-in for an Emme matrix with 10 x 10 (800 byte) data."""
+
+    def __init__(self, name):
+        self.name = name
+        self.timestamp = 0
+        self.reads = 0
+        self._data = np.zeros((10, 10))
+
+    def get_numpy_data(self, scenario_id):
+        self.reads += 1
+        return self._data.copy()
+
+    def set_numpy_data(self, data, scenario_id):
+        self.timestamp += 1
+        self._data = data.copy()
+
+
+def _matrix_cache(max_bytes=None, spill_dir=None, write_back=False):
+    from tm2py.emme.matrix import MatrixCache
+
+    matrices = {name: _Matrix(name) for name in ["a", "b", "c"]}
+    scenario = MagicMock()
+    scenario.emmebank.matrix.side_effect = matrices.get
+    cache = MatrixCache(
+        scenario, max_bytes=max_bytes, spill_dir=spill_dir, write_back=write_back
+    )
+    return cache, matrices
+
+
+def test_matrix_cache_lru_eviction():
+    """Least recently used matrices should be evicted over the budget."""
+    cache, matrices = _matrix_cache(max_bytes=1600)
+    cache.get_data("a")
+    cache.get_data("b")
+    cache.get_data("a")
+    cache.get_data("c")
+    # "b" is the least recently used and is evicted
+    assert cache.stats["hits"] == 1 and cache.stats["misses"] == 3
+    assert cache.stats["evictions"] == 1
+    assert cache.num_bytes == 1600
+    cache.get_data("b")
+    assert matrices["b"].reads == 2 and matrices["a"].reads == 1
+    # timestamp change invalidates the cached data
+    matrices["c"].timestamp += 1
+    cache.get_data("c")
+    assert matrices["c"].reads == 2
+
+
+def test_matrix_cache_pinned():
+    """Pinned matrices should not be evicted while in use."""
+    cache, matrices = _matrix_cache(max_bytes=800)
+    with cache.pinned("a"):
+        cache.get_data("a")
+        cache.get_data("b")
+        cache.set_data("c", np.ones((10, 10)))
+        # "b" is evicted, "a" is kept over the budget
+        assert cache.num_bytes == 1600 and cache.stats["evictions"] == 1
+        cache.get_data("a")
+        assert matrices["a"].reads == 1
+    # over budget entries are evicted once unpinned, "c" is least recently used
+    assert cache.num_bytes == 800 and cache.stats["evictions"] == 2
+    cache.get_data("a")
+    assert matrices["a"].reads == 1
+    # written data is re-read from the Emmebank
+    assert cache.get_data("c").sum() == 100 and matrices["c"].reads == 1
+
+
+def test_matrix_cache_spill(tmp_path):
+    """Evicted matrices should be spilled to file and invalidated by timestamp."""
+    cache, matrices = _matrix_cache(max_bytes=800, spill_dir=str(tmp_path))
+    cache.set_data("a", np.full((10, 10), 2.0))
+    cache.get_data("b")
+    assert len(list(tmp_path.iterdir())) == 1
+    data = cache.get_data("a")
+    assert isinstance(data, np.memmap) and data.sum() == 200
+    assert cache.stats["spill_hits"] == 1 and matrices["a"].reads == 0
+    matrices["a"].timestamp += 1
+    cache.get_data("a")
+    assert matrices["a"].reads == 1
+    cache.clear()
+    assert not list(tmp_path.iterdir())
+
+
+def test_matrix_cache_write_back():
+    """Dirty matrices should be written to the Emmebank on flush or eviction."""
+    cache, matrices = _matrix_cache(max_bytes=800, write_back=True)
+    cache.set_data("a", np.ones((10, 10)))
+    cache.set_data("a", cache.get_data("a") * 2)
+    assert matrices["a"].timestamp == 0 and cache.get_data("a").sum() == 200
+    cache.flush()
+    assert matrices["a"].timestamp == 1 and matrices["a"]._data.sum() == 200
+    cache.set_data("b", np.ones((10, 10)))
+    # "b" is written back when evicted
+    cache.get_data("c")
+    assert matrices["b"].timestamp == 1 and cache.stats["writes"] == 2
+    # Emmebank changes to dirty matrices cannot be merged
+    cache.set_data("c", np.ones((10, 10)))
+    matrices["c"].timestamp += 1
+    with pytest.raises(Exception):
+        cache.get_data("c")
+
+
+def test_omx_dtype_precision_report(tmp_path):
+    """Matrices written in float32 should be compared against float64."""
+    from tm2py.emme.matrix import OMXManager, omx_precision_report
+
+    data = np.random.default_rng(0).uniform(0, 100, (10, 10))
+    data[0, 0] = 0.0
+    for name, dtype in [("ref.omx", None), ("test.omx", "float32")]:
+        with OMXManager(str(tmp_path / name), "w", dtype=dtype) as omx_file:
+            omx_file.write_array(data.copy(), "time")
+    report = omx_precision_report(str(tmp_path / "ref.omx"), str(tmp_path / "test.omx"))
+    assert report["time"]["dtype"] == "float32"
+    assert 0 < report["time"]["max_rel_error"] < 1e-7
+    assert report["time"]["max_abs_error"] < 1e-5
+
+
+def test_omx_compression_benchmark(tmp_path):
+    """The compression and chunk settings should be applied to the HDF5 nodes.
+
+    Benchmark results should be sorted by total time (best first).
+    """
+    import tables
+    from tm2py.emme.matrix import OMXManager, benchmark_omx_settings
+
+    settings = [("zlib", 1, 1), ("blosc:lz4", 4, 16)]
+    results = benchmark_omx_settings(50, settings=settings, row_block=20)
+    assert [r["total_time"] for r in results] == sorted(
+        r["total_time"] for r in results
+    )
+    assert all(r["file_size"] > 0 for r in results)
+    tested = [(r["complib"], r["complevel"], r["chunk_rows"]) for r in results]
+    assert sorted(tested) == sorted(settings)
+
+    data = np.arange(50 * 40, dtype=np.float64).reshape(50, 40)
+    for complib, complevel, chunk_rows in settings:
+        file_path = str(tmp_path / f"{complib}_{complevel}_{chunk_rows}.omx")
+        with OMXManager(
+            file_path,
+            "w",
+            dtype="float32",
+            complib=complib,
+            complevel=complevel,
+            chunk_rows=chunk_rows,
+        ) as omx_file:
+            omx_file.write_array(data, "skim")
+        with tables.open_file(file_path) as hdf5_file:
+            node = hdf5_file.get_node("/data/skim")
+            assert node.filters.complib == complib
+            assert node.filters.complevel == complevel
+            assert node.chunkshape == (chunk_rows, 40)
+            assert node.dtype == np.float32
+        with OMXManager(file_path, "r") as omx_file:
+            block = omx_file.read_rows("skim", 10, 30)
+            assert block.shape == (20, 40)
+            assert np.array_equal(block, data[10:30])
+            assert np.array_equal(omx_file.read_rows("skim", 45), data[45:])
+
+
+def test_omx_read_cache(tmp_path):
+    """Arrays should be shared until evicted or the file is re-written."""
+    from tm2py.emme.matrix import OMXManager, OMXReadCache
+
+    file_path = str(tmp_path / "demand.omx")
+    with OMXManager(file_path, "w") as omx_file:
+        omx_file.write_array(np.ones((10, 10)), "da")
+        omx_file.write_array(np.ones((10, 10)), "sr2")
+    cache = OMXReadCache(max_bytes=1200)
+    data = cache.read(file_path, "da")
+    assert cache.read(file_path, "da") is data and not data.flags.writeable
+    assert cache.read(file_path, "sr2", "float32").dtype == np.float32
+    assert cache.stats == {"hits": 1, "misses": 2, "evictions": 0, "opens": 1}
+    cache.read(file_path, "sr2")
+    assert cache.stats["evictions"] == 1
+    cache.close_files()
+    with OMXManager(file_path, "a") as omx_file:
+        omx_file.write_array(np.full((10, 10), 2.0), "auto")
+    os.utime(file_path, (0, 1))
+    assert cache.read(file_path, "da").sum() == 100
+    assert cache.stats["opens"] == 2
+    cache.clear()
+
+
+def test_zone_mapping():
+    """Data should be mapped to the target zones, or raise if not in target."""
+    from tm2py.emme.matrix import ZoneMapping
+
+    data = np.arange(4.0).reshape(2, 2)
+    same = ZoneMapping([1, 2], [1, 2])
+    assert same.is_identity and same.apply(data) is data
+    prefix = ZoneMapping([1, 2], [1, 2, 3])
+    assert prefix.apply(data).tolist() == [[0, 1, 0], [2, 3, 0], [0, 0, 0]]
+    scatter = ZoneMapping([3, 1], [1, 2, 3])
+    assert scatter.apply(data).tolist() == [[3, 0, 2], [0, 0, 0], [1, 0, 0]]
+    with pytest.raises(Exception):
+        ZoneMapping([1, 4], [1, 2, 3])
+    with pytest.raises(Exception):
+        prefix.apply(np.zeros((3, 3)))
+
+
+def test_background_omx_writer(tmp_path):
+    """Queued files should be written by close, and writer errors raised."""
+    from tm2py.emme.matrix import BackgroundOMXWriter, OMXManager
+
+    with BackgroundOMXWriter(max_pending=1) as writer:
+        for period in ["am", "pm"]:
+            writer.submit(
+                str(tmp_path / f"{period}.omx"),
+                {"time": (np.ones((3, 3)), {"description": period})},
+                dtype="float32",
+                zone_numbers=[1, 2, 5],
+            )
+    with OMXManager(str(tmp_path / "pm.omx")) as omx_file:
+        assert omx_file.read("time").dtype == np.float32
+        assert list(omx_file.zone_numbers()) == [1, 2, 5]
+    writer = BackgroundOMXWriter()
+    writer.submit(str(tmp_path / "missing" / "am.omx"), {})
+    with pytest.raises(Exception):
+        writer.close()
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+pytestmark = pytest.mark.usefixtures("mock_emme")
+
+
+def _write_path_file(file_path, num_roots, num_leaves, paths):
+    """Write paths (list by root, leaf pair of lists of node IDs) to .ebp format"""
+    lengths = [len(path) for path in paths]
+    index = np.concatenate([[0], np.cumsum(lengths)]).astype(np.uint64)
+    with open(file_path, "wb") as paths_file:
+        np.array([0, 0, num_roots, num_leaves], dtype=np.uint64).tofile(paths_file)
+        index.tofile(paths_file)
+        np.array(sum(paths, []), dtype=np.uint32).tofile(paths_file)
+
+
+def test_path_file(tmp_path):
+    """Paths should be resolved from the memory mapped binary path file."""
+    from tm2py.emme.paths import PathFile
+
+    # roots 10, 11; leaves 20, 21, 22
+    paths = [[10, 5, 20], [], [10, 22], [11, 20], [11, 6, 7, 21], []]
+    file_path = str(tmp_path / "sp.ebp")
+    _write_path_file(file_path, 2, 3, paths)
+    with PathFile(file_path) as paths_file:
+        assert (paths_file.num_roots, paths_file.num_leaves) == (2, 3)
+        start, end = paths_file.path_slices([1, 0, 0, 1], [1, 0, 1, 2])
+        assert list(end - start) == [4, 3, 0, 0]
+        nodes = paths_file.path_nodes(start, end)
+    assert list(nodes) == [11, 6, 7, 21, 10, 5, 20]
+    # no paths in file
+    _write_path_file(file_path, 1, 1, [[]])
+    with PathFile(file_path) as paths_file:
+        start, end = paths_file.path_slices([0], [0])
+        assert len(paths_file.path_nodes(start, end)) == 0
+
+
+def test_read_text_paths(tmp_path):
+    """Text paths should be parsed in blocks of complete lines."""
+    from tm2py.emme.paths import read_text_paths
+
+    file_path = tmp_path / "sp.txt"
+    file_path.write_text("10 5 20\n10 22\n\n11 6 7 21\n11 20")
+    blocks = list(read_text_paths(str(file_path), block_size=7))
+    nodes = np.concatenate([block[0] for block in blocks])
+    lengths = np.concatenate([block[1] for block in blocks])
+    assert list(nodes) == [10, 5, 20, 10, 22, 11, 6, 7, 21, 11, 20]
+    assert list(lengths) == [3, 2, 4, 2]
@@ -0,0 +1,315 @@
+import json
+
+import pandas as pd
+import pytest
+
+pytestmark = pytest.mark.usefixtures("mock_emme")
+
+
+# SOLA traffic assignment report, as returned by the Emme tool
+_SOLA_REPORT = {
+    "type": "SOLA_TRAFFIC_ASSIGNMENT",
+    "iterations": [
+        {
+            "number": 0,
+            "time": 0.52,
+            "gaps": {"absolute": 105.1, "relative": 0.34, "normalized": 2.1},
+        },
+        {
+            "number": 1,
+            "time": 0.47,
+            "gaps": {"absolute": 10.3, "relative": 0.021, "normalized": 0.2},
+        },
+        {
+            "number": 2,
+            "time": 0.49,
+            "gaps": {"absolute": 0.2, "relative": 0.0004, "normalized": 0.01},
+        },
+    ],
+    "stopping_criterion": "RELATIVE_GAP",
+}
+
+
+def test_sola_convergence():
+    """The SOLA report should convert to the iterations and stopping reason."""
+    from tm2py.components.network.highway.highway_assign import _sola_convergence
+
+    convergence = _sola_convergence(_SOLA_REPORT)
+    assert convergence == {
+        "iterations": [
+            {"iteration": 0, "relative_gap": 0.34, "time": 0.52},
+            {"iteration": 1, "relative_gap": 0.021, "time": 0.47},
+            {"iteration": 2, "relative_gap": 0.0004, "time": 0.49},
+        ],
+        "stopping_reason": "relative_gap",
+    }
+    with pytest.raises(KeyError):
+        _sola_convergence({"iterations": [{"number": 0, "time": 0.1, "gaps": {}}]})
+
+
+def _convergence_records():
+    from tm2py.components.network.highway.highway_assign import _sola_convergence
+
+    return [
+        {
+            "global_iteration": 1,
+            "period": "am",
+            "backend": "emme",
+            "wall_time": 12.5,
+            **_sola_convergence(_SOLA_REPORT),
+        },
+        {
+            "global_iteration": 1,
+            "period": "pm",
+            "backend": "numpy",
+            "wall_time": 3.25,
+            "iterations": [
+                {"iteration": 0, "relative_gap": None, "time": 0.1},
+                {"iteration": 1, "relative_gap": 0.05, "time": 0.2},
+            ],
+            "stopping_reason": "max_iterations",
+        },
+    ]
+
+
+@pytest.mark.parametrize("extension", ["json", "csv"])
+def test_write_convergence_log(tmp_path, extension):
+    """The convergence records should be written as JSON, or as CSV by iteration."""
+    from tm2py.components.network.highway.highway_assign import HighwayAssignment
+
+    component = HighwayAssignment.__new__(HighwayAssignment)
+    component._convergence = _convergence_records()
+    file_path = str(tmp_path / "logs" / f"convergence.{extension}")
+    component._write_convergence_log(file_path)
+
+    if extension == "json":
+        with open(file_path, encoding="utf8") as log_file:
+            assert json.load(log_file) == component._convergence
+        return
+    data = pd.read_csv(file_path)
+    assert list(data.columns) == [
+        "global_iteration",
+        "period",
+        "backend",
+        "wall_time",
+        "stopping_reason",
+        "iteration",
+        "relative_gap",
+        "time",
+    ]
+    assert list(data["period"]) == ["am", "am", "am", "pm", "pm"]
+    assert list(data["iteration"]) == [0, 1, 2, 0, 1]
+    assert list(data["relative_gap"].fillna(-1)) == [0.34, 0.021, 0.0004, -1, 0.05]
+    assert (
+        list(data["stopping_reason"]) == ["relative_gap"] * 3 + ["max_iterations"] * 2
+    )
+    assert list(data["wall_time"]) == [12.5] * 3 + [3.25] * 2
+
+
+def _example_config(tmp_path, **highway):
+    """Example config with the highway Emmebank in tmp_path/run."""
+    import dataclasses
+    import os
+
+    from tm2py.config import Configuration
+
+    example_dir = os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "examples"
+    )
+    config = Configuration.load_toml(
+        [
+            os.path.join(example_dir, "scenario_config.toml"),
+            os.path.join(example_dir, "model_config.toml"),
+        ]
+    )
+    emme = dataclasses.replace(
+        config.emme,
+        highway_database_path="Database_highway/emmebank",
+        matrix_cache_spill_path="cache",
+        num_processors=4,
+    )
+    highway = dataclasses.replace(config.highway, **highway)
+    database_dir = tmp_path / "run" / "Database_highway"
+    database_dir.mkdir(parents=True)
+    (database_dir / "emmebank").write_bytes(b"emmebank")
+    (database_dir / "emmemat").mkdir()
+    (database_dir / "emmemat" / "mf1.emx").write_bytes(b"matrix")
+    return dataclasses.replace(config, emme=emme, highway=highway)
+
+
+@pytest.mark.parametrize("backend", ["emme", "numpy"])
+def test_period_worker_session(tmp_path, monkeypatch, backend):
+    """Each period worker should run on its own copy of the Emme database."""
+    import os
+    from unittest.mock import MagicMock
+
+    from tm2py.components.network.highway import highway_assign
+    from tm2py.components.network.highway.highway_assign import (
+        HighwayAssignment,
+        _period_worker,
+    )
+
+    config = _example_config(tmp_path, assignment_backend=backend)
+    run_dir = str(tmp_path / "run")
+    work_dir = str(tmp_path / "run" / "work_am")
+    os.mkdir(work_dir)
+
+    class _Controller:
+        def __init__(self, config_files, controller_run_dir):
+            assert config_files == ["config.toml"]
+            self.config = config
+            self.run_dir = controller_run_dir
+            self.top_sheet = None
+            self._iteration = None
+            self._emme_manager = None
+
+        @property
+        def iteration(self):
+            return self._iteration
+
+        @property
+        def emme_manager(self):
+            return self._emme_manager
+
+    emme_manager = MagicMock()
+    monkeypatch.setattr("tm2py.controller.RunController", _Controller)
+    monkeypatch.setattr(highway_assign, "EmmeManager", lambda: emme_manager)
+    runs = []
+
+    def _run_period(self, time, setup_network=True):
+        runs.append((time, setup_network, self._num_processors, self.config.emme))
+        assert self.controller.iteration == 2
+        assert self.controller.emme_manager is emme_manager
+        self.logger.log(f"assign {time}", level="INFO")
+        self._convergence.append({"period": time})
+
+    monkeypatch.setattr(HighwayAssignment, "_run_period", _run_period)
+    time, messages, convergence = _period_worker(
+        (["config.toml"], run_dir, 2, "am", 2, work_dir)
+    )
+
+    assert (time, messages, convergence) == (
+        "am",
+        [("assign am", "INFO")],
+        [{"period": "am"}],
+    )
+    copy_path = os.path.join(work_dir, "Database_highway", "emmebank")
+    with open(copy_path, "rb") as emmebank_file:
+        assert emmebank_file.read() == b"emmebank"
+    assert os.path.exists(
+        os.path.join(work_dir, "Database_highway", "emmemat", "mf1.emx")
+    )
+    ((_, setup_network, num_processors, emme_config),) = runs
+    assert not setup_network and num_processors == 2
+    assert emme_config.highway_database_path == copy_path
+    assert emme_config.matrix_cache_spill_path == os.path.join(work_dir, "matrix_cache")
+    if backend == "emme":
+        emme_manager.create_database_project.assert_called_once_with(
+            work_dir, "highway_am", copy_path
+        )
+        emme_manager.modeller.assert_called_once_with(
+            emme_manager.create_database_project.return_value
+        )
+    else:
+        emme_manager.create_database_project.assert_not_called()
+        emme_manager.modeller.assert_not_called()
+    emme_manager.close_all.assert_called_once_with()
+
+
+def test_copy_period_results(tmp_path):
+    """The link results and skims should be copied from the period database copy."""
+    import os
+    from unittest.mock import MagicMock
+
+    from tm2py.components.network.highway.highway_assign import (
+        AssignmentClass,
+        HighwayAssignment,
+    )
+
+    config = _example_config(tmp_path)
+    controller = MagicMock(config=config, run_dir=str(tmp_path / "run"))
+    emmebanks = {}
+    controller.emme_manager.emmebank.side_effect = lambda path: emmebanks.setdefault(
+        path, MagicMock()
+    )
+    component = HighwayAssignment.__new__(HighwayAssignment)
+    component._controller = controller
+    classes = [AssignmentClass(c, "am", 1) for c in config.highway.classes]
+    work_dir = str(tmp_path / "run" / "work_am")
+    component._copy_period_results("am", classes, work_dir)
+
+    main_bank = emmebanks[os.path.join(controller.run_dir, "Database_highway/emmebank")]
+    period_bank = emmebanks[os.path.join(work_dir, "Database_highway")]
+    scenario = main_bank.scenario.return_value
+    period_scenario = period_bank.scenario.return_value
+    period_bank.scenario.assert_called_once_with(scenario.id)
+    controller.emme_manager.copy_attr_values.assert_called_once_with(
+        "LINK",
+        period_scenario,
+        scenario,
+        ["volau", "timau"] + [f"@flow_{c.name}" for c in classes],
+    )
+    skim_names = [name for c in classes for name in c.skim_matrices]
+    assert skim_names
+    assert [c.args[0] for c in period_bank.matrix.call_args_list] == [
+        f'mf"{name}"' for name in skim_names
+    ]
+    set_data = scenario.emmebank.matrix.return_value.set_numpy_data
+    assert set_data.call_count == len(skim_names)
+    set_data.assert_called_with(
+        period_bank.matrix.return_value.get_numpy_data.return_value, scenario.id
+    )
+    period_bank.dispose.assert_called_once_with()
+
+
+def _fake_period_worker(args):
+    """Stand-in for _period_worker, run in the worker processes."""
+    import os
+
+    _, _, iteration, time, num_processors, work_dir = args
+    assert os.path.isdir(work_dir)
+    return time, [(f"{time} {iteration} {num_processors}", "INFO")], [{"period": time}]
+
+
+def test_run_period_workers(tmp_path, monkeypatch):
+    """Periods should run in worker processes, with results copied back in the main process."""
+    import os
+    from unittest.mock import MagicMock
+
+    from tm2py.components.network.highway import highway_assign
+    from tm2py.components.network.highway.highway_assign import HighwayAssignment
+    from tm2py.logger import BufferedLogger
+
+    config = _example_config(tmp_path, period_workers=2)
+    controller = MagicMock(config=config, run_dir=str(tmp_path / "run"), iteration=1)
+    controller.config_files = ["config.toml"]
+    controller.logger = BufferedLogger(controller)
+    component = HighwayAssignment.__new__(HighwayAssignment)
+    component._controller = controller
+    component._num_processors = 4
+    component._skim_matrices = []
+    component._convergence = []
+    copied = {}
+    monkeypatch.setattr(highway_assign, "_period_worker", _fake_period_worker)
+    monkeypatch.setattr(component, "_set_background_traffic", MagicMock())
+    monkeypatch.setattr(component, "_create_skim_matrices", MagicMock())
+    monkeypatch.setattr(
+        component,
+        "_copy_period_results",
+        lambda time, classes, work_dir: copied.update({time: (classes, work_dir)}),
+    )
+    periods = ["ea", "am", "md"]
+    component._run_period_workers(periods, 2)
+
+    assert component._set_background_traffic.call_count == 3
+    assert component._create_skim_matrices.call_count == 3
+    assert sorted(copied) == sorted(periods)
+    assert sorted(r["period"] for r in component._convergence) == sorted(periods)
+    messages = [text for text, _ in controller.logger.messages]
+    for time in periods:
+        assert f"[{time}] {time} 1 2" in messages
+        classes, work_dir = copied[time]
+        assert [c.time_period for c in classes] == [time] * len(classes)
+        # the period work directories are removed
+        assert os.path.dirname(work_dir) == str(tmp_path / "run")
+        assert not os.path.exists(work_dir)
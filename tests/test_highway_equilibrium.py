@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+
+pytestmark = pytest.mark.usefixtures("mock_emme")
+
+
+@pytest.mark.parametrize("algorithm", ["fw", "cfw"])
+def test_equilibrium_parallel_routes(algorithm):
+    """The used routes between two zones should have equal times at equilibrium."""
+    from tm2py.components.network.highway.highway_equilibrium import (
+        EquilibriumAssignment,
+    )
+
+    # zones 0 and 1, route via node 2 (BPR) and via node 3 (Akcelik)
+    links = np.array([[0, 2], [2, 1], [0, 3], [3, 1]])
+    assignment = EquilibriumAssignment(
+        np.array([1, 2, 100, 101]),
+        links[:, 0],
+        links[:, 1],
+        np.array([0, 1]),
+        free_flow_time=np.array([0.0, 10.0, 0.0, 12.0]),
+        capacity=np.array([0.0, 100.0, 0.0, 200.0]),
+        ja=np.array([0.0, 0.0, 0.0, 0.01]),
+        is_akcelik=np.array([False, False, False, True]),
+        period_hours=3.0,
+        background_flow=np.array([0.0, 20.0, 0.0, 0.0]),
+    )
+    demand = np.array([[0.0, 300.0], [0.0, 0.0]])
+    klass = assignment.add_class(
+        "da", np.ones(4, dtype=bool), np.array([0.0, 10.0, 0.0, 0.0]), 0.1, demand
+    )
+    gaps = assignment.run(max_iterations=200, relative_gap=1e-5, algorithm=algorithm)
+    assert gaps[-1] <= 1e-5 and assignment.stopping_reason == "relative_gap"
+    assert len(assignment.iteration_times) == len(gaps)
+    assert np.isclose(klass.flows[1] + klass.flows[3], 300.0)
+    route_costs = assignment.times + klass.link_cost
+    assert np.isclose(route_costs[1], route_costs[3], rtol=1e-3)
+    assert np.isclose(klass.cost_skim[0, 1], route_costs[1], rtol=1e-3)
+    assert klass.cost_skim[0, 0] == 0.0 and np.isinf(klass.cost_skim[1, 0])
+
+
+def test_equilibrium_warm_start():
+    """A warm start for a small demand change should take fewer iterations."""
+    from tm2py.components.network.highway.highway_equilibrium import (
+        EquilibriumAssignment,
+    )
+
+    rng = np.random.default_rng(1)
+    links = np.unique(rng.integers(0, 60, (600, 2)), axis=0)
+    links = links[links[:, 0] != links[:, 1]]
+    num_links = len(links)
+    demand = rng.random((10, 10)) * 1500
+    new_demand = demand + 0.05 * (rng.random((10, 10)) * 1500 - demand)
+
+    def _assign(class_demand, warm_start=None, initial_times=None):
+        assignment = EquilibriumAssignment(
+            np.arange(60) + 1,
+            links[:, 0],
+            links[:, 1],
+            np.arange(10),
+            np.linspace(1, 5, num_links),
+            np.full(num_links, 200.0),
+            np.full(num_links, 0.02),
+            np.arange(num_links) % 2 == 0,
+            3.0,
+        )
+        assignment.add_class(
+            "da",
+            np.ones(num_links, dtype=bool),
+            np.zeros(num_links),
+            0.1,
+            class_demand,
+            warm_start=warm_start,
+        )
+        assignment.run(300, 1e-2, initial_times=initial_times)
+        return assignment
+
+    previous = _assign(demand)
+    cold = _assign(new_demand)
+    warm = _assign(
+        new_demand, previous.classes[0].residual_flows, initial_times=previous.times
+    )
+    assert warm.gaps[-1] <= 1e-2 and cold.gaps[-1] <= 1e-2
+    assert len(warm.gaps) < len(cold.gaps)
+    assert (warm.classes[0].flows >= 0).all()
+
+
+def test_equilibrium_no_analyses():
+    """A class without path analyses (e.g. an empty skims list) should assign."""
+    from tm2py.components.network.highway.highway_equilibrium import (
+        EquilibriumAssignment,
+    )
+
+    links = np.array([[0, 2], [2, 1], [1, 3], [3, 0]])
+    assignment = EquilibriumAssignment(
+        np.array([1, 2, 100, 101]),
+        links[:, 0],
+        links[:, 1],
+        np.array([0, 1]),
+        free_flow_time=np.array([1.0, 2.0, 3.0, 4.0]),
+        capacity=np.full(4, 100.0),
+        ja=np.zeros(4),
+        is_akcelik=np.zeros(4, dtype=bool),
+        period_hours=1.0,
+    )
+    demand = np.array([[0.0, 50.0], [20.0, 0.0]])
+    classes = [
+        assignment.add_class(
+            name, np.ones(4, dtype=bool), np.zeros(4), 0.0, demand, values
+        )
+        for name, values in [("da", np.array([])), ("sr2", np.empty((0, 4)))]
+    ]
+    assignment.run(max_iterations=5, relative_gap=0.0)
+    for klass in classes:
+        assert klass.analysis_skims.shape == (0, 2, 2)
+        assert np.allclose(klass.flows, [50.0, 50.0, 20.0, 20.0])
@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+
+pytestmark = pytest.mark.usefixtures("mock_emme")
+
+
+@pytest.fixture
+def graph():
+    """Small network: 0 -> 1 -> 2 -> 3 (direct) and 1 -> 4 -> 3 (detour)"""
+    from tm2py.components.network.highway.highway_graph import HighwayGraph
+
+    node_ids = np.array([10, 11, 12, 13, 14])
+    node_xy = np.array([[0.0, 0.0], [1.0, 0.0], [2.0, 0.0], [3.0, 0.0], [2.0, 5.0]])
+    links = np.array([[0, 1], [1, 2], [2, 3], [1, 4], [4, 3], [3, 2]])
+    costs = np.array([1.0, 1.0, 1.0, 2.0, 2.0, 1.0])
+    return HighwayGraph(node_ids, node_xy, links[:, 0], links[:, 1], costs)
+
+
+def test_graph_lookups(graph):
+    """Node and link indices should be found by node ID and node index pair."""
+    assert list(graph.node_index([14, 10, 99])) == [4, 0, -1]
+    assert list(graph.link_index([1, 3, 0], [4, 2, 3])) == [3, 5, -1]
+
+
+def test_assign_flow(graph):
+    """Demand should be assigned along the shortest paths."""
+    flows, assigned, not_assigned = graph.assign_flow(
+        np.array([0, 0, 1]), np.array([3, 2, 3]), np.array([1.0, 2.0, 4.0])
+    )
+    assert assigned == 7.0 and not_assigned == 0.0
+    assert list(flows) == [3.0, 7.0, 5.0, 0.0, 0.0, 0.0]
+
+
+def test_assign_flow_terminal_and_radius():
+    """Paths should not pass through terminal nodes or outside the radius."""
+    from tm2py.components.network.highway.highway_graph import HighwayGraph
+
+    node_ids = np.array([10, 11, 12, 13, 14])
+    node_xy = np.array([[0.0, 0.0], [1.0, 0.0], [2.0, 0.0], [3.0, 0.0], [2.0, 5.0]])
+    links = np.array([[0, 1], [1, 2], [2, 3], [1, 4], [4, 3], [3, 2]])
+    costs = np.array([1.0, 1.0, 1.0, 2.0, 2.0, 1.0])
+    terminal = np.array([True, False, True, True, False])
+    graph = HighwayGraph(node_ids, node_xy, links[:, 0], links[:, 1], costs, terminal)
+    flows, assigned, _ = graph.assign_flow(
+        np.array([0]), np.array([3]), np.array([1.0])
+    )
+    assert assigned == 1.0
+    assert list(flows) == [1.0, 0.0, 0.0, 1.0, 1.0, 0.0]
+    # node 4 is outside of the radius, no path available
+    flows, assigned, not_assigned = graph.assign_flow(
+        np.array([0]), np.array([3]), np.array([1.0]), radius=3.5
+    )
+    assert assigned == 0.0 and not_assigned == 1.0
+    assert not flows.any()
+
+
+def test_path_links(graph):
+    """Paths given as node ID sequences should map to the link indices."""
+    links, path_pos = graph.path_links(
+        np.array([10, 11, 14, 13, 11, 12, 13, 12]), np.array([4, 3, 1])
+    )
+    assert list(links) == [0, 3, 4, 1, 2]
+    assert list(path_pos) == [0, 0, 0, 1, 1]
+    links, _ = graph.path_links(np.array([10, 12]), np.array([2]))
+    assert list(links) == [-1]
+
+
+def test_shortest_path_skims():
+    """Path costs and link value sums should be skimmed from the roots."""
+    from tm2py.components.network.highway.highway_graph import HighwayGraph
+
+    node_ids = np.array([10, 11, 12, 13, 14])
+    node_xy = np.array([[0.0, 0.0], [1.0, 0.0], [2.0, 0.0], [3.0, 0.0], [2.0, 5.0]])
+    links = np.array([[0, 1], [1, 2], [2, 3], [1, 4], [4, 3], [3, 2], [3, 0]])
+    costs = np.array([1.0, 1.0, 1.0, 2.0, 2.0, 1.0, 1.0])
+    terminal = np.array([True, False, True, True, False])
+    graph = HighwayGraph(node_ids, node_xy, links[:, 0], links[:, 1], costs, terminal)
+    values = np.array([costs * 2, np.ones(7)])
+    root_pos, leaf_pos, skim_costs, sums = graph.shortest_path_skims(
+        np.array([0, 3]), np.array([0, 2, 3]), values, max_cost=5.5
+    )
+    # 0 -> 2 direct, 0 -> 3 via 4 (2 is terminal), 3 -> 0 and 3 -> 2 direct
+    assert list(root_pos) == [0, 0, 1, 1]
+    assert list(leaf_pos) == [1, 2, 0, 1]
+    assert list(skim_costs) == [2.0, 5.0, 1.0, 1.0]
+    assert list(sums[0]) == [4.0, 10.0, 2.0, 2.0]
+    assert list(sums[1]) == [2.0, 3.0, 1.0, 1.0]
+    # 0 -> 3 is over the max cost
+    root_pos, leaf_pos, _, _ = graph.shortest_path_skims(
+        np.array([0]), np.array([2, 3]), values, max_cost=4.5
+    )
+    assert list(leaf_pos) == [0]
+
+
+def test_all_or_nothing(graph):
+    """Demand should be loaded on the shortest path trees, with path skims."""
+    flows, costs, sums = graph.all_or_nothing(
+        np.array([0, 1]),
+        np.array([1, 2, 3]),
+        np.array([[5.0, 1.0, 2.0], [9.0, 4.0, 0.0]]),
+        np.array([np.ones(6)]),
+    )
+    # root == leaf demand (1 -> 1) is not assigned
+    assert list(flows) == [8.0, 7.0, 2.0, 0.0, 0.0, 0.0]
+    assert costs.tolist() == [[1.0, 2.0, 3.0], [0.0, 1.0, 2.0]]
+    assert sums[0].tolist() == [[1.0, 2.0, 3.0], [0.0, 1.0, 2.0]]
@@ -0,0 +1,112 @@
+import itertools
+
+import numpy as np
+import pytest
+
+pytestmark = pytest.mark.usefixtures("mock_emme")
+
+
+def test_adaptive_bin_edges():
+    """Adaptive bins should cover all origins at the min estimated cost."""
+    from tm2py.components.network.highway.highway_maz import (
+        adaptive_bin_edges,
+        bin_search_cost,
+    )
+
+    max_dists = np.round(np.random.default_rng(0).exponential(1.0, 150), 2)
+    bin_edges = adaptive_bin_edges(max_dists, 3)
+    assert bin_edges[0] == 0.0 and len(bin_edges) <= 4
+    assert (max_dists < bin_edges[-1]).all()
+    # compare with all combinations of up to 3 edges on the 0.05 mile grid
+    candidates = np.arange(1, int(bin_edges[-1] / 0.05) + 1) * 0.05
+    min_cost = min(
+        bin_search_cost(max_dists, [0.0] + list(edges) + [bin_edges[-1]])
+        for num_bins in [0, 1, 2]
+        for edges in itertools.combinations(candidates[:-1], num_bins)
+    )
+    assert bin_search_cost(max_dists, bin_edges) <= min_cost * (1 + 1e-9)
+    assert adaptive_bin_edges(np.zeros(0), 3) == [0.0]
+
+
+def test_maz_skim_writer(tmp_path):
+    """MAZ skims should be written in chunks to csv and npz."""
+    from tm2py.components.network.highway.highway_maz import MAZSkimWriter
+
+    chunks = [
+        {
+            "FROM_ZONE": np.array([1.0, 1.0]),
+            "TO_ZONE": np.array([2.0, 3.0]),
+            "COST": np.array([0.5, 1.5]),
+            "DISTANCE": np.array([0.25, 0.75]),
+            "BRIDGETOLL": np.array([0.0, 0.0]),
+        },
+        {
+            "FROM_ZONE": np.array([2.0]),
+            "TO_ZONE": np.array([1.0]),
+            "COST": np.array([0.5]),
+            "DISTANCE": np.array([0.25]),
+            "BRIDGETOLL": np.array([1.0]),
+        },
+    ]
+    with MAZSkimWriter(str(tmp_path / "skim.csv"), "csv") as writer:
+        for chunk in chunks:
+            writer.write(chunk)
+    lines = (tmp_path / "skim.csv").read_text().splitlines()
+    assert lines[0] == "FROM_ZONE, TO_ZONE, COST, DISTANCE, BRIDGETOLL"
+    assert lines[1:] == [
+        "1.0,2.0,0.5,0.25,0.0",
+        "1.0,3.0,1.5,0.75,0.0",
+        "2.0,1.0,0.5,0.25,1.0",
+    ]
+    with MAZSkimWriter(str(tmp_path / "skim.npz"), "npz") as writer:
+        for chunk in chunks:
+            writer.write(chunk)
+    with np.load(tmp_path / "skim.npz") as data:
+        assert list(data["FROM_ZONE"]) == [1, 1, 2]
+        assert data["TO_ZONE"].dtype == np.int32
+        assert list(data["BRIDGETOLL"]) == [0.0, 0.0, 1.0]
+        assert data["COST"].dtype == np.float32
+    assert [path.name for path in tmp_path.iterdir()] == ["skim.csv", "skim.npz"]
+    # no rows: empty columns of the saved types
+    with MAZSkimWriter(str(tmp_path / "empty.npz"), "npz", dtype="float16"):
+        pass
+    with np.load(tmp_path / "empty.npz") as data:
+        assert data["FROM_ZONE"].shape == (0,)
+        assert data["FROM_ZONE"].dtype == np.int32
+        assert data["DISTANCE"].dtype == np.float16
+    # partial output is not written after an error
+    for file_format in ["csv", "npz"]:
+        file_path = str(tmp_path / f"error.{file_format}")
+        with pytest.raises(ValueError):
+            with MAZSkimWriter(file_path, file_format) as writer:
+                writer.write(chunks[0])
+                raise ValueError("skim failed")
+        assert not (tmp_path / f"error.{file_format}").exists()
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "empty.npz",
+        "skim.csv",
+        "skim.npz",
+    ]
+
+
+def test_maz_demand_read_cache(tmp_path):
+    """MAZ demand should be read through the shared OMX read cache."""
+    from unittest.mock import MagicMock
+
+    from tm2py.components.network.highway.highway_maz import AssignMAZSPDemand
+    from tm2py.emme.matrix import OMXManager, OMXReadCache
+
+    data = np.arange(16, dtype=np.float64).reshape(4, 4)
+    with OMXManager(str(tmp_path / "maz_am_1.omx"), "w") as omx_file:
+        omx_file.write_array(data, "M0")
+    controller = MagicMock(run_dir=str(tmp_path))
+    controller.config.highway.maz_to_maz.demand_file = "maz_{period}_{number}.omx"
+    controller.omx_read_cache = OMXReadCache()
+    component = AssignMAZSPDemand.__new__(AssignMAZSPDemand)
+    component._controller = controller
+
+    demand = component._read_demand_array("am", 1)
+    assert np.array_equal(demand, data) and not demand.flags.writeable
+    assert component._read_demand_array("am", 1) is demand
+    assert controller.omx_read_cache.stats["hits"] == 1
+    controller.omx_read_cache.clear()
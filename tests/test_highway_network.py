@@ -0,0 +1,182 @@
+import os
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+pytestmark = pytest.mark.usefixtures("mock_emme")
+
+EXAMPLE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "examples"
+)
+TEST_CONFIG = os.path.join(EXAMPLE_DIR, "scenario_config.toml")
+MODEL_CONFIG = os.path.join(EXAMPLE_DIR, "model_config.toml")
+
+
+@pytest.fixture
+def prepare_network(tmp_path):
+    from tm2py.config import Configuration
+    from tm2py.components.network.highway.highway_network import PrepareNetwork
+
+    config = Configuration.load_toml([TEST_CONFIG, MODEL_CONFIG])
+    controller = MagicMock()
+    controller.config = config
+    controller.run_dir = str(tmp_path)
+    periods = [tp.name for tp in config.time_periods]
+    src_groups = config.highway.tolls.src_vehicle_group_names
+    columns = [f"toll{p}_{v}" for p in periods for v in src_groups]
+    rng = np.random.default_rng(0)
+    with open(
+        os.path.join(str(tmp_path), config.highway.tolls.file_path), "w"
+    ) as toll_file:
+        toll_file.write(",".join(["fac_index"] + columns) + "\n")
+        for booth in range(1, 20):
+            for seg in range(0, 3):
+                index = booth * 1000 + seg * 10 + 1
+                values = [f"{v:.2f}" for v in rng.uniform(0, 8, len(columns))]
+                toll_file.write(",".join([str(index)] + values) + "\n")
+    return PrepareNetwork(controller)
+
+
+def _random_links(component, num_links=500):
+    rng = np.random.default_rng(42)
+    config = component.config
+    capclasses = [row.capclass for row in config.highway.capclass_lookup]
+    links = {name: np.zeros(num_links) for name in component._link_attribute_names()}
+    links["length"] = rng.uniform(0.01, 3.0, num_links)
+    links["@capclass"] = rng.choice(capclasses, num_links).astype(float)
+    links["@lanes"] = rng.choice([0.0, 0.5, 1, 2, 3, 12], num_links)
+    links["@ft"] = rng.choice([1, 2, 3, 4, 5, 6, 7, 8, 99], num_links).astype(float)
+    links["@free_flow_speed"] = rng.choice([0.0, 25.0, 40.0, 65.0], num_links)
+    links["@free_flow_speed"][links["@capclass"] == 0] = 0.0
+    links["@tollbooth"] = rng.choice([0, 0, 0, 2, 5, 11, 15, 25], num_links)
+    links["@tollseg"] = rng.choice([0, 1, 2], num_links).astype(float)
+    links["@useclass"] = rng.choice([0, 1, 2, 3, 4], num_links).astype(float)
+    return links
+
+
+def _link_index(num_links):
+    """Emme LINK index with link position k from node 1000 + k to 2000 + k."""
+    return {1000 + k: {2000 + k: k} for k in range(num_links)}
+
+
+def _reference_link_values(component, links, time_period):
+    """Per-link implementation of the link attribute calculations."""
+    config = component.config
+    toll_index = {}
+    toll_file_path = component.get_abs_path(config.highway.tolls.file_path)
+    with open(toll_file_path, "r", encoding="UTF8") as toll_file:
+        header = next(toll_file).strip().split(",")
+        for line in toll_file:
+            data = dict(zip(header, line.split(",")))
+            toll_index[int(data["fac_index"])] = data
+    tolls = config.highway.tolls
+    capacity_map = {r.capclass: r.capacity for r in config.highway.capclass_lookup}
+    critical_speed_map = {
+        r.capclass: r.critical_speed for r in config.highway.capclass_lookup
+    }
+    factor = {tp.name: tp.highway_capacity_factor for tp in config.time_periods}[
+        time_period
+    ]
+    results = []
+    for i in range(len(links["length"])):
+        link = {name: values[i] for name, values in links.items()}
+        if link["@tollbooth"]:
+            index = (
+                link["@tollbooth"] * 1000 + link["@tollseg"] * 10 + link["@useclass"]
+            )
+            data_row = toll_index.get(index)
+            if data_row is not None:
+                for src_veh, dst_veh in zip(
+                    tolls.src_vehicle_group_names, tolls.dst_vehicle_group_names
+                ):
+                    toll = float(data_row[f"toll{time_period}_{src_veh}"])
+                    if link["@tollbooth"] < tolls.tollbooth_start_index:
+                        link[f"@bridgetoll_{dst_veh}"] = toll * 100
+                    else:
+                        link[f"@valuetoll_{dst_veh}"] = toll * link["length"] * 100
+        link["@capacity"] = capacity_map[link["@capclass"]] * factor * link["@lanes"]
+        link["volume_delay_func"] = int(link["@ft"])
+        if link["volume_delay_func"] == 99:
+            link["volume_delay_func"] = 7
+        link["num_lanes"] = max(min(9.9, link["@lanes"]), 1.0)
+        if (
+            link["volume_delay_func"] in [3, 4, 5, 7, 8, 10, 11, 12, 13, 14]
+            and link["@free_flow_speed"] > 0
+        ):
+            t_c = link["length"] / critical_speed_map[link["@capclass"]]
+            t_o = link["length"] / link["@free_flow_speed"]
+            link["@ja"] = 16 * (t_c - t_o) ** 2
+        link["@hov_length"] = link["length"] if 2 <= link["@useclass"] <= 3 else 0
+        link["@toll_length"] = (
+            link["length"] if link["@tollbooth"] > tolls.tollbooth_start_index else 0
+        )
+        for assign_class in config.highway.classes:
+            toll_factor = assign_class.toll_factor or 1.0
+            toll_value = sum(link[attr] for attr in assign_class.toll)
+            link[f"@cost_{assign_class.name.lower()}"] = (
+                link["length"] * assign_class.operating_cost_per_mile
+                + toll_value * toll_factor
+            )
+        results.append(link)
+    return results
+
+
+def test_link_attribute_arrays_match_per_link(prepare_network):
+    """Array link attribute calculations should be identical to per-link calculations."""
+    for time_period in ["am", "ev"]:
+        links = _random_links(prepare_network)
+        expected = _reference_link_values(prepare_network, links, time_period)
+        prepare_network._set_tolls(links, _link_index(500), time_period)
+        prepare_network._set_vdf_attributes(links, time_period)
+        prepare_network._calc_link_skim_lengths(links)
+        prepare_network._calc_link_class_costs(links)
+        for name, values in links.items():
+            ref_values = np.array([link[name] for link in expected], dtype=float)
+            assert np.array_equal(values, ref_values), f"{name} differs"
+        assert links["@bridgetoll_da"].any() and links["@valuetoll_da"].any()
+
+
+def test_set_tolls_failed_lookup_trace(prepare_network):
+    """Failed toll index lookups should be logged with the link ID."""
+    links = {name: np.zeros(3) for name in prepare_network._link_attribute_names()}
+    links["@tollbooth"][:] = [2, 0, 25]
+    links["@tollseg"][:] = [0, 0, 1]
+    links["@useclass"][:] = [1, 0, 4]
+    prepare_network._set_tolls(links, _link_index(3), "am")
+
+    trace = [
+        c.args[0]
+        for c in prepare_network.logger.log.call_args_list
+        if c.kwargs.get("level") == "TRACE"
+    ]
+    assert trace == ["set tolls failed index lookup 25014.0, link 1002-2002"]
+
+
+def test_set_tolls_blank_cells(prepare_network):
+    """Blank cells in the toll file should be no toll, not NaN."""
+    config = prepare_network.config
+    tolls = config.highway.tolls
+    periods = [tp.name for tp in config.time_periods]
+    columns = [f"toll{p}_{v}" for p in periods for v in tolls.src_vehicle_group_names]
+    blank = f"tollam_{tolls.src_vehicle_group_names[1]}"
+    toll_file_path = prepare_network.get_abs_path(tolls.file_path)
+    with open(toll_file_path, "a") as toll_file:
+        for index in [2001, 25021]:
+            values = ["" if name == blank else "1.50" for name in columns]
+            toll_file.write(",".join([str(index)] + values) + "\n")
+    links = {name: np.zeros(2) for name in prepare_network._link_attribute_names()}
+    links["length"][:] = 2.0
+    links["@tollbooth"][:] = [2, 25]
+    links["@tollseg"][:] = [0, 2]
+    links["@useclass"][:] = [1, 1]
+    prepare_network._set_tolls(links, _link_index(2), "am")
+
+    for name, values in links.items():
+        assert not np.isnan(values).any(), f"{name} is NaN"
+    # booth 2 is a bridge toll and booth 25 is a value toll
+    assert 2 < tolls.tollbooth_start_index <= 25
+    for i, dst_veh in enumerate(tolls.dst_vehicle_group_names):
+        toll = 0.0 if i == 1 else 150.0
+        assert links[f"@bridgetoll_{dst_veh}"][0] == toll
+        assert links[f"@valuetoll_{dst_veh}"][1] == toll * 2.0
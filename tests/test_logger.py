@@ -0,0 +1,38 @@
+import pickle
+
+import pytest
+
+pytestmark = pytest.mark.usefixtures("mock_emme")
+
+
+def test_buffered_logger_replay():
+    """Messages collected by a BufferedLogger should be logged in order by another Logger."""
+    from tm2py.logger import BufferedLogger, Logger
+
+    class _ListLogger(Logger):
+        def __init__(self, controller):
+            super().__init__(controller)
+            self.records = []
+
+        def log(self, text, level="INFO"):
+            self.records.append((text, level))
+
+    worker_logger = BufferedLogger(None)
+    with worker_logger.log_start_end("assign period", level="STATUS"):
+        worker_logger.log("relative gap 1e-4", level="DEBUG")
+        worker_logger.log_time("skims done", level="DETAIL")
+    messages = worker_logger.messages
+    assert [level for _, level in messages] == ["STATUS", "DEBUG", "DETAIL", "STATUS"]
+    assert messages[0][0].endswith("Start assign period")
+    assert messages[1][0] == "relative gap 1e-4"
+    # indented within the start / end context
+    assert messages[2][0].endswith(":   skims done")
+    assert messages[3][0].endswith("End assign period")
+
+    # the messages are returned from the worker process by pickling
+    messages = pickle.loads(pickle.dumps(messages))
+    logger = _ListLogger(None)
+    logger.log_messages(messages, prefix="[am] ")
+    assert logger.records == [(f"[am] {text}", level) for text, level in messages]
+    logger.log_messages([])
+    assert len(logger.records) == len(messages)
@@ -105,3 +105,132 @@ def test_highway():
     assert (
         count_different_lines == 0
     ), f"HWYSKIM_MAZMAZ_DA.csv differs on {count_different_lines} lines"
+
+
+@pytest.mark.skipci
+def test_maz_shortest_path_backends():
+    """MAZ-to-MAZ assignment with the numpy backend should match the Emme results."""
+    import dataclasses
+    import numpy as np
+    from tm2py.controller import RunController
+    from tm2py.components.network.highway.highway_maz import AssignMAZSPDemand
+    from tm2py.emme.network import get_attribute_arrays
+    from tm2py.examples import get_example
+
+    union_city_root = os.path.join(os.getcwd(), _EXAMPLES_DIR, "UnionCity")
+    get_example(
+        example_name="UnionCity", example_subdir=_EXAMPLES_DIR, root_dir=os.getcwd()
+    )
+    controller = RunController(
+        [
+            os.path.join(_EXAMPLES_DIR, r"scenario_config.toml"),
+            os.path.join(_EXAMPLES_DIR, r"model_config.toml"),
+        ],
+        run_dir=union_city_root,
+    )
+    maz_flows = {}
+    for backend in ["emme", "numpy"]:
+        highway = controller.config.highway
+        maz_to_maz = dataclasses.replace(
+            highway.maz_to_maz, shortest_path_backend=backend
+        )
+        controller.config = dataclasses.replace(
+            controller.config,
+            highway=dataclasses.replace(highway, maz_to_maz=maz_to_maz),
+        )
+        component = AssignMAZSPDemand(controller)
+        component.run()
+        for time in component.time_period_names():
+            scenario = component.get_emme_scenario(
+                controller.config.emme.highway_database_path, time
+            )
+            _, values = get_attribute_arrays(scenario, "LINK", ["@maz_flow"])
+            maz_flows[(backend, time)] = values["@maz_flow"]
+    for time in component.time_period_names():
+        emme_flow, numpy_flow = maz_flows[("emme", time)], maz_flows[("numpy", time)]
+        assert np.isclose(emme_flow.sum(), numpy_flow.sum(), rtol=1e-6), time
+        assert np.allclose(emme_flow, numpy_flow, rtol=1e-4, atol=1e-3), time
+
+
+@pytest.mark.skipci
+def test_highway_assignment_backends():
+    """Highway assignment with the numpy backend should be close to the Emme results.
+
+    The network is prepared as in the initial components, then the MAZ-to-MAZ
+    and highway assignments are run as in global iteration 1, with the
+    demand from the example demand files. The link flows agree to the
+    assignment convergence. The skims are compared on average only, as SOLA
+    averages over all used paths while the numpy backend skims the shortest
+    path.
+    """
+    import dataclasses
+    import numpy as np
+    import openmatrix as _omx
+    from tm2py.controller import RunController
+    from tm2py.components.network.highway.highway_assign import HighwayAssignment
+    from tm2py.components.network.highway.highway_maz import AssignMAZSPDemand
+    from tm2py.components.network.highway.highway_network import PrepareNetwork
+    from tm2py.emme.network import get_attribute_arrays
+    from tm2py.examples import get_example
+
+    union_city_root = os.path.join(os.getcwd(), _EXAMPLES_DIR, "UnionCity")
+    get_example(
+        example_name="UnionCity", example_subdir=_EXAMPLES_DIR, root_dir=os.getcwd()
+    )
+    controller = RunController(
+        [
+            os.path.join(_EXAMPLES_DIR, r"scenario_config.toml"),
+            os.path.join(_EXAMPLES_DIR, r"model_config.toml"),
+        ],
+        run_dir=union_city_root,
+    )
+    # pylint: disable=protected-access
+    controller._iteration = 0
+    PrepareNetwork(controller).run()
+    controller._iteration = 1
+    AssignMAZSPDemand(controller).run()
+    flows = {}
+    skims = {}
+    for backend in ["emme", "numpy"]:
+        controller.config = dataclasses.replace(
+            controller.config,
+            highway=dataclasses.replace(
+                controller.config.highway, assignment_backend=backend
+            ),
+        )
+        component = HighwayAssignment(controller)
+        component.run()
+        for time in component.time_period_names():
+            scenario = component.get_emme_scenario(
+                controller.config.emme.highway_database_path, time
+            )
+            demand = sum(
+                scenario.emmebank.matrix(f'mf"{time}_{klass.name}"')
+                .get_numpy_data(scenario.id)
+                .sum()
+                for klass in controller.config.highway.classes
+            )
+            assert demand > 0, f"no {time} demand"
+            _, values = get_attribute_arrays(scenario, "LINK", ["volau"])
+            flows[(backend, time)] = values["volau"]
+            omx_path = component.get_abs_path(
+                controller.config.highway.output_skim_path.format(period=time)
+            )
+            with _omx.open_file(omx_path) as omx_file:
+                for name in omx_file.list_matrices():
+                    if name.endswith("_time"):
+                        skims[(backend, name)] = omx_file[name].read()
+    for time in component.time_period_names():
+        emme_flow, numpy_flow = flows[("emme", time)], flows[("numpy", time)]
+        assert emme_flow.sum() > 0, time
+        assert np.isclose(emme_flow.sum(), numpy_flow.sum(), rtol=1e-2), time
+        assert np.allclose(emme_flow, numpy_flow, rtol=5e-2, atol=5.0), time
+    for backend, name in list(skims):
+        if backend != "emme":
+            continue
+        emme_skim, numpy_skim = skims[("emme", name)], skims[("numpy", name)]
+        available = (emme_skim < 1e19) & (numpy_skim < 1e19)
+        assert np.array_equal(emme_skim < 1e19, numpy_skim < 1e19), name
+        assert np.isclose(
+            emme_skim[available].mean(), numpy_skim[available].mean(), rtol=5e-2
+        ), name
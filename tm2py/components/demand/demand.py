@@ -2,39 +2,77 @@
 
 from __future__ import annotations
 from abc import ABC
-from typing import Dict, Union, List, TYPE_CHECKING
+from typing import Dict, List, Tuple, TYPE_CHECKING
 import numpy as np
 
 from tm2py.components.component import Component
-from tm2py.emme.matrix import OMXManager
+from tm2py.emme.matrix import ZoneMapping
 
 if TYPE_CHECKING:
     from tm2py.controller import RunController
 
+NumpyArray = np.array
+
+# self-regulated averaging: increment to the step size denominator if the
+# change in demand increased / decreased from the previous iteration
+_SRA_INCREASE = 1.5
+_SRA_DECREASE = 0.5
+
 
 class PrepareDemand(Component, ABC):
-    """Abstract base class to import and average demand."""
+    """Abstract base class to import and average demand.
+
+    The demand is averaged with the previous iteration demand by one of the
+    schemes, with step size for iteration k:
+        - "msa": method of successive averages, 1 / k
+        - "fixed": fixed step size (averaging_step)
+        - "weighted": weighted by iteration number, 2 / (k + 1)
+        - "self_regulated": 1 / beta_k, where beta_k increases by 1.5 if the
+            change in demand from the previous demand increased from the
+            last iteration, otherwise by 0.5 (starting as 1 / k)
+
+    Subclasses set averaging_scheme and averaging_step from the config.
+    """
 
     def __init__(self, controller: RunController):
         super().__init__(controller)
         self._emmebank = None
+        self.averaging_scheme = "msa"
+        self.averaging_step = 0.5
+        # self_regulated state by matrix name: (beta, norm of change in demand)
+        self._sra_state = {}
+        # ZoneMapping by (source zones, target zones)
+        self._zone_mappings = {}
 
-    def _read(self, path, name, num_zones, factor=None):
-        with OMXManager(path, "r") as omx_file:
-            demand = omx_file.read(name)
-        if factor is not None:
-            demand = factor * demand
-        demand = self._redim_demand(demand, num_zones)
-        return demand
-
-    @staticmethod
-    def _redim_demand(demand, num_zones):
-        _shape = demand.shape
-        if _shape != (num_zones, num_zones):
-            demand = np.pad(
-                demand, ((0, num_zones - _shape[0]), (0, num_zones - _shape[1]))
-            )
-        return demand
+    def _zone_mapping(
+        self, path: str, demand: NumpyArray, zone_numbers: List[int]
+    ) -> ZoneMapping:
+        """Return the ZoneMapping from the OMX file zones to the Emme zones.
+
+        The OMX zones are from the zone_number mapping in the file, if not
+        available the OMX zones are assumed to be the leading Emme zones.
+
+        Args:
+            path: path of the OMX file
+            demand: demand array read from the file
+            zone_numbers: the Emme scenario zone numbers
+        """
+        source_zones = self.controller.omx_read_cache.zone_numbers(path)
+        if source_zones is None:
+            if len(demand) > len(zone_numbers):
+                raise Exception(
+                    f"{path}: {len(demand)} zones in demand and no zone_number "
+                    f"mapping, but only {len(zone_numbers)} zones in Emme"
+                )
+            source_zones = zone_numbers[: len(demand)]
+        source_zones = np.asarray(source_zones)
+        target_zones = np.asarray(zone_numbers)
+        key = (source_zones.tobytes(), target_zones.tobytes())
+        if key not in self._zone_mappings:
+            self._zone_mappings[key] = ZoneMapping(source_zones, target_zones)
+        mapping = self._zone_mappings[key]
+        mapping.check_shape(demand)
+        return mapping
 
     # Disable too many arguments recommendation
     # pylint: disable=R0913
@@ -51,10 +89,66 @@ class PrepareDemand(Component, ABC):
             if not matrix:
                 raise Exception(f"error averaging demand: matrix {name} does not exist")
             prev_demand = matrix.get_numpy_data(scenario.id)
-            demand = prev_demand + (1.0 / msa_iteration) * (demand - prev_demand)
+            demand = self._average_demand(name, prev_demand, demand, msa_iteration)
+            demand = demand.astype(self.config.emme.matrix_dtype, copy=False)
 
         matrix.set_numpy_data(demand, scenario.id)
 
+    def _average_demand(
+        self, name: str, prev_demand: NumpyArray, demand: NumpyArray, iteration: int
+    ) -> NumpyArray:
+        """Average the demand with the previous demand, in place.
+
+        Computes prev_demand + step * (demand - prev_demand) into prev_demand,
+        using demand as the work array (overwritten if writeable), so no full
+        matrix temporaries are allocated.
+
+        Args:
+            name: name of the demand matrix (for the self_regulated state)
+            prev_demand: previous iteration demand, updated in place
+            demand: new demand
+            iteration: the current iteration number (> 1)
+
+        Returns:
+            The averaged demand (prev_demand)
+        """
+        if not demand.flags.writeable:
+            demand = demand.copy()
+        diff = np.subtract(demand, prev_demand, out=demand)
+        step = self._averaging_step(name, diff, iteration)
+        np.multiply(diff, step, out=diff)
+        np.add(prev_demand, diff, out=prev_demand)
+        return prev_demand
+
+    def _averaging_step(self, name: str, diff: NumpyArray, iteration: int) -> float:
+        """Return the averaging step size for the scheme and iteration.
+
+        Args:
+            name: name of the demand matrix
+            diff: the change from the previous demand
+            iteration: the current iteration number (> 1)
+        """
+        if self.averaging_scheme == "msa":
+            return 1.0 / iteration
+        if self.averaging_scheme == "fixed":
+            return self.averaging_step
+        if self.averaging_scheme == "weighted":
+            return 2.0 / (iteration + 1)
+        if self.averaging_scheme == "self_regulated":
+            flat_diff = diff.reshape(-1)
+            norm = float(np.sqrt(np.dot(flat_diff, flat_diff)))
+            # start as MSA if no state from the previous iteration
+            beta, prev_norm = self._sra_state.get(name, (iteration - 1, None))
+            if prev_norm is None:
+                beta += 1
+            elif norm >= prev_norm:
+                beta += _SRA_INCREASE
+            else:
+                beta += _SRA_DECREASE
+            self._sra_state[name] = (beta, norm)
+            return 1.0 / beta
+        raise Exception(f"invalid demand averaging scheme: {self.averaging_scheme}")
+
     def _create_zero_matrix(self):
         zero_matrix = self._emmebank.matrix('ms"zero"')
         if zero_matrix is None:
@@ -70,8 +164,10 @@ class PrepareHighwayDemand(PrepareDemand):
 
     Demand is imported from OMX files based on reference file paths and OMX
     matrix names in highway assignment config (highway.classes).
-    The demand is average using MSA with the current demand matrices
-    (in the Emmebank) if the controller.iteration > 1.
+    Each file is read once per period for all classes.
+    The demand is averaged with the current demand matrices (in the
+    Emmebank) if the controller.iteration > 1, using the
+    highway.demand_averaging scheme (default MSA).
 
     Args:
         controller: parent RunController object
@@ -80,6 +176,8 @@ class PrepareHighwayDemand(PrepareDemand):
     def __init__(self, controller: RunController):
         super().__init__(controller)
         self._emmebank_path = None
+        self.averaging_scheme = self.config.highway.demand_averaging
+        self.averaging_step = self.config.highway.demand_averaging_step
 
     # @LogStartEnd("prepare highway demand")
     def run(self):
@@ -88,46 +186,105 @@ class PrepareHighwayDemand(PrepareDemand):
         self._emmebank = self.controller.emme_manager.emmebank(self._emmebank_path)
         self._create_zero_matrix()
         for time in self.time_period_names():
-            for klass in self.config.highway.classes:
-                self._prepare_demand(klass.name, klass.description, klass.demand, time)
-
-    def _prepare_demand(
-        self,
-        name: str,
-        description: str,
-        demand_config: List[Dict[str, Union[str, float]]],
-        time_period: str,
-    ):
-        """Load demand from OMX files and save to Emme matrix for highway assignment.
+            self._prepare_period_demand(time)
+        omx_read_cache = self.controller.omx_read_cache
+        omx_read_cache.log_stats(self.logger)
+        # release the files for writing by the demand models, and the arrays
+        # for the assignment (the entries are stale in the next iteration)
+        omx_read_cache.clear()
 
+    def _prepare_period_demand(self, time_period: str):
+        """Load demand from OMX files and save to Emme matrices for highway assignment.
+
+        The demand for all classes is read in one pass over the files (see
+        _plan_demand_reads), and summed in place into one array per class.
         Average with previous demand (MSA) if the current iteration > 1
 
         Args:
-            name (str): the name of the highway assignment class
-            description (str): the description for the highway assignment class
-            demand_config (dict): the list of file cross-reference(s) for the demand to be loaded
-                {"source": <name of demand model component>,
-                 "name": <OMX key name>,
-                 "factor": <factor to apply to demand in this file>}
             time_period (str): the time time_period ID (name)
         """
         scenario = self.get_emme_scenario(self._emmebank_path, time_period)
-        num_zones = len(scenario.zone_numbers)
-        demand = self._read_demand(demand_config[0], time_period, num_zones)
-        for file_config in demand_config[1:]:
-            demand = demand + self._read_demand(file_config, time_period, num_zones)
-        demand_name = f"{time_period}_{name}"
-        description = f"{time_period} {description} demand"
-        self._save_demand(demand_name, demand, scenario, description, apply_msa=True)
-
-    def _read_demand(self, file_config, time_period, num_zones):
-        # Load demand from cross-referenced source file,
-        # the named demand model component under the key highway_demand_file
-        source = file_config["source"]
-        name = file_config["name"].format(period=time_period.upper())
-        factor = file_config.get("factor")
-        path = self.get_abs_path(self.config[source].highway_demand_file)
-        return self._read(path.format(period=time_period), name, num_zones, factor)
+        zone_numbers = scenario.zone_numbers
+        num_zones = len(zone_numbers)
+        classes = self.config.highway.classes
+        demand = [
+            np.zeros((num_zones, num_zones), dtype=self.config.emme.matrix_dtype)
+            for _ in classes
+        ]
+        for path, references in self._plan_demand_reads(time_period).items():
+            for class_index, name, factor in references:
+                data = self.controller.omx_read_cache.read(
+                    path, name, self.config.emme.matrix_dtype
+                )
+                mapping = self._zone_mapping(path, data, zone_numbers)
+                _add_demand(demand[class_index], data, mapping, factor)
+        for klass, class_demand in zip(classes, demand):
+            demand_name = f"{time_period}_{klass.name}"
+            description = f"{time_period} {klass.description} demand"
+            self._save_demand(
+                demand_name, class_demand, scenario, description, apply_msa=True
+            )
+
+    def _plan_demand_reads(
+        self, time_period: str
+    ) -> Dict[str, List[Tuple[int, str, float]]]:
+        """Group the demand references for all classes by file.
+
+        Args:
+            time_period (str): the time time_period ID (name)
+
+        Returns:
+            Dictionary of file path to list of (class index, OMX key name, factor)
+            to read from that file, in order of first reference in the config
+        """
+        plan = {}
+        for class_index, klass in enumerate(self.config.highway.classes):
+            for file_config in klass.demand:
+                # Load demand from cross-referenced source file,
+                # the named demand model component under the key highway_demand_file
+                source = file_config["source"]
+                name = file_config["name"].format(period=time_period.upper())
+                factor = file_config.get("factor")
+                path = self.get_abs_path(self.config[source].highway_demand_file)
+                path = path.format(period=time_period)
+                plan.setdefault(path, []).append((class_index, name, factor))
+        return plan
+
+
+def _add_demand(
+    demand: NumpyArray,
+    data: NumpyArray,
+    mapping: ZoneMapping,
+    factor: float = None,
+    block_rows: int = 256,
+):
+    """Add factored data to the demand array in place.
+
+    If the data zones are the leading demand zones (see ZoneMapping) it is
+    added to the top left, with the factor applied in blocks of rows to
+    limit the size of the temporary. Otherwise the data is added to the
+    mapped zone positions.
+
+    Args:
+        demand: array to add to (in the target zone system)
+        data: array to add (in the source zone system)
+        mapping: ZoneMapping from the data to the demand zones
+        factor: optional, factor to apply to the data
+        block_rows: number of rows per block to apply the factor
+    """
+    if factor == 1.0:
+        factor = None
+    rows, cols = mapping.index
+    if not isinstance(rows, slice):
+        demand[rows, cols] += data if factor is None else factor * data
+        return
+    if factor is None:
+        np.add(demand[rows, cols], data, out=demand[rows, cols])
+        return
+    for start in range(0, len(data), block_rows):
+        stop = min(start + block_rows, len(data))
+        block = demand[start:stop, cols]
+        block += factor * data[start:stop]
 
 
 # class PrepareTransitDemand(PrepareDemand):
@@ -6,6 +6,45 @@ The assignmend is configured using the "highway" table in the source config.
 See the config documentation for details. The traffic assignment runs according
 to the list of assignment classes under highway.classes.
 
+The traffic assignment uses the Emme SOLA assignment (default), or the
+Numpy / SciPy equilibrium assignment in memory (see highway_equilibrium), as
+specified by highway.assignment_backend. Both backends read the same Emme
+assignment specification and save the same network attributes and skim
+matrices, but the skims are not computed the same way: SOLA averages the
+path analyses over all used paths weighted by the path proportions, while
+the Numpy backend sums them on the shortest path at the final link times.
+The network flows agree to the assignment convergence; the skims differ
+where demand is split over several paths.
+
+The skims for each period are exported to OMX in a background thread while
+the next period is assigned, up to highway.output_skim_queue_size periods
+of skims are held in memory for export.
+
+With the "numpy" backend and highway.warm_start_path, the assignment from
+the second global iteration on starts from the previous global iteration
+solution (the saved residual class flows and link times), and the number
+of iterations compared to the last cold start is reported.
+
+The convergence of each period assignment (the relative gap and run time
+per iteration, the total run time and the stopping reason), from the SOLA
+assignment report or the Numpy assignment, is logged as a summary table at
+the end of each global iteration, and written to
+highway.convergence_log_path (.json or .csv) for all global iterations.
+
+The time periods are assigned one after another, or concurrently in
+highway.period_workers worker processes. Each worker runs one period in a
+separate Emme session: the highway Emme database is copied to a work
+directory for the period, and with the "emme" backend the worker creates
+its own Emme project (Desktop and Modeller) on the copy, with the "numpy"
+backend it opens the copy with the Emmebank API only. The background
+traffic and skim matrices are set up in the main process before the copy,
+and the assigned link results (volau, timau and @flow_XX) and the skim
+matrices are copied back from the period copy to the highway Emmebank in
+the main process, so that only the main process writes to the highway
+Emmebank. The worker log messages are collected and logged in the main
+process as each period completes. Each worker process is used for one
+period only (Emme Modeller is initialized once per process).
+
 Other relevant parameters from the config are
     emme.num_processors: number of processors as integer or "MAX" or "MAX-N"
     time_periods[].emme_scenario_id: Emme scenario number to use for each period
@@ -17,6 +56,8 @@ The Emme network must have the following attributes available:
     - "vdf", volume delay function (volume delay functions must also be setup)
     - "@useclass", vehicle-class restrictions classification, auto-only, HOV only
     - "@free_flow_time", the free flow time (in minutes)
+    - "@capacity" and "@ja", the capacity and Akcelik delay parameter (used
+        with highway.assignment_backend="numpy")
     - "@tollXX_YY", the toll for period XX and class subgroup (see truck
         class) named YY, used together with @tollbooth to generate @bridgetoll_YY
         and @valuetoll_YY
@@ -40,19 +81,38 @@ The Emme network must have the following attributes available:
 
 from __future__ import annotations
 from contextlib import contextmanager as _context
+import dataclasses
+import json
+import multiprocessing
 import os
-from typing import Dict, Union, List, TYPE_CHECKING
+import shutil
+import tempfile
+import time as _time
+from typing import Any, Dict, Union, List, Set, Tuple, TYPE_CHECKING
 
 import numpy as np
+import pandas as pd
 
 from tm2py.components.component import Component
 from tm2py.components.demand.demand import PrepareHighwayDemand
-from tm2py.emme.manager import EmmeScenario
-from tm2py.emme.matrix import MatrixCache, OMXManager
-from tm2py.emme.network import NetworkCalculator
-from tm2py.logger import LogStartEnd
+from tm2py.components.network.highway.highway_equilibrium import (
+    EquilibriumAssignment,
+)
+from tm2py.components.network.highway.highway_network import _akcelik_vdfs
+from tm2py.emme.manager import EmmeManager, EmmeScenario
+from tm2py.emme.matrix import BackgroundOMXWriter, MatrixCache, OMXManager
+from tm2py.emme.network import (
+    NetworkCalculator,
+    get_attribute_arrays,
+    link_index_ids,
+    node_index_ids,
+    set_attribute_arrays,
+)
+from tm2py.logger import BufferedLogger, LogStartEnd
 from tm2py import tools
 
+NumpyArray = np.array
+
 if TYPE_CHECKING:
     from tm2py.controller import RunController
 
@@ -82,6 +142,95 @@ if TYPE_CHECKING:
     ]
 
 
+def _period_worker(
+    args: Tuple[List[str], str, int, str, int, str]
+) -> Tuple[str, List[Tuple[str, str]], List[Dict[str, Any]]]:
+    """Run the highway assignment for one time period in a worker process.
+
+    The highway Emme database is copied to the work_dir, and the worker has
+    its own RunController using the copy, with an Emme project (Desktop and
+    Modeller) on the copy for the "emme" backend, or an EmmeManager without
+    an Emme project (the Emmebank is opened directly) for the "numpy"
+    backend, and a BufferedLogger to collect the log messages. The period
+    background traffic and skim matrices must already be set up by the main
+    process, see HighwayAssignment._run_period_workers.
+
+    Args:
+        args: tuple of
+            config_files: the config file paths of the model run
+            run_dir: root run directory for the model run
+            iteration: current global iteration
+            time_period: time period name
+            num_processors: number of processors for the Emme assignment
+            work_dir: directory for the period copy of the Emme database
+
+    Returns:
+        The time period name, the list of (text, level) log messages from
+        the worker, and the list of convergence records (see
+        HighwayAssignment._run_period).
+    """
+    # pylint: disable=import-outside-toplevel, protected-access
+    from tm2py.controller import RunController
+
+    config_files, run_dir, iteration, time_period, num_processors, work_dir = args
+    controller = RunController(config_files, run_dir)
+    controller._iteration = iteration
+    controller.logger = BufferedLogger(controller)
+    emme_config = controller.config.emme
+    emmebank_path = _copy_database(
+        os.path.join(run_dir, emme_config.highway_database_path), work_dir
+    )
+    spill_path = emme_config.matrix_cache_spill_path
+    if spill_path is not None:
+        # spilled matrix file names are only unique within a process
+        spill_path = os.path.join(work_dir, "matrix_cache")
+    controller.config = dataclasses.replace(
+        controller.config,
+        emme=dataclasses.replace(
+            emme_config,
+            highway_database_path=emmebank_path,
+            matrix_cache_spill_path=spill_path,
+        ),
+    )
+    emme_manager = EmmeManager()
+    controller._emme_manager = emme_manager
+    try:
+        if controller.config.highway.assignment_backend == "emme":
+            project = emme_manager.create_database_project(
+                work_dir, f"highway_{time_period}", emmebank_path
+            )
+            emme_manager.modeller(project)
+        component = HighwayAssignment(controller)
+        component._num_processors = num_processors
+        component._run_period(time_period, setup_network=False)
+    finally:
+        emme_manager.close_all()
+    return time_period, controller.logger.messages, component._convergence
+
+
+def _copy_database(emmebank_path: str, work_dir: str) -> str:
+    """Copy the Emme database directory of the Emmebank to the work_dir.
+
+    Args:
+        emmebank_path: path to the Emmebank file or its database directory
+        work_dir: directory to copy the database directory into
+
+    Returns:
+        The path to the Emmebank file of the copy
+    """
+    database_dir = _database_dir(emmebank_path)
+    copy_dir = os.path.join(work_dir, os.path.basename(database_dir))
+    shutil.copytree(database_dir, copy_dir)
+    return os.path.join(copy_dir, "emmebank")
+
+
+def _database_dir(emmebank_path: str) -> str:
+    """Return the Emme database directory for the Emmebank file or directory path."""
+    if os.path.basename(emmebank_path) == "emmebank":
+        return os.path.dirname(emmebank_path)
+    return emmebank_path
+
+
 class HighwayAssignment(Component):
     """Highway assignment and skims.
     Args:
@@ -95,68 +244,243 @@ class HighwayAssignment(Component):
         )
         self._matrix_cache = None
         self._skim_matrices = []
+        self._skim_writer = None
+        # kept across iterations for the demand averaging state
+        self._demand = PrepareHighwayDemand(controller)
+        # convergence records for all periods and global iterations
+        self._convergence = []
 
     @LogStartEnd("Highway assignment and skims", level="STATUS")
     def run(self):
         """Run highway assignment"""
-        demand = PrepareHighwayDemand(self.controller)
-        demand.run()
-        for time in self.time_period_names():
-            scenario = self.get_emme_scenario(
-                self.config.emme.highway_database_path, time
-            )
-            with self._setup(scenario, time):
-                iteration = self.controller.iteration
-                assign_classes = [
-                    AssignmentClass(c, time, iteration)
-                    for c in self.config.highway.classes
-                ]
-                if iteration > 0:
-                    self._copy_maz_flow(scenario)
-                else:
-                    self._reset_background_traffic(scenario)
-                self._create_skim_matrices(scenario, assign_classes)
-                assign_spec = self._get_assignment_spec(assign_classes)
-                # self.logger.log_dict(assign_spec, level="DEBUG")
+        self._demand.run()
+        periods = self.time_period_names()
+        num_workers = min(self.config.highway.period_workers, len(periods))
+        if num_workers > 1:
+            self._run_period_workers(periods, num_workers)
+        else:
+            self._run_periods(periods)
+        self._report_convergence()
+
+    def _run_periods(self, periods: List[str]):
+        """Run the assignment for the time periods one after another.
+
+        The skims are exported in a background thread, see _export_skims.
+
+        Args:
+            periods: list of time period names
+        """
+        queue_size = self.config.highway.output_skim_queue_size
+        if queue_size > 0:
+            self._skim_writer = BackgroundOMXWriter(max_pending=queue_size)
+        try:
+            for time in periods:
+                self._run_period(time)
+        finally:
+            if self._skim_writer is not None:
+                with self.logger.log_start_end(
+                    "Wait for background skim export", level="DETAIL"
+                ):
+                    self._skim_writer.close()
+                self._skim_writer = None
+
+    def _run_period_workers(self, periods: List[str], num_workers: int):
+        """Run the assignment for the time periods concurrently in worker processes.
+
+        The background traffic and skim matrices are set up first for all
+        periods, such that the workers do not create (and allocate IDs for)
+        matrices, then each period is run on a copy of the Emme database
+        (see _period_worker) and the results are copied back to the highway
+        Emmebank as each period completes (see _copy_period_results).
+
+        Args:
+            periods: list of time period names
+            num_workers: number of worker processes
+        """
+        iteration = self.controller.iteration
+        emmebank_path = self.get_abs_path(self.config.emme.highway_database_path)
+        assign_classes = {}
+        for time in periods:
+            scenario = self.get_emme_scenario(emmebank_path, time)
+            self._set_background_traffic(scenario)
+            assign_classes[time] = [
+                AssignmentClass(c, time, iteration) for c in self.config.highway.classes
+            ]
+            self._create_skim_matrices(scenario, assign_classes[time])
+        self._skim_matrices = []
+        num_processors = max(1, self._num_processors // num_workers)
+        self.logger.log(
+            f"Assign {len(periods)} periods in {num_workers} workers with "
+            f"{num_processors} processors each",
+            level="DETAIL",
+        )
+        work_root = os.path.dirname(_database_dir(emmebank_path))
+        work_dirs = {
+            time: tempfile.mkdtemp(prefix=f"highway_{time}_", dir=work_root)
+            for time in periods
+        }
+        # one period per process: Emme Modeller is initialized once per process,
+        # and the process exit releases the Emme project and Emmebank copy
+        pool = multiprocessing.Pool(num_workers, maxtasksperchild=1)
+        try:
+            worker_args = [
+                (
+                    self.controller.config_files,
+                    self.controller.run_dir,
+                    iteration,
+                    time,
+                    num_processors,
+                    work_dirs[time],
+                )
+                for time in periods
+            ]
+            for time, messages, convergence in pool.imap_unordered(
+                _period_worker, worker_args
+            ):
+                self.logger.log_messages(messages, prefix=f"[{time}] ")
+                self._convergence.extend(convergence)
+                self._copy_period_results(time, assign_classes[time], work_dirs[time])
+                self.logger.log_time(
+                    f"Highway assignment for period {time} complete", level="INFO"
+                )
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+            for work_dir in work_dirs.values():
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+    def _copy_period_results(
+        self, time: str, assign_classes: List[AssignmentClass], work_dir: str
+    ):
+        """Copy the link results and skim matrices from the period database copy.
+
+        Args:
+            time: time period name
+            assign_classes: list of AssignmentClass objects for the period
+            work_dir: work directory of the period database copy
+        """
+        emme_manager = self.controller.emme_manager
+        emmebank_path = self.get_abs_path(self.config.emme.highway_database_path)
+        scenario = self.get_emme_scenario(emmebank_path, time)
+        database_name = os.path.basename(_database_dir(emmebank_path))
+        period_emmebank = emme_manager.emmebank(os.path.join(work_dir, database_name))
+        try:
+            period_scenario = period_emmebank.scenario(scenario.id)
+            link_attrs = ["volau", "timau"] + [
+                klass.emme_highway_class_spec["results"]["link_volumes"]
+                for klass in assign_classes
+            ]
+            emme_manager.copy_attr_values("LINK", period_scenario, scenario, link_attrs)
+            for klass in assign_classes:
+                for matrix_name in klass.skim_matrices:
+                    matrix_id = f'mf"{matrix_name}"'
+                    data = period_emmebank.matrix(matrix_id).get_numpy_data(scenario.id)
+                    scenario.emmebank.matrix(matrix_id).set_numpy_data(
+                        data, scenario.id
+                    )
+        finally:
+            period_emmebank.dispose()
+
+    def _run_period(self, time: str, setup_network: bool = True):
+        """Run the assignment and skims for the time period.
+
+        Args:
+            time: time period name
+            setup_network: if False the background traffic and skim matrices
+                are already set up (in the main process for period workers)
+        """
+        scenario = self.get_emme_scenario(self.config.emme.highway_database_path, time)
+        with self._setup(scenario, time):
+            iteration = self.controller.iteration
+            assign_classes = [
+                AssignmentClass(c, time, iteration) for c in self.config.highway.classes
+            ]
+            if setup_network:
+                self._set_background_traffic(scenario)
+            self._create_skim_matrices(scenario, assign_classes)
+            assign_spec = self._get_assignment_spec(assign_classes)
+            # self.logger.log_dict(assign_spec, level="DEBUG")
+            start_time = _time.time()
+            backend = self.config.highway.assignment_backend
+            if backend == "numpy":
+                convergence = self._run_numpy_assignment(scenario, time, assign_spec)
+            else:
                 with self.logger.log_start_end(
                     "Run SOLA assignment with path analyses", level="INFO"
                 ):
                     assign = self.controller.emme_manager.tool(
                         "inro.emme.traffic_assignment.sola_traffic_assignment"
                     )
-                    assign(assign_spec, scenario, chart_log_interval=1)
-
-                # Subtract non-time costs from gen cost to get the raw travel time
-                for emme_class_spec in assign_spec["classes"]:
-                    self._calc_time_skim(emme_class_spec)
-                # Set intra-zonal for time and dist to be 1/2 nearest neighbour
-                for class_config in self.config.highway.classes:
-                    self._set_intrazonal_values(
-                        time,
-                        class_config["name"],
-                        class_config["skims"],
-                    )
-                self._export_skims(scenario, time)
+                    report = assign(assign_spec, scenario, chart_log_interval=1)
+                convergence = _sola_convergence(report)
+            self._convergence.append(
+                {
+                    "global_iteration": iteration,
+                    "period": time,
+                    "backend": backend,
+                    "wall_time": _time.time() - start_time,
+                    **convergence,
+                }
+            )
+
+            # Subtract non-time costs from gen cost to get the raw travel time
+            for emme_class_spec in assign_spec["classes"]:
+                self._calc_time_skim(emme_class_spec)
+            # Set intra-zonal for time and dist to be 1/2 nearest neighbour
+            for class_config in self.config.highway.classes:
+                self._set_intrazonal_values(
+                    time,
+                    class_config["name"],
+                    class_config["skims"],
+                )
+            self._export_skims(scenario, time)
 
     @_context
     def _setup(self, scenario: EmmeScenario, time_period: str):
         """Setup and teardown for Emme Matrix cache and list of skim matrices
 
+        The matrix cache is flushed to the Emmebank at the end of the period.
+
         Args:
             scenario: Emme scenario object
             time_period: time period name
         """
-        self._matrix_cache = MatrixCache(scenario)
+        max_mb = self.config.emme.matrix_cache_max_mb
+        spill_dir = self.config.emme.matrix_cache_spill_path
+        if spill_dir is not None:
+            spill_dir = self.get_abs_path(spill_dir)
+            os.makedirs(spill_dir, exist_ok=True)
+        self._matrix_cache = MatrixCache(
+            scenario,
+            max_bytes=None if max_mb is None else int(max_mb * 2**20),
+            logger=self.logger,
+            spill_dir=spill_dir,
+            write_back=self.config.emme.matrix_cache_write_back,
+            dtype=self.config.emme.matrix_dtype,
+        )
         self._skim_matrices = []
         msg = f"Highway assignment for period {time_period}"
         with self.logger.log_start_end(msg, level="STATUS"):
             try:
                 yield
+                # write back skim matrices changed in the cache (if write_back)
+                self._matrix_cache.flush()
             finally:
                 self._matrix_cache.clear()
                 self._matrix_cache = None
                 self._skim_matrices = []
 
+    def _set_background_traffic(self, scenario: EmmeScenario):
+        """Set ul1 for background traffic from the MAZ-to-MAZ flows or 0.
+
+        Args:
+            scenario: Emme scenario object"""
+        if self.controller.iteration > 0:
+            self._copy_maz_flow(scenario)
+        else:
+            self._reset_background_traffic(scenario)
+
     def _copy_maz_flow(self, scenario: EmmeScenario):
         """Copy maz_flow from MAZ demand assignment to ul1 for background traffic.
 
@@ -184,21 +508,23 @@ class HighwayAssignment(Component):
     ):
         """Create matrices to store skim results in Emme database.
 
-        Also add the matrices to list of self._skim_matrices.
+        Also add the matrices to list of self._skim_matrices. The Emme
+        Modeller is only used if a matrix does not exist.
 
         Args:
             scenario: Emme scenario object
             assign_classes: list of AssignmentClass objects
         """
-        create_matrix = self.controller.emme_manager.tool(
-            "inro.emme.data.matrix.create_matrix"
-        )
-
+        create_matrix = None
         with self.logger.log_start_end("Creating skim matrices", level="DETAIL"):
             for klass in assign_classes:
                 for matrix_name in klass.skim_matrices:
                     matrix = scenario.emmebank.matrix(f'mf"{matrix_name}"')
                     if not matrix:
+                        if create_matrix is None:
+                            create_matrix = self.controller.emme_manager.tool(
+                                "inro.emme.data.matrix.create_matrix"
+                            )
                         matrix = create_matrix(
                             "mf", matrix_name, scenario=scenario, overwrite=True
                         )
@@ -241,6 +567,303 @@ class HighwayAssignment(Component):
         }
         return base_spec
 
+    def _run_numpy_assignment(
+        self,
+        scenario: EmmeScenario,
+        time_period: str,
+        assign_spec: EmmeTrafficAssignmentSpec,
+    ):
+        """Run the Numpy / SciPy equilibrium assignment in place of SOLA.
+
+        The link attributes used in the assignment spec are exported to Numpy
+        arrays, and the results are saved to the same link attributes
+        (@flow_XX, volau and timau) and skim matrices (shortest path
+        generalized cost and path analyses) as the SOLA assignment.
+        The skims are the path sums on the shortest path at the final link
+        times, not averages over all used paths as from SOLA.
+        Unavailable O-D pairs have a generalized cost of 1e20.
+
+        Args:
+            scenario: Emme scenario object
+            time_period: time period name
+            assign_spec: Emme SOLA assignment specification
+
+        Returns:
+            Dictionary of the "iterations" (list of dictionaries of the
+            iteration number, relative gap and run time) and the
+            "stopping_reason", as from _sola_convergence.
+        """
+        class_specs = assign_spec["classes"]
+        attr_names = [
+            "@free_flow_time",
+            "@capacity",
+            "@ja",
+            "volume_delay_func",
+            assign_spec["background_traffic"]["link_component"],
+        ]
+        for class_spec in class_specs:
+            attr_names.append(class_spec["generalized_cost"]["link_costs"])
+            attr_names.extend(a["link_component"] for a in class_spec["path_analyses"])
+        attr_names = list(dict.fromkeys(attr_names))
+        node_index, _ = get_attribute_arrays(scenario, "NODE", ["x"])
+        link_index, links = get_attribute_arrays(scenario, "LINK", attr_names)
+        node_ids = node_index_ids(node_index)
+        node_order = np.argsort(node_ids)
+        sorted_ids = node_ids[node_order]
+        i_node_ids, j_node_ids = link_index_ids(link_index)
+        zone_numbers = np.array(scenario.zone_numbers, dtype=np.int64)
+        period_hours = {tp.name: tp.length_hours for tp in self.config.time_periods}[
+            time_period
+        ]
+        assignment = EquilibriumAssignment(
+            node_ids,
+            node_order[np.searchsorted(sorted_ids, i_node_ids)],
+            node_order[np.searchsorted(sorted_ids, j_node_ids)],
+            node_order[np.searchsorted(sorted_ids, zone_numbers)],
+            links["@free_flow_time"],
+            links["@capacity"],
+            links["@ja"],
+            np.isin(links["volume_delay_func"], _akcelik_vdfs),
+            period_hours,
+            links[assign_spec["background_traffic"]["link_component"]],
+        )
+        mode_links = self._mode_links(
+            scenario, link_index, {spec["mode"] for spec in class_specs}
+        )
+        warm_start = self._load_warm_start(time_period, i_node_ids, j_node_ids)
+        for class_spec in class_specs:
+            if class_spec["demand"] == 'ms"zero"':
+                demand = np.zeros((len(zone_numbers), len(zone_numbers)))
+            else:
+                demand = self._matrix_cache.get_data(class_spec["demand"])
+            analyses = class_spec["path_analyses"]
+            if analyses:
+                analysis_values = np.array(
+                    [links[a["link_component"]] for a in analyses]
+                )
+            else:
+                analysis_values = np.empty((0, len(i_node_ids)))
+            name = class_spec["results"]["link_volumes"]
+            assignment.add_class(
+                name,
+                mode_links[class_spec["mode"]],
+                links[class_spec["generalized_cost"]["link_costs"]],
+                class_spec["generalized_cost"]["perception_factor"],
+                demand,
+                analysis_values,
+                None if warm_start is None else warm_start.get(name),
+            )
+        stopping = assign_spec["stopping_criteria"]
+        with self.logger.log_start_end(
+            "Run Numpy equilibrium assignment with path analyses", level="INFO"
+        ):
+            gaps = assignment.run(
+                stopping["max_iterations"],
+                stopping["relative_gap"],
+                self.config.highway.assignment_algorithm,
+                None if warm_start is None else warm_start["times"],
+            )
+        for iteration, gap in enumerate(gaps):
+            self.logger.log(
+                f"iteration {iteration}: relative gap {gap:.6f}", level="DEBUG"
+            )
+        num_iterations = len(gaps) - 1
+        if warm_start is None:
+            cold_iterations = num_iterations
+        else:
+            cold_iterations = int(warm_start["cold_iterations"])
+            self.logger.log(
+                f"Warm start: {num_iterations} iterations, "
+                f"{cold_iterations - num_iterations} fewer than the last cold "
+                f"start ({cold_iterations})",
+                level="INFO",
+            )
+        self._save_warm_start(
+            time_period, i_node_ids, j_node_ids, assignment, cold_iterations
+        )
+        results = {"volau": assignment.volumes, "timau": assignment.times}
+        for class_spec, klass in zip(class_specs, assignment.classes):
+            results[klass.name] = klass.flows
+            cost_matrix = class_spec["results"]["od_travel_times"]["shortest_paths"]
+            if cost_matrix is not None:
+                cost_skim = np.where(
+                    np.isfinite(klass.cost_skim), klass.cost_skim, 1e20
+                )
+                self._matrix_cache.set_data(cost_matrix, cost_skim)
+            for analysis, skim in zip(
+                class_spec["path_analyses"], klass.analysis_skims
+            ):
+                self._matrix_cache.set_data(analysis["results"]["od_values"], skim)
+        set_attribute_arrays(scenario, "LINK", link_index, results)
+        return {
+            "iterations": [
+                {"iteration": number, "relative_gap": gap, "time": run_time}
+                for number, (gap, run_time) in enumerate(
+                    zip(gaps, assignment.iteration_times)
+                )
+            ],
+            "stopping_reason": assignment.stopping_reason,
+        }
+
+    def _report_convergence(self):
+        """Log the convergence summary for the global iteration and write the log file.
+
+        The summary table has one row per period: the number of iterations,
+        the final relative gap, the assignment run time and the stopping
+        reason. The file at highway.convergence_log_path has all of the
+        records for the model run, as a list of period records (.json), or
+        as one row per period and iteration (.csv).
+        """
+        iteration = self.controller.iteration
+        records = [r for r in self._convergence if r["global_iteration"] == iteration]
+        self.logger.log(
+            f"Highway assignment convergence, global iteration {iteration}",
+            level="INFO",
+        )
+        self.logger.log(
+            f"{'period':<10}{'iterations':>12}{'relative gap':>14}"
+            f"{'time (s)':>10}  stopping reason",
+            level="INFO",
+        )
+        for record in records:
+            iterations = record["iterations"]
+            gap = iterations[-1]["relative_gap"] if iterations else None
+            gap = "" if gap is None else f"{gap:.2e}"
+            self.logger.log(
+                f"{record['period']:<10}{max(len(iterations) - 1, 0):>12}{gap:>14}"
+                f"{record['wall_time']:>10.1f}  {record['stopping_reason']}",
+                level="INFO",
+            )
+        if self.config.highway.convergence_log_path is not None:
+            self._write_convergence_log(
+                self.get_abs_path(self.config.highway.convergence_log_path)
+            )
+
+    def _write_convergence_log(self, file_path: str):
+        """Write the convergence records for all global iterations to file.
+
+        Args:
+            file_path: path of the .json or .csv file, replaced if it exists
+        """
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        if file_path.endswith(".csv"):
+            rows = [
+                {
+                    "global_iteration": record["global_iteration"],
+                    "period": record["period"],
+                    "backend": record["backend"],
+                    "wall_time": record["wall_time"],
+                    "stopping_reason": record["stopping_reason"],
+                    **item,
+                }
+                for record in self._convergence
+                for item in record["iterations"]
+            ]
+            pd.DataFrame(rows).to_csv(file_path, index=False)
+        else:
+            with open(file_path, "w", encoding="utf8") as log_file:
+                json.dump(self._convergence, log_file, indent=2)
+
+    def _warm_start_path(self, time_period: str) -> Union[str, None]:
+        """Return the warm start file path for the period, None if not used.
+
+        Args:
+            time_period: time period name
+        """
+        file_path = self.config.highway.warm_start_path
+        if file_path is None or self.config.highway.assignment_backend != "numpy":
+            return None
+        return self.get_abs_path(file_path.format(period=time_period))
+
+    def _load_warm_start(
+        self, time_period: str, i_node_ids: NumpyArray, j_node_ids: NumpyArray
+    ) -> Union[Dict[str, NumpyArray], None]:
+        """Load the warm start from the previous global iteration.
+
+        The first global iteration (with demand) is always a cold start,
+        as is an assignment where the network links have changed.
+
+        Args:
+            time_period: time period name
+            i_node_ids: link i-node IDs, in the order of the Emme link index
+            j_node_ids: link j-node IDs, in the order of the Emme link index
+
+        Returns:
+            Dictionary of "times", "cold_iterations" and the residual flows
+            by class name (@flow_XX), or None for a cold start.
+        """
+        file_path = self._warm_start_path(time_period)
+        if file_path is None or self.controller.iteration < 2:
+            return None
+        if not os.path.exists(file_path):
+            return None
+        with np.load(file_path) as data:
+            warm_start = {name: data[name] for name in data.files}
+        if not (
+            np.array_equal(warm_start["i_node"], i_node_ids)
+            and np.array_equal(warm_start["j_node"], j_node_ids)
+        ):
+            self.logger.log(
+                f"Network links changed since {file_path}, cold start", level="INFO"
+            )
+            return None
+        return warm_start
+
+    def _save_warm_start(
+        self,
+        time_period: str,
+        i_node_ids: NumpyArray,
+        j_node_ids: NumpyArray,
+        assignment: EquilibriumAssignment,
+        cold_iterations: int,
+    ):
+        """Save the assignment state for a warm start in the next global iteration.
+
+        Args:
+            time_period: time period name
+            i_node_ids: link i-node IDs, in the order of the Emme link index
+            j_node_ids: link j-node IDs, in the order of the Emme link index
+            assignment: the completed EquilibriumAssignment
+            cold_iterations: the number of iterations of the last cold start
+        """
+        file_path = self._warm_start_path(time_period)
+        if file_path is None or self.controller.iteration < 1:
+            return
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        np.savez(
+            file_path,
+            i_node=i_node_ids,
+            j_node=j_node_ids,
+            times=assignment.times,
+            cold_iterations=cold_iterations,
+            **{klass.name: klass.residual_flows for klass in assignment.classes},
+        )
+
+    def _mode_links(
+        self,
+        scenario: EmmeScenario,
+        link_index: Dict[int, Dict[int, int]],
+        modes: Set[str],
+    ) -> Dict[str, NumpyArray]:
+        """Return the boolean flag for the links available to each mode.
+
+        Args:
+            scenario: Emme scenario object
+            link_index: the LINK element index from get_attribute_arrays
+            modes: the mode IDs
+        """
+        network = self.controller.emme_manager.get_network(
+            scenario, {"NODE": [], "LINK": []}
+        )
+        num_links = sum(len(j_index) for j_index in link_index.values())
+        mode_links = {mode: np.zeros(num_links, dtype=bool) for mode in modes}
+        for link in network.links():
+            position = link_index[link.i_node.number][link.j_node.number]
+            for mode in link.modes:
+                if mode.id in mode_links:
+                    mode_links[mode.id][position] = True
+        return mode_links
+
     def _calc_time_skim(self, emme_class_spec: EmmeHighwayClassSpec):
         """Calculate the real time skim =gen_cost-per_fac*link_costs.
 
@@ -255,10 +878,11 @@ class HighwayAssignment(Component):
             # Total link costs is always the first analysis
             cost = emme_class_spec["path_analyses"][0]["results"]["od_values"]
             factor = emme_class_spec["generalized_cost"]["perception_factor"]
-            gencost_data = self._matrix_cache.get_data(od_travel_times)
-            cost_data = self._matrix_cache.get_data(cost)
-            time_data = gencost_data - (factor * cost_data)
-            self._matrix_cache.set_data(od_travel_times, time_data)
+            with self._matrix_cache.pinned(od_travel_times, cost):
+                gencost_data = self._matrix_cache.get_data(od_travel_times)
+                cost_data = self._matrix_cache.get_data(cost)
+                time_data = gencost_data - (factor * cost_data)
+                self._matrix_cache.set_data(od_travel_times, time_data)
 
     def _set_intrazonal_values(
         self, time_period: str, class_name: str, skims: List[str]
@@ -282,6 +906,10 @@ class HighwayAssignment(Component):
     def _export_skims(self, scenario: EmmeScenario, time_period: str):
         """Export skims to OMX files by period.
 
+        If the background skim writer is running the skim arrays are taken
+        from the matrix cache and queued for export, otherwise the file is
+        written before returning.
+
         Args:
             scenario: Emme scenario object
             time_period: time period name
@@ -291,10 +919,68 @@ class HighwayAssignment(Component):
             self.config.highway.output_skim_path.format(period=time_period)
         )
         os.makedirs(os.path.dirname(omx_file_path), exist_ok=True)
-        with OMXManager(
-            omx_file_path, "w", scenario, matrix_cache=self._matrix_cache
-        ) as omx_file:
-            omx_file.write_matrices(self._skim_matrices)
+        omx_args = {
+            "dtype": self.config.emme.matrix_dtype,
+            "complib": self.config.highway.output_skim_complib,
+            "complevel": self.config.highway.output_skim_complevel,
+            "chunk_rows": self.config.highway.output_skim_chunk_rows,
+        }
+        if self._skim_writer is None:
+            with OMXManager(
+                omx_file_path,
+                "w",
+                scenario,
+                matrix_cache=self._matrix_cache,
+                **omx_args,
+            ) as omx_file:
+                omx_file.write_matrices(self._skim_matrices)
+            return
+        arrays = {}
+        for matrix in self._skim_matrices:
+            data = self._matrix_cache.get_data(matrix)
+            # spilled matrices are mapped to files removed with the cache
+            if isinstance(data, np.memmap):
+                data = np.array(data)
+            arrays[matrix.name] = (data, {"description": matrix.description})
+        self.logger.log(
+            f"Queue {len(arrays)} skims for export to {omx_file_path}", level="DEBUG"
+        )
+        self._skim_writer.submit(
+            omx_file_path,
+            arrays,
+            zone_numbers=list(scenario.zone_numbers),
+            **omx_args,
+        )
+
+
+def _sola_convergence(report: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the iterations and stopping reason from the SOLA assignment report.
+
+    The report has the list of "iterations", each with the iteration
+    "number", the "gaps" (with the "relative" gap) and the "time", and the
+    "stopping_criterion" (e.g. "RELATIVE_GAP" or "MAX_ITERATIONS"), see the
+    SOLA traffic assignment tool in the Emme API Reference.
+
+    Args:
+        report: the value returned from the Emme SOLA traffic assignment tool
+
+    Returns:
+        Dictionary of the "iterations" (list of dictionaries of the
+        iteration number, relative gap and run time) and the
+        "stopping_reason" (the stopping criterion in lower case).
+    """
+    iterations = [
+        {
+            "iteration": item["number"],
+            "relative_gap": item["gaps"]["relative"],
+            "time": item["time"],
+        }
+        for item in report["iterations"]
+    ]
+    return {
+        "iterations": iterations,
+        "stopping_reason": report["stopping_criterion"].lower(),
+    }
 
 
 class AssignmentClass:
@@ -0,0 +1,436 @@
+"""Numpy / SciPy multi-class user equilibrium traffic assignment.
+
+An alternative to the Emme SOLA traffic assignment, used by highway_assign
+with highway.assignment_backend="numpy". The assignment runs on the network
+links exported to Numpy arrays, with the shortest paths from the
+HighwayGraph (see HighwayGraph.all_or_nothing), such that assignments can be
+run, profiled and tested without Emme.
+
+The link travel times (in minutes) are calculated from the total link volume
+(the class flows plus the background traffic) with the volume delay
+functions:
+    - BPR: t0 * (1 + 0.15 * (v/c)^4)
+    - Akcelik (the link VDFs in highway_network._akcelik_vdfs):
+        t0 + 15 * T * ((v/c - 1) + sqrt((v/c - 1)^2 + ja * (v/c) / T^2))
+      where T is the period length in hours and ja the @ja delay parameter
+    - links without capacity (<= 0) have the free flow time
+The generalized cost for each class is the link time plus the class
+perception factor times the link cost (@cost_XX).
+
+The algorithm is either the Frank-Wolfe ("fw") or the conjugate Frank-Wolfe
+("cfw", Mitradjieva and Lindberg, 2013) method, with a bisection line search
+on the step size. The iterations stop at the relative gap,
+(total cost - shortest path cost) / total cost, or the max iterations.
+
+The skims are the sums along the shortest paths at the final link times
+(not averaged over the paths used in the iterations): the generalized cost
+and the path sums of the analysis link values for each class.
+
+The assignment can be warm started from a previous solution, for a new
+(e.g. averaged) demand. The residual flows of each class, the final flows
+minus the all-or-nothing flows at the final link times, are saved from the
+previous assignment. The starting flows are then the residual flows plus
+the all-or-nothing flows of the new demand at the previous final times,
+which satisfy the flow conservation for the new demand. If any link flows
+are negative the starting flows are combined with the all-or-nothing
+flows, with the largest weight which gives non-negative flows.
+"""
+
+import time as _time
+from typing import List, Tuple
+
+import numpy as np
+
+from tm2py.components.network.highway.highway_graph import HighwayGraph
+
+NumpyArray = np.array
+
+_BPR_ALPHA = 0.15
+_BPR_BETA = 4.0
+# max value of the conjugate direction weight (cfw), to avoid stalling
+_MAX_CONJUGATE_ALPHA = 0.99
+_LINE_SEARCH_ITERATIONS = 24
+# cost for links not available to the class (not in the graph)
+_UNAVAILABLE_COST = 1e20
+
+
+def link_times(
+    free_flow_time: NumpyArray,
+    volume: NumpyArray,
+    capacity: NumpyArray,
+    ja: NumpyArray,
+    is_akcelik: NumpyArray,
+    period_hours: float,
+) -> Tuple[NumpyArray, NumpyArray]:
+    """Return the link times and derivatives from the BPR and Akcelik VDFs.
+
+    Args:
+        free_flow_time: free flow time in minutes
+        volume: total link volume
+        capacity: link capacity for the period, links with capacity <= 0
+            have the free flow time
+        ja: Akcelik delay parameter (@ja)
+        is_akcelik: boolean flag for the links with the Akcelik VDF, the
+            other links use the BPR VDF
+        period_hours: the period length in hours
+
+    Returns:
+        Two arrays: times, derivatives
+        times: link time in minutes
+        derivatives: derivative of the link time with respect to the volume
+    """
+    has_capacity = capacity > 0
+    ratio = np.divide(volume, capacity, out=np.zeros_like(volume), where=has_capacity)
+    cap = np.where(has_capacity, capacity, 1.0)
+    # BPR
+    times = free_flow_time * (1 + _BPR_ALPHA * ratio**_BPR_BETA)
+    derivatives = (
+        free_flow_time * _BPR_ALPHA * _BPR_BETA * ratio ** (_BPR_BETA - 1) / cap
+    )
+    # Akcelik
+    over = ratio - 1
+    root = np.sqrt(over**2 + ja * ratio / period_hours**2)
+    akcelik_times = free_flow_time + 15 * period_hours * (over + root)
+    root_derivative = np.divide(
+        over + ja / (2 * period_hours**2),
+        root,
+        out=np.ones_like(root),
+        where=root > 0,
+    )
+    akcelik_derivatives = 15 * period_hours * (1 + root_derivative) / cap
+    times = np.where(is_akcelik, akcelik_times, times)
+    derivatives = np.where(is_akcelik, akcelik_derivatives, derivatives)
+    times[~has_capacity] = free_flow_time[~has_capacity]
+    derivatives[~has_capacity] = 0.0
+    return times, derivatives
+
+
+class EquilibriumClass:
+    """Assignment class inputs and results for the EquilibriumAssignment.
+
+    Args:
+        name: class name
+        graph: the HighwayGraph of the links available to the class
+        link_cost: link cost (in cents) for each link
+        perception_factor: minutes per cent for the generalized cost
+        demand: demand matrix of shape (number of zones, number of zones)
+        analysis_values: optional, array of shape (number of analyses,
+            number of links) of the link values to sum along the paths
+
+    Properties:
+        flows: the class link flows
+        cost_skim: the shortest path generalized cost for each O-D pair,
+            inf if there is no path
+        analysis_skims: array of shape (number of analyses, number of zones,
+            number of zones) of the path sums of the analysis values
+        direction: the target flows of the current step
+        warm_start: the residual flows from a previous assignment, or None
+            for a cold start (all-or-nothing flows)
+        residual_flows: the class flows minus the all-or-nothing flows at
+            the final link times, the warm_start for the next assignment
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        name: str,
+        graph: HighwayGraph,
+        link_cost: NumpyArray,
+        perception_factor: float,
+        demand: NumpyArray,
+        analysis_values: NumpyArray = None,
+    ):
+        self.name = name
+        self.graph = graph
+        self.link_cost = perception_factor * np.asarray(link_cost, dtype=np.float64)
+        self.demand = np.asarray(demand, dtype=np.float64)
+        self.analysis_values = analysis_values
+        self.flows = np.zeros(graph.num_links)
+        self.cost_skim = None
+        self.analysis_skims = None
+        self.direction = None
+        self.warm_start = None
+        self.residual_flows = None
+
+
+class EquilibriumAssignment:
+    """Multi-class Frank-Wolfe / conjugate Frank-Wolfe equilibrium assignment.
+
+    Args:
+        node_ids: network node ID for each node
+        link_i: node index of the link from-node for each link
+        link_j: node index of the link to-node for each link
+        zones: node index of the zones (centroids), in the order of the
+            demand matrices, paths cannot pass through the zones
+        free_flow_time: free flow time in minutes for each link
+        capacity: link capacity for the period
+        ja: Akcelik delay parameter for each link
+        is_akcelik: boolean flag for the links with the Akcelik VDF
+        period_hours: the period length in hours
+        background_flow: optional, background traffic on each link (ul1)
+
+    Properties:
+        classes: list of the EquilibriumClass objects
+        times: the link times at the last iteration
+        volumes: the total class link volumes (without the background)
+        gaps: the relative gap at each iteration
+        iteration_times: the run time in seconds of each iteration, the
+            first includes the initial all-or-nothing assignment
+        stopping_reason: "relative_gap" or "max_iterations"
+    """
+
+    # pylint: disable=too-many-arguments, too-many-instance-attributes
+    def __init__(
+        self,
+        node_ids: NumpyArray,
+        link_i: NumpyArray,
+        link_j: NumpyArray,
+        zones: NumpyArray,
+        free_flow_time: NumpyArray,
+        capacity: NumpyArray,
+        ja: NumpyArray,
+        is_akcelik: NumpyArray,
+        period_hours: float,
+        background_flow: NumpyArray = None,
+    ):
+        self._node_ids = np.asarray(node_ids, dtype=np.int64)
+        self._link_i = np.asarray(link_i, dtype=np.int64)
+        self._link_j = np.asarray(link_j, dtype=np.int64)
+        self._zones = np.asarray(zones, dtype=np.int64)
+        self._terminal = np.zeros(len(self._node_ids), dtype=bool)
+        self._terminal[self._zones] = True
+        self._free_flow_time = np.asarray(free_flow_time, dtype=np.float64)
+        self._capacity = np.asarray(capacity, dtype=np.float64)
+        self._ja = np.asarray(ja, dtype=np.float64)
+        self._is_akcelik = np.asarray(is_akcelik, dtype=bool)
+        self._period_hours = period_hours
+        if background_flow is None:
+            background_flow = np.zeros(len(self._link_i))
+        self._background = np.asarray(background_flow, dtype=np.float64)
+        self._graphs = {}
+        self.classes = []
+        self.times = None
+        self.volumes = np.zeros(len(self._link_i))
+        self.gaps = []
+        self.iteration_times = []
+        self.stopping_reason = None
+
+    # pylint: disable=too-many-arguments
+    def add_class(
+        self,
+        name: str,
+        allowed: NumpyArray,
+        link_cost: NumpyArray,
+        perception_factor: float,
+        demand: NumpyArray,
+        analysis_values: NumpyArray = None,
+        warm_start: NumpyArray = None,
+    ) -> EquilibriumClass:
+        """Add an assignment class, the graph is shared by classes with the same links.
+
+        Args:
+            name: class name
+            allowed: boolean flag for the links available to the class
+            link_cost: link cost (in cents) for each link
+            perception_factor: minutes per cent for the generalized cost
+            demand: demand matrix of shape (number of zones, number of zones)
+            analysis_values: optional, array of shape (number of analyses,
+                number of links) of the link values to sum along the paths
+            warm_start: optional, the residual_flows of the class from a
+                previous assignment, see run
+
+        Returns:
+            The new EquilibriumClass
+        """
+        allowed = np.asarray(allowed, dtype=bool)
+        key = allowed.tobytes()
+        if key not in self._graphs:
+            self._graphs[key] = HighwayGraph(
+                self._node_ids,
+                np.zeros((len(self._node_ids), 2)),
+                self._link_i,
+                self._link_j,
+                np.where(allowed, 0.0, _UNAVAILABLE_COST),
+                self._terminal,
+            )
+        klass = EquilibriumClass(
+            name,
+            self._graphs[key],
+            link_cost,
+            perception_factor,
+            demand,
+            analysis_values,
+        )
+        klass.warm_start = warm_start
+        self.classes.append(klass)
+        return klass
+
+    def run(
+        self,
+        max_iterations: int,
+        relative_gap: float,
+        algorithm: str = "cfw",
+        initial_times: NumpyArray = None,
+    ) -> List[float]:
+        """Run the assignment to the relative gap or the max iterations.
+
+        The results are stored on the EquilibriumClass objects and in
+        times and volumes.
+
+        Args:
+            max_iterations: max number of iterations after the initial
+                all-or-nothing assignment
+            relative_gap: target relative gap
+            algorithm: "fw" (Frank-Wolfe) or "cfw" (conjugate Frank-Wolfe)
+            initial_times: optional, the link times for the initial
+                all-or-nothing assignment, the final times of the previous
+                assignment for a warm start, default the times with the
+                background flow only
+
+        Returns:
+            The list of the relative gap at each iteration.
+        """
+        if algorithm not in ["fw", "cfw"]:
+            raise Exception(f"invalid assignment algorithm {algorithm}")
+        self.gaps = []
+        self.iteration_times = []
+        start_time = _time.time()
+        if initial_times is None:
+            self.times, _ = self._link_times(self._background)
+        else:
+            self.times = np.asarray(initial_times, dtype=np.float64)
+        for klass in self.classes:
+            klass.flows, _, _ = self._all_or_nothing(klass, self.times)
+            if klass.warm_start is not None:
+                klass.flows = _warm_start_flows(
+                    klass.warm_start + klass.flows, klass.flows
+                )
+        self.volumes = self._total_flows()
+        for iteration in range(max_iterations + 1):
+            self.times, derivatives = self._link_times(self.volumes + self._background)
+            total_cost = 0.0
+            path_cost = 0.0
+            aon_flows = []
+            for klass in self.classes:
+                flows, klass.cost_skim, klass.analysis_skims = self._all_or_nothing(
+                    klass, self.times
+                )
+                aon_flows.append(flows)
+                total_cost += np.dot(self.times + klass.link_cost, klass.flows)
+                has_path = np.isfinite(klass.cost_skim)
+                path_cost += np.dot(klass.cost_skim[has_path], klass.demand[has_path])
+            gap = (total_cost - path_cost) / total_cost if total_cost > 0 else 0.0
+            self.gaps.append(gap)
+            self.iteration_times.append(_time.time() - start_time)
+            start_time = _time.time()
+            if gap <= relative_gap:
+                self.stopping_reason = "relative_gap"
+                break
+            if iteration == max_iterations:
+                self.stopping_reason = "max_iterations"
+                break
+            self._set_directions(aon_flows, derivatives, algorithm, iteration)
+            step = self._line_search()
+            for klass in self.classes:
+                klass.flows += step * (klass.direction - klass.flows)
+            self.volumes = self._total_flows()
+        for klass, flows in zip(self.classes, aon_flows):
+            klass.residual_flows = klass.flows - flows
+        return self.gaps
+
+    def _link_times(self, volume: NumpyArray) -> Tuple[NumpyArray, NumpyArray]:
+        """Return the link times and derivatives for the total link volume."""
+        return link_times(
+            self._free_flow_time,
+            volume,
+            self._capacity,
+            self._ja,
+            self._is_akcelik,
+            self._period_hours,
+        )
+
+    def _total_flows(self) -> NumpyArray:
+        """Return the sum of the class flows."""
+        return np.sum([klass.flows for klass in self.classes], axis=0)
+
+    def _all_or_nothing(
+        self, klass: EquilibriumClass, times: NumpyArray
+    ) -> Tuple[NumpyArray, NumpyArray, NumpyArray]:
+        """Assign the class demand on the shortest generalized cost paths."""
+        klass.graph.set_link_costs(times + klass.link_cost)
+        return klass.graph.all_or_nothing(
+            self._zones, self._zones, klass.demand, klass.analysis_values
+        )
+
+    def _set_directions(
+        self,
+        aon_flows: List[NumpyArray],
+        derivatives: NumpyArray,
+        algorithm: str,
+        iteration: int,
+    ):
+        """Set the target flows of the step for each class.
+
+        For "fw" the target is the all-or-nothing flows, for "cfw" the
+        all-or-nothing flows are combined with the previous target such that
+        the directions are conjugate with respect to the Hessian of the
+        objective (the link time derivatives).
+        """
+        alpha = 0.0
+        if algorithm == "cfw" and iteration > 0:
+            previous = np.sum([klass.direction for klass in self.classes], axis=0)
+            aon_total = np.sum(aon_flows, axis=0)
+            weighted = derivatives * (previous - self.volumes)
+            numerator = np.dot(weighted, aon_total - self.volumes)
+            denominator = np.dot(weighted, aon_total - previous)
+            if denominator != 0:
+                alpha = min(max(numerator / denominator, 0.0), _MAX_CONJUGATE_ALPHA)
+        for klass, flows in zip(self.classes, aon_flows):
+            if alpha > 0:
+                klass.direction = alpha * klass.direction + (1 - alpha) * flows
+            else:
+                klass.direction = flows
+
+    def _line_search(self) -> float:
+        """Return the step size which minimizes the objective along the direction.
+
+        Bisection on the derivative of the objective with respect to the
+        step size, sum of link time * volume change plus the class link
+        costs * class flow change.
+        """
+        change = np.sum([klass.direction for klass in self.classes], axis=0)
+        change -= self.volumes
+        cost_change = sum(
+            np.dot(klass.link_cost, klass.direction - klass.flows)
+            for klass in self.classes
+        )
+
+        def derivative(step):
+            volume = self.volumes + self._background + step * change
+            times, _ = self._link_times(volume)
+            return np.dot(times, change) + cost_change
+
+        if derivative(1.0) <= 0:
+            return 1.0
+        lower, upper = 0.0, 1.0
+        for _ in range(_LINE_SEARCH_ITERATIONS):
+            middle = 0.5 * (lower + upper)
+            if derivative(middle) > 0:
+                upper = middle
+            else:
+                lower = middle
+        return 0.5 * (lower + upper)
+
+
+def _warm_start_flows(flows: NumpyArray, aon_flows: NumpyArray) -> NumpyArray:
+    """Return the starting flows, combined with the all-or-nothing flows if any are negative.
+
+    Args:
+        flows: the warm start flows (residual plus all-or-nothing flows)
+        aon_flows: the all-or-nothing flows, for the same demand
+    """
+    negative = flows < 0
+    if not negative.any():
+        return flows
+    weight = np.min(aon_flows[negative] / (aon_flows[negative] - flows[negative]))
+    return weight * flows + (1 - weight) * aon_flows
@@ -0,0 +1,506 @@
+"""Numpy / SciPy network graph for shortest path calculations.
+
+Contains the HighwayGraph class, a compressed sparse row (CSR) representation
+of the network links which is used to run shortest paths (Dijkstra, via
+scipy.sparse.csgraph) and to accumulate flows along the paths in memory,
+without the Emme shortest path tool and the path file round trip.
+
+The graph is independent of the Emme API, the node and link values are
+provided as Numpy arrays, see HighwayGraph for details.
+"""
+
+from typing import List, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from scipy.spatial import cKDTree
+
+NumpyArray = np.array
+
+# links with cost at or above this value are not included in the graph
+_MAX_COST = 1e20
+# number of path link entries to collect before summing to the link flows
+_FLUSH_SIZE = 2000000
+# max number of (root, node) entries in a batch of shortest path trees
+_TREE_BATCH_SIZE = 2**22
+
+
+def concat_ranges(starts: NumpyArray, counts: NumpyArray) -> NumpyArray:
+    """Return the concatenation of the ranges [start, start + count) as one array.
+
+    Args:
+        starts: array of range starts
+        counts: array of range lengths
+
+    Returns:
+        Integer array of all of the positions in the ranges, in order.
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    offsets = np.asarray(starts, dtype=np.int64) - np.cumsum(counts) + counts
+    return np.repeat(offsets, counts) + np.arange(counts.sum(), dtype=np.int64)
+
+
+class HighwayGraph:
+    """Directed graph of network links stored in compressed sparse row format.
+
+    Nodes and links are referenced by index (position in the input arrays),
+    node_ids are the network node IDs (Emme node numbers).
+
+    Args:
+        node_ids: network node ID for each node
+        node_xy: node coordinates, array of shape (number of nodes, 2)
+        link_i: node index of the link from-node for each link
+        link_j: node index of the link to-node for each link
+        link_cost: cost for each link, links with cost >= 1e20 (or NaN)
+            are not available for paths
+        terminal: optional, boolean flag for nodes which paths cannot pass
+            through, they can only be at the start or the end of a path
+            (MAZ nodes and centroids)
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        node_ids: NumpyArray,
+        node_xy: NumpyArray,
+        link_i: NumpyArray,
+        link_j: NumpyArray,
+        link_cost: NumpyArray,
+        terminal: NumpyArray = None,
+    ):
+        self.node_ids = np.asarray(node_ids, dtype=np.int64)
+        self.num_nodes = len(self.node_ids)
+        self.num_links = len(link_i)
+        self._node_xy = np.asarray(node_xy, dtype=np.float64)
+        link_i = np.asarray(link_i, dtype=np.int64)
+        link_j = np.asarray(link_j, dtype=np.int64)
+        if terminal is None:
+            terminal = np.zeros(self.num_nodes, dtype=bool)
+        self._terminal = np.asarray(terminal, dtype=bool)
+        # node ID lookup
+        self._id_order = np.argsort(self.node_ids)
+        self._sorted_ids = self.node_ids[self._id_order]
+        # link lookup by packed (i, j) node index key, for all links
+        keys = link_i * self.num_nodes + link_j
+        self._key_order = np.argsort(keys)
+        self._sorted_keys = keys[self._key_order]
+        # CSR arrays of the available links, sorted by i then j
+        available = np.flatnonzero(np.asarray(link_cost) < _MAX_COST)
+        order = available[np.lexsort((link_j[available], link_i[available]))]
+        self._link_ids = order
+        self._indices = link_j[order]
+        self._costs = np.asarray(link_cost, dtype=np.float64)[order]
+        self._indptr = np.searchsorted(
+            link_i[order], np.arange(self.num_nodes + 1, dtype=np.int64)
+        )
+        self._kdtree = None
+        self._local = np.full(self.num_nodes, -1, dtype=np.int64)
+
+    def set_link_costs(self, link_cost: NumpyArray):
+        """Update the link costs, the set of available links is not changed.
+
+        Args:
+            link_cost: new cost for each link, only the values for the links
+                available at construction are used
+        """
+        self._costs = np.asarray(link_cost, dtype=np.float64)[self._link_ids]
+
+    def node_index(self, node_ids: NumpyArray) -> NumpyArray:
+        """Return the node index for the node IDs, -1 if not found.
+
+        Args:
+            node_ids: array of network node IDs
+        """
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+        pos = np.searchsorted(self._sorted_ids, node_ids)
+        pos = pos.clip(0, max(self.num_nodes - 1, 0))
+        found = self._sorted_ids[pos] == node_ids
+        return np.where(found, self._id_order[pos], -1)
+
+    def link_index(self, i_nodes: NumpyArray, j_nodes: NumpyArray) -> NumpyArray:
+        """Return the link index for the (i_node, j_node) node index pairs, -1 if not found.
+
+        Args:
+            i_nodes: array of from-node indices
+            j_nodes: array of to-node indices
+        """
+        keys = np.asarray(i_nodes, dtype=np.int64) * self.num_nodes + np.asarray(
+            j_nodes, dtype=np.int64
+        )
+        pos = np.searchsorted(self._sorted_keys, keys)
+        pos = pos.clip(0, max(len(self._sorted_keys) - 1, 0))
+        found = self._sorted_keys[pos] == keys
+        return np.where(found, self._key_order[pos], -1)
+
+    def path_links(
+        self, path_nodes: NumpyArray, path_lengths: NumpyArray
+    ) -> Tuple[NumpyArray, NumpyArray]:
+        """Return the link indices along paths specified as sequences of node IDs.
+
+        Args:
+            path_nodes: concatenated network node IDs of all of the paths,
+                each path from origin to destination
+            path_lengths: number of nodes in each path
+
+        Returns:
+            Two arrays: path_links, path_pos
+            path_links: link index for each link on all of the paths, -1 if
+                there is no link between the consecutive path nodes
+            path_pos: position in path_lengths of the path for each path_links entry
+        """
+        nodes = self.node_index(path_nodes)
+        path_pos = np.repeat(
+            np.arange(len(path_lengths), dtype=np.int64),
+            np.asarray(path_lengths, dtype=np.int64),
+        )
+        # link from each node to the next node on the same path
+        same_path = path_pos[1:] == path_pos[:-1]
+        links = self.link_index(nodes[:-1][same_path], nodes[1:][same_path])
+        return links, path_pos[:-1][same_path]
+
+    def nodes_within(self, root: int, radius: float) -> NumpyArray:
+        """Return the sorted node indices within the radius of the root node.
+
+        Args:
+            root: node index
+            radius: max straight-line distance from the root in coordinate units
+        """
+        if self._kdtree is None:
+            self._kdtree = cKDTree(self._node_xy)
+        nodes = self._kdtree.query_ball_point(self._node_xy[root], radius)
+        return np.sort(np.asarray(nodes, dtype=np.int64))
+
+    def subgraph(self, root: int, nodes: NumpyArray = None) -> csr_matrix:
+        """Return the CSR matrix of links between the nodes for paths from root.
+
+        Links out of terminal nodes (other than the root) are excluded.
+
+        Args:
+            root: node index of the path root
+            nodes: optional, sorted array of node indices to include,
+                all nodes if not specified
+
+        Returns:
+            CSR matrix of link costs, indexed by position in nodes
+        """
+        if nodes is None:
+            nodes = np.arange(self.num_nodes, dtype=np.int64)
+        local = self._local
+        local[nodes] = np.arange(len(nodes), dtype=np.int64)
+        try:
+            starts = self._indptr[nodes]
+            counts = self._indptr[nodes + 1] - starts
+            counts[self._terminal[nodes] & (nodes != root)] = 0
+            pos = concat_ranges(starts, counts)
+            rows = np.repeat(np.arange(len(nodes), dtype=np.int64), counts)
+            cols = local[self._indices[pos]]
+            keep = cols >= 0
+            pos, rows, cols = pos[keep], rows[keep], cols[keep]
+        finally:
+            local[nodes] = -1
+        indptr = np.searchsorted(rows, np.arange(len(nodes) + 1, dtype=np.int64))
+        return csr_matrix(
+            (self._costs[pos], cols, indptr), shape=(len(nodes), len(nodes))
+        )
+
+    def shortest_path_links(
+        self, root: int, dests: NumpyArray, radius: float = None
+    ) -> Tuple[NumpyArray, NumpyArray, NumpyArray]:
+        """Find the shortest path from the root to each of the dests.
+
+        Args:
+            root: node index of path origin
+            dests: array of node indices of path destinations
+            radius: optional, limit the path search to the nodes within this
+                straight-line distance of the root
+
+        Returns:
+            Three arrays: reached, path_links, path_dests
+            reached: boolean flag for each of the dests, False if there is
+                no path from the root
+            path_links: link indices of all the links on all of the paths
+            path_dests: position in dests of the path for each path_links entry
+        """
+        if radius is None:
+            nodes = np.arange(self.num_nodes, dtype=np.int64)
+        else:
+            nodes = self.nodes_within(root, radius)
+        graph = self.subgraph(root, nodes)
+        root_local = np.searchsorted(nodes, root)
+        _, pred = dijkstra(graph, indices=root_local, return_predecessors=True)
+        dests_local = np.searchsorted(nodes, dests).clip(0, len(nodes) - 1)
+        reached = nodes[dests_local] == dests
+        reached[reached] = pred[dests_local[reached]] >= 0
+        current = dests_local[reached]
+        path_pos = np.flatnonzero(reached)
+        path_links: List[NumpyArray] = []
+        path_dests: List[NumpyArray] = []
+        while current.size:
+            prev = pred[current]
+            path_links.append(self.link_index(nodes[prev], nodes[current]))
+            path_dests.append(path_pos)
+            active = prev != root_local
+            current, path_pos = prev[active], path_pos[active]
+        if path_links:
+            return reached, np.concatenate(path_links), np.concatenate(path_dests)
+        empty = np.zeros(0, dtype=np.int64)
+        return reached, empty, empty
+
+    def assign_flow(
+        self,
+        origins: NumpyArray,
+        dests: NumpyArray,
+        demand: NumpyArray,
+        radius: float = None,
+    ) -> Tuple[NumpyArray, float, float]:
+        """Assign the demand along the shortest paths and return the link flows.
+
+        Args:
+            origins: array of origin node indices
+            dests: array of destination node indices
+            demand: array of demand values for each origin, destination pair
+            radius: optional, limit the path search to the nodes within this
+                straight-line distance of each origin
+
+        Returns:
+            The link flow array (indexed by link), the total assigned demand
+            and the total demand which is not assigned (no path found)
+        """
+        flows = np.zeros(self.num_links, dtype=np.float64)
+        demand = np.asarray(demand, dtype=np.float64)
+        order = np.argsort(origins, kind="stable")
+        roots, starts = np.unique(np.asarray(origins)[order], return_index=True)
+        ends = np.append(starts[1:], len(order))
+        assigned, not_assigned = 0.0, 0.0
+        links_buffer, flows_buffer, buffer_size = [], [], 0
+        for root, start, end in zip(roots, starts, ends):
+            pairs = order[start:end]
+            reached, links, path_dests = self.shortest_path_links(
+                root, np.asarray(dests)[pairs], radius
+            )
+            assigned += demand[pairs][reached].sum()
+            not_assigned += demand[pairs][~reached].sum()
+            links_buffer.append(links)
+            flows_buffer.append(demand[pairs][path_dests])
+            buffer_size += len(links)
+            if buffer_size > _FLUSH_SIZE:
+                flows += self._sum_flows(links_buffer, flows_buffer)
+                links_buffer, flows_buffer, buffer_size = [], [], 0
+        flows += self._sum_flows(links_buffer, flows_buffer)
+        return flows, assigned, not_assigned
+
+    def shortest_path_skims(
+        self,
+        roots: NumpyArray,
+        leaves: NumpyArray,
+        link_values: NumpyArray,
+        max_cost: float = np.inf,
+    ) -> Tuple[NumpyArray, NumpyArray, NumpyArray, NumpyArray]:
+        """Shortest path cost and the sums of link values from the roots to the leaves.
+
+        The path search from each root is limited to max_cost. The sums of
+        the link values along the paths are calculated over the shortest
+        path tree by pointer jumping (log of the tree depth steps).
+
+        Args:
+            roots: array of root node indices
+            leaves: array of leaf node indices
+            link_values: array of shape (number of values, number of links),
+                link values to sum along the paths
+            max_cost: optional, max path cost
+
+        Returns:
+            Four arrays for the reached (root, leaf) pairs, excluding the
+            root itself: root_pos, leaf_pos, costs, sums
+            root_pos: position in roots
+            leaf_pos: position in leaves
+            costs: path cost
+            sums: array of shape (number of values, number of pairs), path
+                sums of link_values
+        """
+        roots = np.asarray(roots, dtype=np.int64)
+        leaves = np.asarray(leaves, dtype=np.int64)
+        link_values = np.atleast_2d(np.asarray(link_values, dtype=np.float64))
+        graph = self._rooted_graph(roots)
+        local = self._local
+        results = []
+        for root_pos, root in enumerate(roots):
+            costs, pred = dijkstra(
+                graph,
+                indices=self.num_nodes + root_pos,
+                limit=max_cost,
+                return_predecessors=True,
+            )
+            costs, pred = costs[: self.num_nodes], pred[: self.num_nodes]
+            reached = np.flatnonzero(np.isfinite(costs))
+            prev = pred[reached]
+            # first link on path is from the root (the extra source node)
+            from_root = prev >= self.num_nodes
+            links = self.link_index(np.where(from_root, root, prev), reached)
+            sums = link_values[:, links]
+            local[reached] = np.arange(len(reached), dtype=np.int64)
+            try:
+                ancestor = np.where(from_root, -1, local[np.where(from_root, 0, prev)])
+                leaf_pos = np.flatnonzero((local[leaves] >= 0) & (leaves != root))
+                leaf_local = local[leaves[leaf_pos]]
+            finally:
+                local[reached] = -1
+            _tree_sums(sums, ancestor)
+            results.append(
+                (
+                    np.full(len(leaf_pos), root_pos, dtype=np.int64),
+                    leaf_pos,
+                    costs[leaves[leaf_pos]],
+                    sums[:, leaf_local],
+                )
+            )
+        if not results:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, np.zeros(0), np.zeros((len(link_values), 0))
+        root_pos, leaf_pos, costs, sums = zip(*results)
+        return (
+            np.concatenate(root_pos),
+            np.concatenate(leaf_pos),
+            np.concatenate(costs),
+            np.concatenate(sums, axis=1),
+        )
+
+    def all_or_nothing(
+        self,
+        roots: NumpyArray,
+        leaves: NumpyArray,
+        demand: NumpyArray,
+        link_values: NumpyArray = None,
+    ) -> Tuple[NumpyArray, NumpyArray, NumpyArray]:
+        """All-or-nothing assignment of the demand on the shortest paths, with skims.
+
+        The shortest path trees are run in batches of roots. The demand is
+        accumulated from the leaves up the trees by depth, and the path
+        sums of link values are calculated by pointer jumping, as in
+        shortest_path_skims.
+
+        Args:
+            roots: array of root (origin) node indices
+            leaves: array of leaf (destination) node indices
+            demand: array of shape (number of roots, number of leaves)
+            link_values: optional, array of shape (number of values, number
+                of links), link values to sum along the paths
+
+        Returns:
+            Three arrays: flows, costs, sums
+            flows: link flow array (indexed by link)
+            costs: array of shape (number of roots, number of leaves) of the
+                path costs, inf if no path, 0 for root == leaf
+            sums: array of shape (number of values, number of roots, number of
+                leaves) of the path sums of link_values, 0 if no path
+        """
+        roots = np.asarray(roots, dtype=np.int64)
+        leaves = np.asarray(leaves, dtype=np.int64)
+        demand = np.asarray(demand, dtype=np.float64)
+        if link_values is None or np.size(link_values) == 0:
+            link_values = np.zeros((0, self.num_links))
+        link_values = np.atleast_2d(np.asarray(link_values, dtype=np.float64))
+        num_values = len(link_values)
+        graph = self._rooted_graph(roots)
+        flows = np.zeros(self.num_links, dtype=np.float64)
+        costs = np.full((len(roots), len(leaves)), np.inf)
+        sums = np.zeros((num_values, len(roots), len(leaves)))
+        batch_size = max(1, _TREE_BATCH_SIZE // max(self.num_nodes, 1))
+        for start in range(0, len(roots), batch_size):
+            rows = slice(start, min(start + batch_size, len(roots)))
+            batch = np.arange(rows.start, rows.stop)
+            tree_costs, pred = dijkstra(
+                graph, indices=self.num_nodes + batch, return_predecessors=True
+            )
+            tree_costs = tree_costs[:, : self.num_nodes]
+            # reached (root, node) entries, flattened as batch pos * num_nodes + node
+            reached = np.flatnonzero(np.isfinite(tree_costs))
+            batch_pos, nodes = np.divmod(reached, self.num_nodes)
+            prev = pred[batch_pos, nodes].astype(np.int64)
+            from_root = prev >= self.num_nodes
+            links = self.link_index(
+                np.where(from_root, roots[batch[batch_pos]], prev), nodes
+            )
+            local = np.full(tree_costs.size, -1, dtype=np.int64)
+            local[reached] = np.arange(len(reached), dtype=np.int64)
+            parent = np.where(
+                from_root,
+                -1,
+                local[batch_pos * self.num_nodes + np.where(from_root, 0, prev)],
+            )
+            # the leaves for each root in the batch, excluding the root
+            leaf_flat = (
+                np.arange(len(batch))[:, np.newaxis] * self.num_nodes + leaves
+            ).ravel()
+            leaf_local = local[leaf_flat].reshape(len(batch), len(leaves))
+            intrazonal = leaves == roots[rows, np.newaxis]
+            leaf_local[intrazonal] = -1
+            is_leaf = leaf_local >= 0
+            costs[rows][is_leaf] = tree_costs.ravel()[leaf_flat[is_leaf.ravel()]]
+            costs[rows][intrazonal] = 0.0
+            # depth (number of links) and path sums by pointer jumping
+            tree_values = np.vstack([np.ones(len(reached)), link_values[:, links]])
+            _tree_sums(tree_values, parent.copy())
+            sums[:, rows][:, is_leaf] = tree_values[1:, leaf_local[is_leaf]]
+            # accumulate the demand from the deepest nodes up to the roots
+            node_flows = np.zeros(len(reached))
+            np.add.at(node_flows, leaf_local[is_leaf], demand[rows][is_leaf])
+            depth = tree_values[0].astype(np.int64)
+            order = np.argsort(-depth, kind="stable")
+            level_starts = np.flatnonzero(np.diff(depth[order], prepend=-1))
+            for level in np.split(order, level_starts[1:]):
+                level = level[parent[level] >= 0]
+                np.add.at(node_flows, parent[level], node_flows[level])
+            flows += np.bincount(links, weights=node_flows, minlength=self.num_links)
+        return flows, costs, sums
+
+    def _rooted_graph(self, roots: NumpyArray) -> csr_matrix:
+        """Return the CSR matrix of links with an extra source node for each root.
+
+        Links out of terminal nodes are excluded, the extra source nodes
+        (index num_nodes + position in roots) have the links out of the
+        roots, such that paths can start, but not pass through, the
+        terminal roots.
+
+        Args:
+            roots: array of root node indices
+        """
+        counts = np.diff(self._indptr)
+        counts[self._terminal] = 0
+        nodes = np.concatenate([np.arange(self.num_nodes, dtype=np.int64), roots])
+        counts = np.concatenate([counts, self._indptr[roots + 1] - self._indptr[roots]])
+        pos = concat_ranges(self._indptr[nodes], counts)
+        indptr = np.concatenate([[0], np.cumsum(counts)])
+        size = self.num_nodes + len(roots)
+        return csr_matrix(
+            (self._costs[pos], self._indices[pos], indptr), shape=(size, size)
+        )
+
+    def _sum_flows(
+        self, links: List[NumpyArray], flows: List[NumpyArray]
+    ) -> NumpyArray:
+        """Sum the lists of link index and flow arrays to a link flow array."""
+        if not links:
+            return np.zeros(self.num_links, dtype=np.float64)
+        return np.bincount(
+            np.concatenate(links),
+            weights=np.concatenate(flows),
+            minlength=self.num_links,
+        )
+
+
+def _tree_sums(sums: NumpyArray, ancestor: NumpyArray):
+    """Sum values along the paths of a tree to the root, in place, by pointer jumping.
+
+    Args:
+        sums: array of shape (number of values, number of tree nodes), the
+            value for the link into each node, replaced by the path sums
+        ancestor: position of the parent of each tree node, -1 for the root
+            (or first node), modified in place
+    """
+    has_ancestor = np.flatnonzero(ancestor >= 0)
+    while has_ancestor.size:
+        sums[:, has_ancestor] += sums[:, ancestor[has_ancestor]]
+        ancestor[has_ancestor] = ancestor[ancestor[has_ancestor]]
+        has_ancestor = has_ancestor[ancestor[has_ancestor] >= 0]
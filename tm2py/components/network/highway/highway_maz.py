@@ -9,6 +9,14 @@ distance (straight-line) to furthest destination. This limits the size of the
 shortest path calculated to the minimum required.
 The bin edges have been predefined after testing as (in miles):
     [0.0, 0.9, 1.2, 1.8, 2.5, 5.0, 10.0, max_dist]
+or are derived for each period from the demand to minimize the estimated
+search cost, see highway.maz_to_maz.distance_bins and adaptive_bin_edges.
+
+The shortest paths are calculated using the Emme shortest path tool
+(default), or using the Numpy / SciPy HighwayGraph in memory, as
+specified by highway.maz_to_maz.shortest_path_backend. The distance bins
+are processed concurrently, using up to emme.num_processors workers
+(see AssignMAZSPDemand._assign_bins).
 
 Input:
 Emme network with:
@@ -27,12 +35,15 @@ used as background traffic in the equilibrium Highway assignment.
 
 from __future__ import annotations
 
-import array as _array
 from collections import defaultdict as _defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from contextlib import contextmanager as _context
-from math import sqrt as _sqrt
 import os
-from typing import Dict, List, Union, BinaryIO, TYPE_CHECKING
+import shutil
+import tempfile
+import time as _time
+from typing import Dict, List, Tuple, Union, TYPE_CHECKING
+import zipfile
 
 import numpy as np
 import pandas as pd
@@ -40,9 +51,15 @@ import pandas as pd
 # from tables import NoSuchNodeError
 
 from tm2py.components.component import Component
-from tm2py.emme.manager import EmmeNode
-from tm2py.emme.matrix import OMXManager
-from tm2py.emme.network import NetworkCalculator
+from tm2py.components.network.highway.highway_graph import HighwayGraph
+from tm2py.emme.network import (
+    NetworkCalculator,
+    get_attribute_arrays,
+    set_attribute_arrays,
+    link_index_ids,
+    node_index_ids,
+)
+from tm2py.emme.paths import PathFile, read_text_paths
 from tm2py.logger import LogStartEnd
 from tm2py.tools import parse_num_processors
 
@@ -50,10 +67,186 @@ if TYPE_CHECKING:
     from tm2py.controller import RunController
 
 _default_bin_edges = [0.0, 0.9, 1.2, 1.8, 2.5, 5.0, 10.0]
-# Using text file format for now, can upgrade to binary format (faster) once
-# compatibility with new networks is verified
-_USE_BINARY = False
+# adaptive distance bins: edges are multiples of _BIN_EDGE_STEP (miles),
+# and estimated search cost per bin (in roots x square miles) for the
+# fixed shortest path run overhead, see bin_search_cost.
+# _BIN_OVERHEAD is in the same units as the search cost of the roots, a
+# run costs as much as searching a 1 mile radius from 2000 roots (or a
+# 10 mile radius from 20 roots). It is a rough value which keeps a bin for
+# a small group of long distance roots, but not for a few roots; it is not
+# calibrated, the predicted versus actual runtimes logged by
+# _log_bins_runtime (DEBUG) can be used to check the cost model.
+_BIN_EDGE_STEP = 0.05
+_BIN_OVERHEAD = 2000.0
+# buffer added to the search radius, in miles (100 feet)
+_RADIUS_BUFFER = 100 / 5280.0
+# max number of skim cells (roots x leaves) to process per chunk for export
+_EXPORT_CHUNK_CELLS = 2**24
+# number of roots per job for the "numpy" shortest path backend skims
+_SKIM_CHUNK_ROOTS = 200
 NumpyArray = np.array
+# MAZ-to-MAZ demand record: origin and destination node index (position in
+# the network node arrays), demand value and straight-line distance
+_demand_dtype = np.dtype(
+    [("orig", np.int64), ("dest", np.int64), ("dem", np.float64), ("dist", np.float64)]
+)
+# HighwayGraph (and skim arguments) in the worker processes for the "numpy"
+# shortest path backend
+_worker_graph = None
+_worker_skim_args = None
+
+
+def _init_graph_worker(graph: HighwayGraph):
+    """Initialize worker process with the graph for the MAZ-to-MAZ shortest paths."""
+    global _worker_graph  # pylint: disable=W0603
+    _worker_graph = graph
+
+
+def _assign_flow_worker(
+    origins: NumpyArray, dests: NumpyArray, demand: NumpyArray, radius: float
+) -> Tuple[NumpyArray, float, float]:
+    """Assign demand in worker process, see HighwayGraph.assign_flow."""
+    return _worker_graph.assign_flow(origins, dests, demand, radius)
+
+
+def _init_skim_worker(
+    graph: HighwayGraph,
+    leaves: Tuple[NumpyArray, NumpyArray],
+    link_values: NumpyArray,
+    max_cost: float,
+):
+    """Initialize worker process with the graph for the MAZ-to-MAZ skims."""
+    global _worker_skim_args  # pylint: disable=W0603
+    _worker_skim_args = (graph, leaves, link_values, max_cost)
+
+
+def _skim_worker(roots: Tuple[NumpyArray, NumpyArray]) -> Dict[str, NumpyArray]:
+    """Calculate skims in worker process, see _skim_roots."""
+    return _skim_roots(*_worker_skim_args, roots)
+
+
+def _skim_roots(
+    graph: HighwayGraph,
+    leaves: Tuple[NumpyArray, NumpyArray],
+    link_values: NumpyArray,
+    max_cost: float,
+    roots: Tuple[NumpyArray, NumpyArray],
+) -> Dict[str, NumpyArray]:
+    """Calculate the MAZ-to-MAZ skims from the roots to all leaves.
+
+    Args:
+        graph: the HighwayGraph with the MAZ-to-MAZ link costs
+        leaves: array of leaf node indices and array of leaf MAZ IDs
+        link_values: link length and bridge toll (array of shape (2, links))
+        max_cost: max path cost
+        roots: array of root node indices and array of root MAZ IDs
+
+    Returns:
+        Dictionary of skim rows for the writer (see MAZSkimWriter), for the
+        valid O-D pairs with 0 < COST < 1e19.
+    """
+    root_pos, leaf_pos, costs, sums = graph.shortest_path_skims(
+        roots[0], leaves[0], link_values, max_cost
+    )
+    valid = (costs > 0) & (costs < 1e19)
+    return {
+        "FROM_ZONE": roots[1][root_pos[valid]],
+        "TO_ZONE": leaves[1][leaf_pos[valid]],
+        "COST": costs[valid],
+        "DISTANCE": sums[0][valid],
+        "BRIDGETOLL": sums[1][valid],
+    }
+
+
+def _split_by_origin(demand: NumpyArray, num_chunks: int) -> List[NumpyArray]:
+    """Split the demand (sorted by origin) into chunks with all of the demand
+    from each origin in the same chunk.
+
+    Args:
+        demand: structured array of demand (see AssignMAZSPDemand._process_demand)
+        num_chunks: max number of chunks, fewer if there are fewer origins
+    """
+    _, starts = np.unique(demand["orig"], return_index=True)
+    bounds = np.linspace(0, len(starts), num_chunks + 1).astype(np.int64)[1:-1]
+    return [chunk for chunk in np.split(demand, starts[bounds]) if len(chunk)]
+
+
+def bin_search_cost(max_dists: NumpyArray, bin_edges: List[float]) -> float:
+    """Return the estimated shortest path search cost for the distance bins.
+
+    The cost model is the sum over the bins of the number of roots
+    (origins) x the search area (radius squared, in square miles) plus
+    a fixed overhead per bin for each shortest path run.
+
+    Args:
+        max_dists: origin to furthest destination distance for each
+            origin, in miles
+        bin_edges: list of bin edges in miles, starting at 0.0, each origin
+            is in the first bin with edge > max_dist
+
+    Returns:
+        Estimated cost in units of roots x square miles
+    """
+    edges = np.asarray(bin_edges[1:], dtype=np.float64)
+    bins = np.searchsorted(edges, max_dists, side="right")
+    bins = bins[bins < len(edges)]
+    radius = edges[bins] + _RADIUS_BUFFER
+    return float((radius**2).sum() + _BIN_OVERHEAD * len(np.unique(bins)))
+
+
+def adaptive_bin_edges(max_dists: NumpyArray, max_bins: int) -> List[float]:
+    """Return the distance bin edges which minimize the estimated search cost.
+
+    Dynamic programming over the candidate edges, which are the origin
+    max_dists rounded up to _BIN_EDGE_STEP, see bin_search_cost for the
+    cost model.
+
+    Args:
+        max_dists: origin to furthest destination distance for each
+            origin, in miles
+        max_bins: the max number of bins
+
+    Returns:
+        List of bin edges in miles, starting at 0.0, such that all origins
+        are in a bin
+    """
+    if len(max_dists) == 0:
+        return [0.0]
+    upper = (np.floor(max_dists / _BIN_EDGE_STEP) + 1) * _BIN_EDGE_STEP
+    # bin edge must be strictly greater than the max_dist
+    upper = np.where(upper > max_dists, upper, upper + _BIN_EDGE_STEP)
+    candidates = np.unique(upper)
+    num_candidates = len(candidates)
+    # number of roots for each candidate, if it is the next edge (same as
+    # bin_search_cost / _group_demand)
+    counts = np.bincount(
+        np.searchsorted(candidates, max_dists, side="right"), minlength=num_candidates
+    )
+    num_roots = np.concatenate([[0], np.cumsum(counts)])
+    radius_sq = (candidates + _RADIUS_BUFFER) ** 2
+    # cost[j]: min cost for the roots up to candidate j - 1 with k bins,
+    # where the last bin edge is candidate j - 1
+    cost = np.full(num_candidates + 1, np.inf)
+    cost[0] = 0.0
+    prev_end = np.zeros((max_bins + 1, num_candidates + 1), dtype=np.int64)
+    best_cost, best_num_bins = np.inf, 1
+    for k in range(1, max_bins + 1):
+        next_cost = np.full(num_candidates + 1, np.inf)
+        for j in range(1, num_candidates + 1):
+            bin_cost = (
+                cost[:j] + (num_roots[j] - num_roots[:j]) * radius_sq[j - 1]
+            ) + _BIN_OVERHEAD
+            prev_end[k, j] = np.argmin(bin_cost)
+            next_cost[j] = bin_cost[prev_end[k, j]]
+        cost = next_cost
+        if cost[num_candidates] < best_cost:
+            best_cost, best_num_bins = cost[num_candidates], k
+    edges = []
+    j = num_candidates
+    for k in range(best_num_bins, 0, -1):
+        edges.append(float(candidates[j - 1]))
+        j = prev_end[k, j]
+    return [0.0] + edges[::-1]
 
 
 class AssignMAZSPDemand(Component):
@@ -85,9 +278,18 @@ class AssignMAZSPDemand(Component):
         self._mazs = None
         self._demand = None
         self._max_dist = 0
+        self._num_bins = 0
+        self._estimated_cost = 0
         self._network = None
-        self._root_index = None
-        self._leaf_index = None
+        self._node_index = None
+        self._node_ids = None
+        self._node_xy = None
+        self._node_maz_ids = None
+        self._graph = None
+        self._link_index = None
+        self._link_flows = None
+        # total estimated search cost and runtime, for runtime prediction
+        self._bins_runtime = (0, 0)
 
     @LogStartEnd()
     def run(self):
@@ -113,12 +315,15 @@ class AssignMAZSPDemand(Component):
                             )
                             continue
                         self._process_demand(time, i, maz_ids)
+                    # the demand arrays are not needed during the assignment
+                    omx_read_cache = self.controller.omx_read_cache
+                    omx_read_cache.log_stats(self.logger)
+                    omx_read_cache.clear()
                     demand_bins = self._group_demand()
-                    for i, demand_group in enumerate(demand_bins):
-                        self._find_roots_and_leaves(demand_group["demand"])
-                        self._set_link_cost_maz()
-                        self._run_shortest_path(time, i, demand_group["dist"])
-                        self._assign_flow(time, i, demand_group["demand"])
+                    start_time = _time.perf_counter()
+                    self._assign_bins(time, demand_bins)
+                    self._log_bins_runtime(_time.perf_counter() - start_time)
+                    self._save_link_flows()
 
     @_context
     def _setup(self, time: str):
@@ -128,11 +333,18 @@ class AssignMAZSPDemand(Component):
             time: name of the time period
         """
         self._mazs = None
-        self._demand = _defaultdict(lambda: [])
+        self._demand = []
         self._max_dist = 0
+        self._num_bins = 0
+        self._estimated_cost = 0
         self._network = None
-        self._root_index = None
-        self._leaf_index = None
+        self._node_index = None
+        self._node_ids = None
+        self._node_xy = None
+        self._node_maz_ids = None
+        self._graph = None
+        self._link_index = None
+        self._link_flows = None
         attributes = [
             ("LINK", "@link_cost", "total cost MAZ-MAZ"),
             ("LINK", "@link_cost_maz", "cost MAZ-MAZ, unused MAZs blocked"),
@@ -149,22 +361,30 @@ class AssignMAZSPDemand(Component):
                     self._mazs = None
                     self._demand = None
                     self._network = None
-                    self._root_index = None
-                    self._leaf_index = None
+                    self._node_index = None
+                    self._node_ids = None
+                    self._node_xy = None
+                    self._node_maz_ids = None
+                    self._graph = None
+                    self._link_index = None
+                    self._link_flows = None
                     # delete sp path files
-                    for bin_no in range(len(self._bin_edges)):
-                        file_path = os.path.join(
-                            self._eb_dir, f"sp_{time}_{bin_no}.ebp"
-                        )
-                        if os.path.exists(file_path):
-                            os.remove(file_path)
+                    for bin_no in range(self._num_bins):
+                        for ext in ["ebp", "txt"]:
+                            file_path = os.path.join(
+                                self._eb_dir, f"sp_{time}_{bin_no}.{ext}"
+                            )
+                            if os.path.exists(file_path):
+                                os.remove(file_path)
 
     def _prepare_network(self):
         """Calculate link cost (travel time + bridge tolls + operating cost) and load network.
 
         Reads Emme network from disk for later node lookups. Optimized to only load
         attribute values of interest, additional attributes must be added in
-        order to be read from disk.
+        order to be read from disk. The node IDs, coordinates and MAZ IDs
+        are also loaded as Numpy arrays, demand and paths reference nodes by
+        index in these arrays.
         """
         if self._scenario.has_traffic_results:
             time_attr = "(@free_flow_time.max.timau)"
@@ -178,9 +398,56 @@ class AssignMAZSPDemand(Component):
         self._network = self.controller.emme_manager.get_network(
             self._scenario, {"NODE": ["@maz_id", "x", "y", "#node_county"], "LINK": []}
         )
-        self._network.create_attribute("LINK", "temp_flow")
+        self._node_index, nodes = get_attribute_arrays(
+            self._network, "NODE", ["x", "y", "@maz_id"]
+        )
+        self._node_ids = node_index_ids(self._node_index)
+        self._node_xy = np.column_stack([nodes["x"], nodes["y"]])
+        self._node_maz_ids = nodes["@maz_id"]
+        self._load_graph()
+
+    def _load_graph(self):
+        """Load the network links to HighwayGraph for path link lookups and flows.
+
+        The link flows from all bins are summed by link index in
+        self._link_flows, for both shortest path backends.
+
+        For the "numpy" backend the graph is also used for the in-memory
+        shortest paths. The link costs are @link_cost_maz, which is @link_cost
+        on the links with the highway.maz_to_maz.mode_code and 1e20
+        (unavailable) otherwise. MAZ nodes and centroids are terminal nodes
+        (paths cannot pass through), used in place of blocking the connectors
+        to unused MAZs as in _set_link_cost_maz.
+        """
+        if self.config.highway.maz_to_maz.shortest_path_backend == "numpy":
+            mode_code = self.config.highway.maz_to_maz.mode_code
+            net_calc = NetworkCalculator(self._scenario)
+            net_calc.add_calc("@link_cost_maz", "1e20")
+            net_calc.add_calc("@link_cost_maz", "@link_cost", f"mode={mode_code}")
+            net_calc.run()
+            cost_attr = "@link_cost_maz"
+        else:
+            # only used for the link lookups, paths are from Emme shortest path
+            cost_attr = "@link_cost"
+        self._link_index, links = get_attribute_arrays(
+            self._scenario, "LINK", [cost_attr]
+        )
+        centroids = [node.number for node in self._network.nodes() if node.is_centroid]
+        terminal = (self._node_maz_ids > 0) | np.isin(self._node_ids, centroids)
+        i_node_ids, j_node_ids = link_index_ids(self._link_index)
+        node_order = np.argsort(self._node_ids)
+        sorted_ids = self._node_ids[node_order]
+        self._graph = HighwayGraph(
+            self._node_ids,
+            self._node_xy,
+            node_order[np.searchsorted(sorted_ids, i_node_ids)],
+            node_order[np.searchsorted(sorted_ids, j_node_ids)],
+            links[cost_attr],
+            terminal,
+        )
+        self._link_flows = np.zeros(self._graph.num_links)
 
-    def _get_county_mazs(self, counties: List[str]) -> List[EmmeNode]:
+    def _get_county_mazs(self, counties: List[str]) -> NumpyArray:
         """Get all MAZ nodes which are located in one of these counties.
 
         Used the node attribute #node_county to identify the node location.
@@ -191,7 +458,7 @@ class AssignMAZSPDemand(Component):
             counties: list of county names
 
         Returns:
-            List of MAZ nodes (Emme Node) which are in these counties.
+            Array of MAZ node indices which are in these counties, sorted by MAZ ID.
         """
         network = self._network
         # NOTE: every maz must have a valid #node_county
@@ -199,50 +466,53 @@ class AssignMAZSPDemand(Component):
             self._mazs = _defaultdict(lambda: [])
             for node in network.nodes():
                 if node["@maz_id"]:
-                    self._mazs[node["#node_county"]].append(node)
+                    self._mazs[node["#node_county"]].append(
+                        self._node_index[node.number]
+                    )
         mazs = []
         for county in counties:
             mazs.extend(self._mazs[county])
-        return sorted(mazs, key=lambda n: n["@maz_id"])
+        mazs = np.array(mazs, dtype=np.int64)
+        return mazs[np.argsort(self._node_maz_ids[mazs], kind="stable")]
 
-    def _process_demand(self, time: str, index: int, maz_ids: List[EmmeNode]):
-        """Loads the demand from file and groups by origin node.
+    def _process_demand(self, time: str, index: int, maz_ids: NumpyArray):
+        """Loads the demand from file and calculates the origin to destination distances.
 
-        Sets the demand to self._demand for later processing, grouping the demand in
-        a dictionary by origin node (Emme Node object) to list of dictionaries
-        {"orig": orig_node, "dest": dest_node, "dem": demand, "dist": dist}
+        Appends the demand to self._demand for later processing, as a structured
+        array with fields (see _demand_dtype):
+            "orig": origin node index, "dest": destination node index,
+            "dem": demand, "dist": straight-line distance
 
         Args:
             time: time period name
             index: group index of the demand file, used to find the file by name
-            maz_ids: indexed list of MAZ ID nodes for the county group
+            maz_ids: indexed array of MAZ node indices for the county group
                 (active counties for this demand file)
         """
         data = self._read_demand_array(time, index)
         origins, destinations = data.nonzero()
-        for orig, dest in zip(origins, destinations):
-            # skip intra-maz demand
-            if orig == dest:
-                continue
-            orig_node = maz_ids[orig]
-            dest_node = maz_ids[dest]
-            dist = _sqrt(
-                (dest_node.x - orig_node.x) ** 2 + (dest_node.y - orig_node.y) ** 2
-            )
-            if dist > self._max_dist:
-                self._max_dist = dist
-            self._demand[orig_node].append(
-                {
-                    "orig": orig_node,
-                    "dest": dest_node,
-                    "dem": data[orig][dest],
-                    "dist": dist,
-                }
-            )
+        # skip intra-maz demand
+        inter_maz = origins != destinations
+        origins, destinations = origins[inter_maz], destinations[inter_maz]
+        demand = np.zeros(len(origins), dtype=_demand_dtype)
+        demand["orig"] = maz_ids[origins]
+        demand["dest"] = maz_ids[destinations]
+        demand["dem"] = data[origins, destinations]
+        orig_xy = self._node_xy[demand["orig"]]
+        dest_xy = self._node_xy[demand["dest"]]
+        demand["dist"] = np.sqrt(
+            (dest_xy[:, 0] - orig_xy[:, 0]) ** 2 + (dest_xy[:, 1] - orig_xy[:, 1]) ** 2
+        )
+        if len(demand):
+            self._max_dist = max(self._max_dist, demand["dist"].max())
+        self._demand.append(demand)
 
     def _read_demand_array(self, time: str, index: int) -> NumpyArray:
         """Load the demand from file with the specified time and index name.
 
+        The demand is read through the controller omx_read_cache, the
+        returned array is shared and read-only.
+
         Args:
             time: time period name
             index: group index of the demand file, used to find the file by name
@@ -251,45 +521,246 @@ class AssignMAZSPDemand(Component):
         omx_file_path = self.get_abs_path(
             file_path_tmplt.format(period=time, number=index)
         )
-        with OMXManager(omx_file_path, "r") as omx_file:
-            demand_array = omx_file.read("M0")
-        return demand_array
+        return self.controller.omx_read_cache.read(omx_file_path, "M0")
 
-    def _group_demand(
-        self,
-    ) -> List[Dict[str, Union[float, List[Dict[str, Union[float, EmmeNode]]]]]]:
+    def _group_demand(self) -> List[Dict[str, Union[float, NumpyArray]]]:
         """Process the demand loaded from files and create groups based on the
         origin to the furthest destination with demand.
 
         Returns:
-            List of dictionaries, containing the demand in the format
-                {"orig": EmmeNode, "dest": EmmeNode, "dem": float (demand value)}
-
+            List of dictionaries, containing the bin "dist" and the "demand"
+                structured array (see _process_demand)
         """
         # group demand from same origin into distance bins by furthest
         # distance destination to limit shortest path search radius
-        bin_edges = self._bin_edges[:]
-        if bin_edges[-1] < self._max_dist / 5280.0:
-            bin_edges.append(self._max_dist / 5280.0)
-
+        demand = (
+            np.concatenate(self._demand) if self._demand else np.zeros(0, _demand_dtype)
+        )
+        demand = demand[np.argsort(demand["orig"], kind="stable")]
+        _, starts, counts = np.unique(
+            demand["orig"], return_index=True, return_counts=True
+        )
+        if len(demand):
+            max_dist = np.maximum.reduceat(demand["dist"], starts) / 5280.0
+        else:
+            max_dist = np.zeros(0)
+        bin_edges = self._get_bin_edges(max_dist)
+        # index of the first bin with edge > max_dist, demand from origins with
+        # max_dist >= the last edge is not in any bin
+        origin_bins = np.searchsorted(bin_edges[1:], max_dist, side="right")
+        demand_bins = np.repeat(origin_bins, counts)
         demand_groups = [
-            {"dist": edge, "demand": []} for i, edge in enumerate(bin_edges[1:])
+            {"dist": edge, "demand": demand[demand_bins == i]}
+            for i, edge in enumerate(bin_edges[1:])
         ]
-        for data in self._demand.values():
-            max_dist = max(entry["dist"] for entry in data) / 5280.0
-            for group in demand_groups:
-                if max_dist < group["dist"]:
-                    group["demand"].extend(data)
-                    break
         for group in demand_groups:
             self.logger.log_time(
                 f"bin dist {group['dist']}, size {len(group['demand'])}", level="DEBUG"
             )
         # Filter out groups without any demand
-        demand_groups = [group for group in demand_groups if group["demand"]]
+        demand_groups = [group for group in demand_groups if len(group["demand"])]
+        self._num_bins = len(demand_groups)
         return demand_groups
 
-    def _find_roots_and_leaves(self, demand: List[Dict[str, Union[float, EmmeNode]]]):
+    def _get_bin_edges(self, max_dist: NumpyArray) -> List[float]:
+        """Return the distance bin edges for the origin max distances.
+
+        Uses the fixed bin edges, or derives the bin edges with
+        adaptive_bin_edges, as specified by highway.maz_to_maz.distance_bins.
+        The estimated search cost of the bins is saved for the runtime log.
+
+        Args:
+            max_dist: origin to furthest destination distance for each
+                origin, in miles
+
+        Returns:
+            List of bin edges in miles, starting at 0.0
+        """
+        maz_to_maz = self.config.highway.maz_to_maz
+        if maz_to_maz.distance_bins == "adaptive":
+            bin_edges = adaptive_bin_edges(max_dist, maz_to_maz.max_distance_bins)
+        else:
+            bin_edges = self._bin_edges[:]
+            if bin_edges[-1] < self._max_dist / 5280.0:
+                bin_edges.append(self._max_dist / 5280.0)
+        self._estimated_cost = bin_search_cost(max_dist, bin_edges)
+        self.logger.log(
+            f"{maz_to_maz.distance_bins} distance bin edges (miles): "
+            f"{', '.join(f'{edge:.2f}' for edge in bin_edges)}, "
+            f"estimated search cost {self._estimated_cost:.0f}",
+            level="DEBUG",
+        )
+        return bin_edges
+
+    def _log_bins_runtime(self, runtime: float):
+        """Log the predicted versus the actual runtime for the distance bins.
+
+        The runtime is predicted from the estimated search cost of the bins
+        (see bin_search_cost), using the runtime per unit of cost
+        of the previous periods; there is no prediction for the first period.
+
+        Args:
+            runtime: actual runtime in seconds for the shortest paths and
+                flow assignment of all of the bins
+        """
+        total_cost, total_runtime = self._bins_runtime
+        if total_cost > 0:
+            predicted = f"{self._estimated_cost * total_runtime / total_cost:.1f}s"
+        else:
+            predicted = "n/a"
+        self.logger.log(
+            f"distance bins predicted runtime {predicted}, "
+            f"actual runtime {runtime:.1f}s",
+            level="DEBUG",
+        )
+        self._bins_runtime = (
+            total_cost + self._estimated_cost,
+            total_runtime + runtime,
+        )
+
+    def _assign_bins(
+        self, time: str, demand_bins: List[Dict[str, Union[float, NumpyArray]]]
+    ):
+        """Run the shortest paths and assign the demand for all distance bins.
+
+        Args:
+            time: time period name
+            demand_bins: list of dictionaries of the bin "dist" and "demand" array
+        """
+        num_processors = parse_num_processors(self.config.emme.num_processors)
+        if self.config.highway.maz_to_maz.shortest_path_backend == "numpy":
+            self._assign_bins_graph(demand_bins, num_processors)
+        else:
+            self._assign_bins_emme(time, demand_bins)
+
+    def _assign_bins_emme(
+        self, time: str, demand_bins: List[Dict[str, Union[float, NumpyArray]]]
+    ):
+        """Run the Emme shortest paths and assign the demand for all distance bins.
+
+        The shortest paths are run one bin at a time (the Emme tool uses
+        the num_processors), and the path file parsing and flow
+        accumulation for each bin is run in a background thread, concurrent
+        with the shortest path for the next bin.
+
+        Args:
+            time: time period name
+            demand_bins: list of dictionaries of the bin "dist" and "demand" array
+        """
+        with ThreadPoolExecutor(max_workers=1) as flow_executor:
+            pending = None
+            for bin_no, demand_group in enumerate(demand_bins):
+                self._find_roots_and_leaves(demand_group["demand"])
+                self._set_link_cost_maz()
+                self._run_shortest_path(time, bin_no, demand_group["dist"])
+                # wait for previous bin, only one flow assignment at a time
+                if pending is not None:
+                    pending.result()
+                pending = flow_executor.submit(
+                    self._assign_flow, time, bin_no, demand_group["demand"]
+                )
+            if pending is not None:
+                pending.result()
+
+    def _assign_bins_graph(
+        self,
+        demand_bins: List[Dict[str, Union[float, NumpyArray]]],
+        num_processors: int,
+    ):
+        """Run the HighwayGraph shortest paths and assign the demand for all distance bins.
+
+        The demand in each bin is split into chunks by origin, which are run
+        in num_processors worker processes, each with a copy of the graph.
+        The partial link flows are summed as they are completed.
+
+        Args:
+            demand_bins: list of dictionaries of the bin "dist" and "demand" array
+            num_processors: number of worker processes
+        """
+        if num_processors <= 1:
+            for bin_no, demand_group in enumerate(demand_bins):
+                self._assign_flow_graph(
+                    bin_no, demand_group["demand"], demand_group["dist"]
+                )
+            return
+        totals = _defaultdict(lambda: [0, 0.0, 0.0])
+        with ProcessPoolExecutor(
+            max_workers=num_processors,
+            initializer=_init_graph_worker,
+            initargs=(self._graph,),
+        ) as executor:
+            pending = {}
+            for bin_no, demand_group in enumerate(demand_bins):
+                max_radius = demand_group["dist"] * 5280 + 100  # buffer for rounding
+                totals[bin_no][0] = len(demand_group["demand"])
+                for demand in _split_by_origin(demand_group["demand"], num_processors):
+                    future = executor.submit(
+                        _assign_flow_worker,
+                        demand["orig"],
+                        demand["dest"],
+                        demand["dem"],
+                        max_radius,
+                    )
+                    pending[future] = bin_no
+            for future in as_completed(pending):
+                bin_no = pending.pop(future)
+                flows, assigned, not_assigned = future.result()
+                self._link_flows += flows
+                totals[bin_no][1] += assigned
+                totals[bin_no][2] += not_assigned
+        for bin_no, (total, assigned, not_assigned) in sorted(totals.items()):
+            self.logger.log_time(f"ASSIGN bin {bin_no}: total: {total}", level="DEBUG")
+            self.logger.log_time(
+                f"assigned: {assigned}, not assigned: {not_assigned}", level="DEBUG"
+            )
+
+    def _assign_flow_graph(self, bin_no: int, demand: NumpyArray, max_radius: float):
+        """Assign the demand along the shortest paths calculated with the HighwayGraph.
+
+        Args:
+            bin_no: bin number (id) for this demand segment
+            demand: structured array of demand (see _process_demand)
+            max_radius: max unit coordinate distance to limit search tree
+        """
+        max_radius = max_radius * 5280 + 100  # add some buffer for rounding error
+        flows, assigned, not_assigned = self._graph.assign_flow(
+            demand["orig"], demand["dest"], demand["dem"], max_radius
+        )
+        self._link_flows += flows
+        self.logger.log_time(
+            f"ASSIGN bin {bin_no}: total: {len(demand)}", level="DEBUG"
+        )
+        self.logger.log_time(
+            f"assigned: {assigned}, not assigned: {not_assigned}", level="DEBUG"
+        )
+
+    def _add_path_flows(
+        self, path_nodes: NumpyArray, path_lengths: NumpyArray, demand: NumpyArray
+    ):
+        """Add the demand along the paths to the link flows.
+
+        Args:
+            path_nodes: concatenated node IDs of all of the paths
+            path_lengths: number of nodes in each path
+            demand: demand value for each path
+        """
+        links, path_pos = self._graph.path_links(path_nodes, path_lengths)
+        if (links < 0).any():
+            raise Exception(
+                f"{(links < 0).sum()} path links not found in the network, "
+                "check the shortest path results"
+            )
+        self._link_flows += np.bincount(
+            links, weights=demand[path_pos], minlength=self._graph.num_links
+        )
+
+    def _save_link_flows(self):
+        """Save the link flows summed from all bins to @maz_flow in the scenario."""
+        set_attribute_arrays(
+            self._scenario, "LINK", self._link_index, {"@maz_flow": self._link_flows}
+        )
+
+    def _find_roots_and_leaves(self, demand: NumpyArray):
         """Label available MAZ root nodes and leaf nodes for the path calculation.
 
         The MAZ nodes which are found as origins in the demand are "activated"
@@ -297,26 +768,17 @@ class AssignMAZSPDemand(Component):
         set to non-zero.
 
         Args:
-            demand: list of dictionaries, containing the demand in the format
-                {"orig": EmmeNode, "dest": EmmeNode, "dem": float (demand value)}
+            demand: structured array of demand (see _process_demand)
         """
-        network = self._network
-        attrs_to_init = [("NODE", ["@maz_root", "@maz_leaf"]), ("LINK", ["maz_cost"])]
-        for domain, attrs in attrs_to_init:
-            for name in attrs:
-                if name in network.attributes(domain):
-                    network.delete_attribute(domain, name)
-                network.create_attribute(domain, name)
-        root_maz_ids = {}
-        leaf_maz_ids = {}
-        for data in demand:
-            o_node, d_node = data["orig"], data["dest"]
-            root_maz_ids[o_node.number] = o_node["@maz_root"] = o_node["@maz_id"]
-            leaf_maz_ids[d_node.number] = d_node["@maz_leaf"] = d_node["@maz_id"]
-        self._root_index = {p: i for i, p in enumerate(sorted(root_maz_ids.keys()))}
-        self._leaf_index = {q: i for i, q in enumerate(sorted(leaf_maz_ids.keys()))}
-        self.controller.emme_manager.copy_attr_values(
-            "NODE", self._network, self._scenario, ["@maz_root", "@maz_leaf"]
+        maz_root = np.zeros(len(self._node_ids))
+        maz_leaf = np.zeros(len(self._node_ids))
+        maz_root[demand["orig"]] = self._node_maz_ids[demand["orig"]]
+        maz_leaf[demand["dest"]] = self._node_maz_ids[demand["dest"]]
+        set_attribute_arrays(
+            self._scenario,
+            "NODE",
+            self._node_index,
+            {"@maz_root": maz_root, "@maz_leaf": maz_leaf},
         )
 
     def _set_link_cost_maz(self):
@@ -346,7 +808,8 @@ class AssignMAZSPDemand(Component):
             "inro.emme.network_calculation.shortest_path"
         )
         max_radius = max_radius * 5280 + 100  # add some buffer for rounding error
-        ext = "ebp" if _USE_BINARY else "txt"
+        use_binary = self.config.highway.maz_to_maz.path_file_format == "binary"
+        ext = "ebp" if use_binary else "txt"
         file_name = f"sp_{time}_{bin_no}.{ext}"
         num_processors = parse_num_processors(self.config.emme.num_processors)
         spec = {
@@ -370,7 +833,7 @@ class AssignMAZSPDemand(Component):
                     "analyses": [],
                 },
                 "path_output": {
-                    "format": "BINARY" if _USE_BINARY else "TEXT",
+                    "format": "BINARY" if use_binary else "TEXT",
                     "file": os.path.join(self._eb_dir, file_name),
                 },
             },
@@ -382,51 +845,59 @@ class AssignMAZSPDemand(Component):
         }
         shortest_paths_tool(spec, self._scenario)
 
-    def _assign_flow(
-        self, time: str, bin_no: int, demand: List[Dict[str, Union[float, EmmeNode]]]
-    ):
+    def _assign_flow(self, time: str, bin_no: int, demand: NumpyArray):
         """Assign the demand along the paths generated from the shortest path tool.
 
         Args:
             time: time period name
             bin_no: bin number (id) for this demand segment
-            demand: list of dictionaries, containing the demand in the format
-                {"orig": EmmeNode, "dest": EmmeNode, "dem": float (demand value)}
+            demand: structured array of demand (see _process_demand)
         """
-        if _USE_BINARY:
+        if self.config.highway.maz_to_maz.path_file_format == "binary":
             self._assign_flow_binary(time, bin_no, demand)
         else:
             self._assign_flow_text(time, bin_no, demand)
 
-    def _assign_flow_text(
-        self, time: str, bin_no: int, demand: List[Dict[str, Union[float, EmmeNode]]]
-    ):
+    def _assign_flow_text(self, time: str, bin_no: int, demand: NumpyArray):
         """Assign the demand along the paths generated from the shortest path tool.
 
-        The paths are read from a text format file, see Emme help for details.
-        Demand is summed in self._network (in memory) using temp_flow attribute
-        and written to scenario (Emmebank / disk) @maz_flow.
+        The paths are read from a text format file in blocks, see
+        tm2py.emme.paths.read_text_paths, and joined to the demand by
+        (origin, destination) node ID, such that only one block of paths is
+        in memory at a time. Demand is summed by link index to
+        self._link_flows, which is written to scenario (Emmebank / disk)
+        @maz_flow after all bins are assigned.
 
         Args:
             time: time period name
             bin_no: bin number (id) for this demand segment
-            demand: list of dictionaries, containin the demand in the format
-                {"orig": EmmeNode, "dest": EmmeNode, "dem": float (demand value)}
+            demand: structured array of demand (see _process_demand)
         """
-        paths = self._load_text_format_paths(time, bin_no)
-        not_assigned, assigned = 0, 0
-        for data in demand:
-            orig, dest, dem = data["orig"].number, data["dest"].number, data["dem"]
-            path = paths.get(orig, {}).get(dest)
-            if path is None:
-                not_assigned += dem
-                continue
-            i_node = orig
-            for j_node in path:
-                link = self._network.link(i_node, j_node)
-                link["temp_flow"] += dem
-                i_node = j_node
-            assigned += dem
+        # demand by unique, sorted (origin, destination) node ID key
+        od_keys, od_index = np.unique(
+            self._od_keys(
+                self._node_ids[demand["orig"]], self._node_ids[demand["dest"]]
+            ),
+            return_inverse=True,
+        )
+        od_demand = np.bincount(od_index, weights=demand["dem"], minlength=len(od_keys))
+        found = np.zeros(len(od_keys), dtype=bool)
+        file_path = os.path.join(self._eb_dir, f"sp_{time}_{bin_no}.txt")
+        for path_nodes, path_lengths in read_text_paths(file_path):
+            path_ends = np.cumsum(path_lengths)
+            path_keys = self._od_keys(
+                path_nodes[path_ends - path_lengths], path_nodes[path_ends - 1]
+            )
+            pos = np.searchsorted(od_keys, path_keys).clip(0, max(len(od_keys) - 1, 0))
+            has_demand = od_keys[pos] == path_keys
+            found[pos[has_demand]] = True
+            node_has_demand = np.repeat(has_demand, path_lengths)
+            self._add_path_flows(
+                path_nodes[node_has_demand],
+                path_lengths[has_demand],
+                od_demand[pos[has_demand]],
+            )
+        assigned, not_assigned = od_demand[found].sum(), od_demand[~found].sum()
         self.logger.log_time(
             f"ASSIGN bin {bin_no}: total: {len(demand)}", level="DEBUG"
         )
@@ -434,151 +905,50 @@ class AssignMAZSPDemand(Component):
             f"assigned: {assigned}, not assigned: {not_assigned}", level="DEBUG"
         )
 
-    def _load_text_format_paths(
-        self, time: str, bin_no: int
-    ) -> Dict[int, Dict[int, List[int]]]:
-        """Load all paths from text file and return as nested dictionary.
+    @staticmethod
+    def _od_keys(orig_ids: NumpyArray, dest_ids: NumpyArray) -> NumpyArray:
+        """Return the packed int64 key for the (origin, destination) node ID pairs.
 
         Args:
-            time: time period name
-            bin_no: bin number (id) for this demand segment
-
-        Returns:
-            All paths as a nested dictionary, path = paths[origin][destination],
-            using the node IDs as integers.
+            orig_ids: array of origin node IDs
+            dest_ids: array of destination node IDs
         """
-        paths = _defaultdict(lambda: {})
-        with open(
-            os.path.join(self._eb_dir, f"sp_{time}_{bin_no}.txt"),
-            "r",
-            encoding="utf8",
-        ) as paths_file:
-            for line in paths_file:
-                nodes = [int(x) for x in line.split()]
-                paths[nodes[0]][nodes[-1]] = nodes[1:]
-        return paths
-
-    def _assign_flow_binary(
-        self, time: str, bin_no: int, demand: List[Dict[str, Union[float, EmmeNode]]]
-    ):
+        return (orig_ids.astype(np.int64) << 32) | dest_ids.astype(np.int64)
+
+    def _assign_flow_binary(self, time: str, bin_no: int, demand: NumpyArray):
         """Assign the demand along the paths generated from the shortest path tool.
 
-        The paths are read from a binary format file, see Emme help for details.
-        Demand is summed in self._network (in memory) using temp_flow attribute
-        and written to scenario (Emmebank / disk) @maz_flow.
+        The paths are read from a binary format file via memory map, see
+        tm2py.emme.paths.PathFile. The path slices for all of the demand
+        are resolved in one pass. Demand is summed by link index to
+        self._link_flows, which is written to scenario (Emmebank / disk)
+        @maz_flow after all bins are assigned.
 
         Args:
             time: time period name
             bin_no: bin number (id) for this demand segment
-            demand: list of dictionaries, containin the demand in the format
-                {"orig": EmmeNode, "dest": EmmeNode, "dem": float (demand value)}
+            demand: structured array of demand (see _process_demand)
         """
         file_name = f"sp_{time}_{bin_no}.ebp"
-        with open(os.path.join(self._eb_dir, file_name), "rb") as paths_file:
-            # read set of path pointers by Orig-Dest sequence from file
-            offset, leaves_nb, path_indicies = self._get_path_indices(paths_file)
-            assigned = 0
-            not_assigned = 0
-            bytes_read = offset * 8
-            # for all orig-dest pairs with demand, load path from file
-            for data in demand:
-                # get file position based on orig-dest index
-                start, end = self._get_path_location(
-                    data["orig"].number, data["dest"].number, leaves_nb, path_indicies
-                )
-                # no path found, disconnected zone
-                if start == end:
-                    not_assigned += data["dem"]
-                    continue
-                paths_file.seek(start * 4 + offset * 8)
-                self._assign_path_flow(paths_file, start, end, data["dem"])
-                assigned += data["dem"]
-                bytes_read += (end - start) * 4
-        self.controller.emme_manager.copy_attr_values(
-            "LINK", self._network, self._scenario, ["temp_flow"], ["@maz_flow"]
-        )
+        # roots and leaves are in node ID order in the path file, see
+        # _find_roots_and_leaves
+        _, root_index = np.unique(self._node_ids[demand["orig"]], return_inverse=True)
+        _, leaf_index = np.unique(self._node_ids[demand["dest"]], return_inverse=True)
+        with PathFile(os.path.join(self._eb_dir, file_name)) as paths_file:
+            start, end = paths_file.path_slices(root_index, leaf_index)
+            # no path found (start == end), disconnected zone
+            found = end > start
+            path_nodes = paths_file.path_nodes(start[found], end[found])
+        path_demand = demand["dem"][found]
+        self._add_path_flows(path_nodes, (end - start)[found], path_demand)
+        assigned = path_demand.sum()
+        not_assigned = demand["dem"][~found].sum()
         self.logger.log_time(
             f"ASSIGN bin {bin_no}, total {len(demand)}, assign "
-            f"{assigned}, not assign {not_assigned}, bytes {bytes_read}",
+            f"{assigned}, not assign {not_assigned}, bytes {len(path_nodes) * 4}",
             level="DEBUG",
         )
 
-    @staticmethod
-    def _get_path_indices(paths_file: BinaryIO) -> [int, int, _array.array]:
-        """Get the path header indices.
-
-        See the Emme Shortest path tool doc for additional details on reading
-        this file.
-
-        Args:
-            paths_file: binary file access to the generated paths file
-
-        Returns:
-            2 ints + array of ints: offset, leafs_nb, path_indicies
-            offset: starting index to read the paths
-            leafs_nb: number of leafs in the shortest path file
-            path_indicies: array of the start index for each root, leaf path in paths_file.
-        """
-        # read first 4 integers from file (Q=64-bit unsigned integers)
-        header = _array.array("Q")
-        header.fromfile(paths_file, 4)
-        roots_nb, leaves_nb = header[2:4]
-        # Load sequence of path indices (positions by orig-dest index),
-        # pointing to list of path node IDs in file
-        path_indicies = _array.array("Q")
-        path_indicies.fromfile(paths_file, roots_nb * leaves_nb + 1)
-        offset = roots_nb * leaves_nb + 1 + 4
-        return offset, leaves_nb, path_indicies
-
-    def _get_path_location(
-        self,
-        orig: EmmeNode,
-        dest: EmmeNode,
-        leaves_nb: int,
-        path_indicies: _array.array,
-    ) -> [int, int]:
-        """Get the location in the paths_file to read.
-
-        Args:
-            orig: Emme Node object, origin MAZ to query the path
-            dest: Emme Node object, destination MAZ to query the path
-            leaves_nb: number of leaves
-            path_indicies: array of the start index for each root, leaf path in paths_file.
-
-        Returns:
-            Two integers, start, end
-            start: starting index to read Node ID bytes from paths_file
-            end: ending index to read bytes from paths_file
-        """
-        p_index = self._root_index[orig]
-        q_index = self._leaf_index[dest]
-        index = p_index * leaves_nb + q_index
-        start = path_indicies[index]
-        end = path_indicies[index + 1]
-        return start, end
-
-    def _assign_path_flow(
-        self, paths_file: BinaryIO, start: int, end: int, demand: float
-    ):
-        """Add demand to link temp_flow for the path.
-
-        Args:
-            paths_file: binary file access to read path from
-            start: starting index to read Node ID bytes from paths_file
-            end: ending index to read bytes from paths_file
-            demand: flow demand to add on link
-        """
-        # load sequence of Node IDs which define the path (L=32-bit unsigned integers)
-        path = _array.array("L")
-        path.fromfile(paths_file, end - start)
-        # proccess path to sequence of links and add flow
-        path_iter = iter(path)
-        i_node = next(path_iter)
-        for j_node in path_iter:
-            link = self._network.link(i_node, j_node)
-            link["temp_flow"] += demand
-            i_node = j_node
-
 
 class SkimMAZCosts(Component):
     """MAZ-to-MAZ shortest-path skim of time, distance and toll"""
@@ -591,6 +961,12 @@ class SkimMAZCosts(Component):
         super().__init__(controller)
         self._scenario = None
         self._network = None
+        self._node_index = None
+        self._node_ids = None
+        self._node_positions = None
+        self._node_maz_ids = None
+        self._node_counties = None
+        self._node_is_centroid = None
 
     @LogStartEnd()
     def run(self):
@@ -598,7 +974,7 @@ class SkimMAZCosts(Component):
 
         Runs a shortest path builder for each county, using a maz_skim_cost
         to limit the search. The valid gen cost (time + cost), distance and toll (drive alone)
-        are written to CSV at the output_skim_file path:
+        are written to the output_skim_file path (see MAZSkimWriter):
         FROM_ZONE, TO_ZONE, COST, DISTANCE, BRIDGETOLL
 
         The following config inputs are used directly in this component. Note also
@@ -611,6 +987,8 @@ class SkimMAZCosts(Component):
             demand_county_groups: used for the list of counties, creates a list out
                 of all listed counties under [].counties
             output_skim_file: relative path to save the skims
+            output_skim_format: csv, npz or parquet
+            output_skim_dtype: float32 or float16 (for npz and parquet)
             value_of_time: value of time used to convert tolls and auto operating cost
             operating_cost_per_mile: auto operating cost
             max_skim_cost: max cost value used to limit the shortest path search
@@ -618,7 +996,9 @@ class SkimMAZCosts(Component):
 
         config.emme.num_processors
 
-
+        With highway.maz_to_maz.shortest_path_backend = "numpy" the county
+        skims are calculated with the HighwayGraph in a pool of
+        emme.num_processors worker processes, see _skim_counties_graph.
         """
         ref_period = None
         ref_period_name = self.config.highway.maz_to_maz.skim_period
@@ -633,28 +1013,38 @@ class SkimMAZCosts(Component):
         self._scenario = self.get_emme_scenario(
             self.config.emme.highway_database_path, ref_period.name
         )
-        # prepare output file and write header
+        # prepare output file
         output = self.get_abs_path(self.config.highway.maz_to_maz.output_skim_file)
         os.makedirs(os.path.dirname(output), exist_ok=True)
-        with open(output, "w", encoding="utf8") as output_file:
-            output_file.write("FROM_ZONE, TO_ZONE, COST, DISTANCE, BRIDGETOLL\n")
+        file_format = self.config.highway.maz_to_maz.output_skim_format
+        if file_format != "csv":
+            output = f"{os.path.splitext(output)[0]}.{file_format}"
         counties = []
         for group in self.config.highway.maz_to_maz.demand_county_groups:
             counties.extend(group.counties)
         with self._setup():
             self._prepare_network()
-            for county in counties:
-                num_roots = self._mark_roots(county)
-                if num_roots == 0:
-                    continue
-                sp_values = self._run_shortest_path()
-                self._export_results(sp_values)
+            with MAZSkimWriter(
+                output,
+                file_format,
+                self.config.highway.maz_to_maz.output_skim_dtype,
+            ) as writer:
+                if self.config.highway.maz_to_maz.shortest_path_backend == "numpy":
+                    self._skim_counties_graph(counties, writer)
+                    return
+                for county in counties:
+                    num_roots = self._mark_roots(county)
+                    if num_roots == 0:
+                        continue
+                    sp_values = self._run_shortest_path()
+                    self._export_results(sp_values, county, writer)
 
     @_context
     def _setup(self):
         """Creates the temp attributes used in the component."""
         attributes = [
             ("LINK", "@link_cost", "total cost MAZ-MAZ"),
+            ("LINK", "@link_cost_maz", "cost MAZ-MAZ, mode links only"),
             ("NODE", "@maz_root", "selected roots (origins)"),
         ]
         with self.controller.emme_manager.temp_attributes_and_restore(
@@ -664,6 +1054,12 @@ class SkimMAZCosts(Component):
                 yield
             finally:
                 self._network = None  # clear network obj ref to free memory
+                self._node_index = None
+                self._node_ids = None
+                self._node_positions = None
+                self._node_maz_ids = None
+                self._node_counties = None
+                self._node_is_centroid = None
 
     @LogStartEnd()
     def _prepare_network(self):
@@ -679,19 +1075,102 @@ class SkimMAZCosts(Component):
         self._network = self.controller.emme_manager.get_network(
             self._scenario, {"NODE": ["@maz_id", "#node_county"]}
         )
+        # node values in network order, for the root and leaf MAZ IDs,
+        # and the position of each node in the Emme node index
+        self._node_index, _ = get_attribute_arrays(self._network, "NODE", ["@maz_id"])
+        nodes = list(self._network.nodes())
+        self._node_ids = np.array([node.number for node in nodes], dtype=np.int64)
+        self._node_positions = np.array(
+            [self._node_index[node_id] for node_id in self._node_ids], dtype=np.int64
+        )
+        self._node_maz_ids = np.array([node["@maz_id"] for node in nodes])
+        self._node_counties = np.array([node["#node_county"] for node in nodes])
+        self._node_is_centroid = np.array([node.is_centroid for node in nodes])
 
     def _mark_roots(self, county: str) -> int:
         """Mark the available roots in the county."""
-        count_roots = 0
-        for node in self._network.nodes():
-            if node["@maz_id"] > 0 and node["#node_county"] == county:
-                node["@maz_root"] = node["@maz_id"]
-                count_roots += 1
-            else:
-                node["@maz_root"] = 0
-        values = self._network.get_attribute_values("NODE", ["@maz_root"])
-        self._scenario.set_attribute_values("NODE", ["@maz_root"], values)
-        return count_roots
+        is_root = (self._node_maz_ids > 0) & (self._node_counties == county)
+        maz_root = np.zeros(len(self._node_positions))
+        maz_root[self._node_positions[is_root]] = self._node_maz_ids[is_root]
+        set_attribute_arrays(
+            self._scenario, "NODE", self._node_index, {"@maz_root": maz_root}
+        )
+        return int(is_root.sum())
+
+    def _skim_counties_graph(self, counties: List[str], writer: MAZSkimWriter):
+        """Calculate the skims for the counties with the HighwayGraph and write to file.
+
+        The roots for each county are split into chunks which are run as
+        independent jobs in a pool of emme.num_processors worker processes,
+        each with a copy of the graph. The results are written in order
+        (same order as the Emme shortest path skims).
+
+        Args:
+            counties: list of county names
+            writer: the open MAZSkimWriter
+        """
+        graph, link_values = self._load_graph()
+        max_cost = float(self.config.highway.maz_to_maz.max_skim_cost)
+        graph_nodes = graph.node_index(self._node_ids)
+        is_maz = self._node_maz_ids > 0
+        leaves = (graph_nodes[is_maz], self._node_maz_ids[is_maz])
+        jobs = []
+        for county in counties:
+            is_root = is_maz & (self._node_counties == county)
+            roots, root_ids = graph_nodes[is_root], self._node_maz_ids[is_root]
+            for start in range(0, len(roots), _SKIM_CHUNK_ROOTS):
+                end = start + _SKIM_CHUNK_ROOTS
+                jobs.append((roots[start:end], root_ids[start:end]))
+        skim_args = (graph, leaves, link_values, max_cost)
+        num_processors = parse_num_processors(self.config.emme.num_processors)
+        if num_processors <= 1:
+            for roots in jobs:
+                writer.write(_skim_roots(*skim_args, roots))
+            return
+        with ProcessPoolExecutor(
+            max_workers=num_processors,
+            initializer=_init_skim_worker,
+            initargs=skim_args,
+        ) as executor:
+            for result in executor.map(_skim_worker, jobs):
+                writer.write(result)
+
+    def _load_graph(self) -> Tuple[HighwayGraph, NumpyArray]:
+        """Load the network links to HighwayGraph for the skim shortest paths.
+
+        The link costs are @link_cost on the links with the
+        highway.maz_to_maz.mode_code, MAZ nodes and centroids are terminal
+        nodes (paths cannot pass through).
+
+        Returns:
+            The HighwayGraph and the array of link values to skim (length and
+            @bridgetoll_da)
+        """
+        mode_code = self.config.highway.maz_to_maz.mode_code
+        net_calc = NetworkCalculator(self._scenario)
+        net_calc.add_calc("@link_cost_maz", "1e20")
+        net_calc.add_calc("@link_cost_maz", "@link_cost", f"mode={mode_code}")
+        net_calc.run()
+        node_index, nodes = get_attribute_arrays(self._scenario, "NODE", ["x", "y"])
+        link_index, links = get_attribute_arrays(
+            self._scenario, "LINK", ["@link_cost_maz", "length", "@bridgetoll_da"]
+        )
+        node_ids = node_index_ids(node_index)
+        node_order = np.argsort(node_ids)
+        sorted_ids = node_ids[node_order]
+        terminal = np.zeros(len(node_ids), dtype=bool)
+        terminal_ids = self._node_ids[(self._node_maz_ids > 0) | self._node_is_centroid]
+        terminal[node_order[np.searchsorted(sorted_ids, terminal_ids)]] = True
+        i_node_ids, j_node_ids = link_index_ids(link_index)
+        graph = HighwayGraph(
+            node_ids,
+            np.column_stack([nodes["x"], nodes["y"]]),
+            node_order[np.searchsorted(sorted_ids, i_node_ids)],
+            node_order[np.searchsorted(sorted_ids, j_node_ids)],
+            links["@link_cost_maz"],
+            terminal,
+        )
+        return graph, np.array([links["length"], links["@bridgetoll_da"]])
 
     def _run_shortest_path(self) -> Dict[str, NumpyArray]:
         """Run shortest paths tool and return dictionary of skim results name, numpy arrays.
@@ -756,36 +1235,184 @@ class SkimMAZCosts(Component):
         sp_values = shortest_paths_tool(spec, self._scenario)
         return sp_values
 
-    def _export_results(self, sp_values: Dict[str, NumpyArray]):
-        """Write matrix skims to CSV.
+    def _export_results(
+        self, sp_values: Dict[str, NumpyArray], county: str, writer: MAZSkimWriter
+    ):
+        """Write matrix skims to file in chunks of rows.
 
-        The matrices are filtered to omit rows for which the COST is
-        < 0 or > 1e19 (Emme uses 1e20 to indicate inaccessible zone pairs).
+        The valid cells, with COST > 0 and < 1e19 (Emme uses 1e20 to indicate
+        inaccessible zone pairs), are selected directly from the skim arrays
+        in blocks of roots, and only these rows are written.
 
-        sp_values: dictionary of matrix costs, with the three keys
-            "COST", "DISTANCE", and "BRIDGETOLL" and Numpy arrays of values
+        Args:
+            sp_values: dictionary of matrix costs, with the three keys
+                "COST", "DISTANCE", and "BRIDGETOLL" and Numpy arrays of values
+            county: name of the county of the roots
+            writer: the open MAZSkimWriter
         """
         # get list of MAZ IDS
-        roots = [
-            node["@maz_root"] for node in self._network.nodes() if node["@maz_root"]
-        ]
-        leaves = [node["@maz_id"] for node in self._network.nodes() if node["@maz_id"]]
-        # build dataframe with output data and to/from MAZ ids
-        root_ids = np.repeat(roots, len(leaves))
-        leaf_ids = leaves * len(roots)
-        result_df = pd.DataFrame(
-            {
-                "FROM_ZONE": root_ids,
-                "TO_ZONE": leaf_ids,
-                "COST": sp_values["COST"].flatten(),
-                "DISTANCE": sp_values["DISTANCE"].flatten(),
-                "BRIDGETOLL": sp_values["BRIDGETOLL"].flatten(),
+        is_maz = self._node_maz_ids > 0
+        roots = self._node_maz_ids[is_maz & (self._node_counties == county)]
+        leaves = self._node_maz_ids[is_maz]
+        skims = {
+            name: sp_values[name].reshape(len(roots), len(leaves))
+            for name in ["COST", "DISTANCE", "BRIDGETOLL"]
+        }
+        chunk_size = max(1, _EXPORT_CHUNK_CELLS // max(len(leaves), 1))
+        for start in range(0, len(roots), chunk_size):
+            block = slice(start, start + chunk_size)
+            cost = skims["COST"][block]
+            # drop 0's / 1e20
+            rows, cols = np.nonzero((cost > 0) & (cost < 1e19))
+            data = {"FROM_ZONE": roots[block][rows], "TO_ZONE": leaves[cols]}
+            for name, values in skims.items():
+                data[name] = values[block][rows, cols]
+            writer.write(data)
+
+
+class MAZSkimWriter:
+    """Writes the MAZ-to-MAZ skims to file in chunks of rows.
+
+    The columns are FROM_ZONE, TO_ZONE, COST, DISTANCE, BRIDGETOLL, in
+    one of the formats:
+        - "csv": text with a header row, rows are appended for each chunk
+        - "npz": Numpy compressed archive with one array per column, the
+            chunks are appended to an uncompressed temporary file per
+            column (next to the output file) and compressed into the
+            archive on close, so only one chunk is held in memory
+        - "parquet": Parquet file with one row group per chunk, requires
+            pyarrow
+
+    In the npz and parquet formats the zone IDs are saved as int32 and
+    the skim values as dtype. If the writer is used as a context manager
+    and exits on an exception, the partial output file is removed.
+
+    Args:
+        file_path: path to the output file
+        file_format: one of "csv", "npz" or "parquet"
+        dtype: optional, default "float32", the skim value type for the npz
+            and parquet formats, "float32" or "float16"
+    """
+
+    columns = ["FROM_ZONE", "TO_ZONE", "COST", "DISTANCE", "BRIDGETOLL"]
+
+    def __init__(
+        self, file_path: str, file_format: str = "csv", dtype: str = "float32"
+    ):
+        self._file_path = file_path
+        self._file_format = file_format
+        self._dtype = np.dtype(dtype)
+        self._file = None
+        self._temp_dir = None
+        self._columns = None
+        self._pyarrow = None
+        self._schema = None
+
+    def _column_dtype(self, index: int) -> np.dtype:
+        """Return the saved value type of the column (at index in columns)."""
+        return np.dtype(np.int32) if index < 2 else self._dtype
+
+    def open(self):
+        """Open the file for writing, for csv write the header row."""
+        if self._file_format == "csv":
+            # pylint: disable=R1732
+            self._file = open(self._file_path, "w", newline="", encoding="utf8")
+            self._file.write(", ".join(self.columns) + "\n")
+        elif self._file_format == "parquet":
+            try:
+                import pyarrow  # pylint: disable=C0415
+                import pyarrow.parquet  # pylint: disable=C0415
+            except ModuleNotFoundError as error:
+                raise Exception(
+                    "output_skim_format parquet requires the pyarrow package"
+                ) from error
+            self._pyarrow = pyarrow
+            self._schema = pyarrow.schema(
+                [(name, pyarrow.int32()) for name in self.columns[:2]]
+                + [
+                    (name, pyarrow.from_numpy_dtype(self._dtype))
+                    for name in self.columns[2:]
+                ]
+            )
+            self._file = pyarrow.parquet.ParquetWriter(self._file_path, self._schema)
+        elif self._file_format == "npz":
+            self._temp_dir = tempfile.mkdtemp(
+                dir=os.path.dirname(os.path.abspath(self._file_path))
+            )
+            # pylint: disable=R1732
+            self._columns = {
+                name: open(os.path.join(self._temp_dir, name), "wb")
+                for name in self.columns
             }
-        )
-        # drop 0's / 1e20
-        result_df = result_df.query("COST > 0 & COST < 1e19")
-        # write remaining values to text file
-        # FROM_ZONE,TO_ZONE,COST,DISTANCE,BRIDGETOLL
-        output = self.get_abs_path(self.config.highway.maz_to_maz.output_skim_file)
-        with open(output, "a", newline="", encoding="utf8") as output_file:
-            result_df.to_csv(output_file, header=False, index=False)
+        else:
+            raise Exception(f"invalid MAZ skim file format: {self._file_format}")
+
+    def close(self, discard: bool = False):
+        """Write any remaining data and close the file.
+
+        Args:
+            discard: if True the output is not written (and any partial
+                output file is removed)
+        """
+        try:
+            if self._columns is not None:
+                for column in self._columns.values():
+                    column.close()
+                if not discard:
+                    self._write_npz()
+            if self._file is not None:
+                self._file.close()
+        finally:
+            if self._temp_dir is not None:
+                shutil.rmtree(self._temp_dir, ignore_errors=True)
+            self._file = None
+            self._columns = None
+            self._temp_dir = None
+        if discard and os.path.exists(self._file_path):
+            os.remove(self._file_path)
+
+    def _write_npz(self):
+        """Compress the temporary column files into the npz archive."""
+        with zipfile.ZipFile(
+            self._file_path, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True
+        ) as archive:
+            for i, name in enumerate(self.columns):
+                dtype = self._column_dtype(i)
+                column_path = os.path.join(self._temp_dir, name)
+                header = {
+                    "descr": np.lib.format.dtype_to_descr(dtype),
+                    "fortran_order": False,
+                    "shape": (os.path.getsize(column_path) // dtype.itemsize,),
+                }
+                with archive.open(f"{name}.npy", "w", force_zip64=True) as member:
+                    np.lib.format.write_array_header_2_0(member, header)
+                    with open(column_path, "rb") as column:
+                        shutil.copyfileobj(column, member)
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close(discard=exc_type is not None)
+
+    def write(self, data: Dict[str, NumpyArray]):
+        """Write a chunk of rows.
+
+        Args:
+            data: dictionary of column name to array of values
+        """
+        if self._file_format == "csv":
+            pd.DataFrame(data, columns=self.columns).to_csv(
+                self._file, header=False, index=False
+            )
+            return
+        data = {
+            name: np.asarray(data[name], dtype=self._column_dtype(i))
+            for i, name in enumerate(self.columns)
+        }
+        if self._file_format == "parquet":
+            self._file.write_table(self._pyarrow.table(data, schema=self._schema))
+        else:
+            for name, values in data.items():
+                self._columns[name].write(np.ascontiguousarray(values).tobytes())
@@ -3,6 +3,8 @@
 Creates required attributes and populates input values needed
 for highway assignments. The toll values, VDFs, per-class cost
 (tolls+operating costs), modes and skim link attributes are calculated.
+The link attribute values are read from the scenario once and calculated
+as Numpy array operations, only the link modes use the Emme network object.
 
 The following link attributes are used as input:
     - "@capclass": link capclass index
@@ -47,19 +49,39 @@ The following attributes are calculated:
 """
 
 
-from typing import Dict, List, Set
+from __future__ import annotations
+from typing import Dict, List, Set, Tuple, TYPE_CHECKING
+
+import numpy as np
+import pandas as pd
 
 from tm2py.components.component import Component
 from tm2py.logger import LogStartEnd
 from tm2py.emme.manager import EmmeScenario, EmmeNetwork
+from tm2py.emme.network import (
+    get_attribute_arrays,
+    link_index_ids,
+    set_attribute_arrays,
+)
+
+if TYPE_CHECKING:
+    from tm2py.controller import RunController
+
+NumpyArray = np.array
+_akcelik_vdfs = [3, 4, 5, 7, 8, 10, 11, 12, 13, 14]
 
 
 class PrepareNetwork(Component):
     """Highway network preparation"""
 
+    def __init__(self, controller: RunController):
+        super().__init__(controller)
+        self._toll_table = None
+
     @LogStartEnd("prepare network attributes and modes")
     def run(self):
         """Run network preparation step"""
+        self._toll_table = None
         for time in self.time_period_names():
             with self.controller.emme_manager.logbook_trace(
                 f"prepare for highway assignment {time}"
@@ -68,12 +90,9 @@ class PrepareNetwork(Component):
                     self.config.emme.highway_database_path, time
                 )
                 self._create_class_attributes(scenario, time)
+                self._calc_link_attributes(scenario, time)
                 network = scenario.get_network()
-                self._set_tolls(network, time)
-                self._set_vdf_attributes(network, time)
                 self._set_link_modes(network)
-                self._calc_link_skim_lengths(network)
-                self._calc_link_class_costs(network)
                 scenario.publish_network(network)
 
     def _create_class_attributes(self, scenario: EmmeScenario, time_period: str):
@@ -118,53 +137,138 @@ class PrepareNetwork(Component):
             for name, desc in attrs:
                 create_attribute(domain, name, desc, overwrite=True, scenario=scenario)
 
-    def _set_tolls(self, network: EmmeNetwork, time_period: str):
-        """Set the tolls in the network from the toll reference file."""
-        toll_index = self._get_toll_indices()
+    def _link_attribute_names(self) -> List[str]:
+        """Return the list of link attributes used in the link attribute calculations."""
+        names = [
+            "length",
+            "num_lanes",
+            "volume_delay_func",
+            "@capclass",
+            "@lanes",
+            "@ft",
+            "@free_flow_speed",
+            "@tollbooth",
+            "@tollseg",
+            "@useclass",
+            "@capacity",
+            "@ja",
+            "@hov_length",
+            "@toll_length",
+        ]
+        for dst_veh in self.config.highway.tolls.dst_vehicle_group_names:
+            names.extend([f"@bridgetoll_{dst_veh}", f"@valuetoll_{dst_veh}"])
+        for assign_class in self.config.highway.classes:
+            names.append(f"@cost_{assign_class.name.lower()}")
+        return names
+
+    def _calc_link_attributes(self, scenario: EmmeScenario, time_period: str):
+        """Calculate the tolls, VDF, capacity, skim lengths and costs on links.
+
+        The link attribute values are read from the scenario once, calculated
+        as Numpy array operations (in the Emme link order) and written back
+        to the scenario in one call.
+        """
+        index, links = get_attribute_arrays(
+            scenario, "LINK", self._link_attribute_names()
+        )
+        self._set_tolls(links, index, time_period)
+        self._set_vdf_attributes(links, time_period)
+        self._calc_link_skim_lengths(links)
+        self._calc_link_class_costs(links)
+        input_names = ["length", "@capclass", "@lanes", "@ft", "@free_flow_speed"]
+        input_names += ["@tollbooth", "@tollseg", "@useclass"]
+        results = {k: v for k, v in links.items() if k not in input_names}
+        set_attribute_arrays(scenario, "LINK", index, results)
+
+    def _set_tolls(
+        self,
+        links: Dict[str, NumpyArray],
+        link_index: Dict[int, Dict[int, int]],
+        time_period: str,
+    ):
+        """Set the tolls in the link arrays from the toll reference file.
+
+        Args:
+            links: dictionary of link attribute name to array of values
+            link_index: the LINK domain element index from get_attribute_arrays
+                (used to report the link IDs of failed toll lookups)
+            time_period: time period name
+        """
+        toll_table, toll_columns = self._get_toll_table()
         src_veh_groups = self.config.highway.tolls.src_vehicle_group_names
         dst_veh_groups = self.config.highway.tolls.dst_vehicle_group_names
         tollbooth_start_index = self.config.highway.tolls.tollbooth_start_index
-        for link in network.links():
-            if link["@tollbooth"]:
-                index = (
-                    link["@tollbooth"] * 1000
-                    + link["@tollseg"] * 10
-                    + link["@useclass"]
+        tollbooth = links["@tollbooth"]
+        toll_links = np.flatnonzero(tollbooth)
+        indices = (tollbooth * 1000 + links["@tollseg"] * 10 + links["@useclass"])[
+            toll_links
+        ]
+        # missing rows in the table (and any index out of range) are NaN
+        in_range = (indices >= 0) & (indices < len(toll_table))
+        in_range &= indices == np.floor(indices)
+        rows = np.where(in_range, indices, 0).astype(np.int64)
+        columns = [toll_columns[(time_period.lower(), v)] for v in src_veh_groups]
+        tolls = toll_table[np.ix_(rows, columns)]
+        found = in_range & ~np.isnan(tolls).any(axis=1)
+        if not found.all():
+            i_node_ids, j_node_ids = link_index_ids(link_index)
+            for index, link in zip(indices[~found], toll_links[~found]):
+                # tolls will remain at zero
+                self.logger.log(
+                    f"set tolls failed index lookup {index}, "
+                    f"link {i_node_ids[link]}-{j_node_ids[link]}",
+                    level="TRACE",
                 )
-                data_row = toll_index.get(index)
-                if data_row is None:
-                    self.logger.log(
-                        f"set tolls failed index lookup {index}, link {link.id}",
-                        level="TRACE",
-                    )
-                    continue  # tolls will remain at zero
-                # if index is below tollbooth start index then this is a bridge
-                # (point toll), available for all traffic assignment classes
-                if link["@tollbooth"] < tollbooth_start_index:
-                    for src_veh, dst_veh in zip(src_veh_groups, dst_veh_groups):
-                        link[f"@bridgetoll_{dst_veh}"] = (
-                            data_row[f"toll{time_period.lower()}_{src_veh}"] * 100
-                        )
-                else:  # else, this is a tollway with a per-mile charge
-                    for src_veh, dst_veh in zip(src_veh_groups, dst_veh_groups):
-                        link[f"@valuetoll_{dst_veh}"] = (
-                            data_row[f"toll{time_period.lower()}_{src_veh}"]
-                            * link.length
-                            * 100
-                        )
-
-    def _get_toll_indices(self) -> Dict[int, Dict[str, str]]:
-        """Get the mapping of toll lookup table from the toll reference file."""
+        toll_links, tolls = toll_links[found], tolls[found]
+        # if index is below tollbooth start index then this is a bridge
+        # (point toll), available for all traffic assignment classes
+        # else, this is a tollway with a per-mile charge
+        is_bridge = tollbooth[toll_links] < tollbooth_start_index
+        bridge_links = toll_links[is_bridge]
+        value_links = toll_links[~is_bridge]
+        for i, dst_veh in enumerate(dst_veh_groups):
+            links[f"@bridgetoll_{dst_veh}"][bridge_links] = tolls[is_bridge, i] * 100
+            links[f"@valuetoll_{dst_veh}"][value_links] = (
+                tolls[~is_bridge, i] * links["length"][value_links] * 100
+            )
+
+    def _get_toll_table(self) -> Tuple[NumpyArray, Dict[Tuple[str, str], int]]:
+        """Get the toll lookup table from the toll reference file.
+
+        The toll file is read once and compiled to a dense array with one row
+        per toll index ("fac_index", the @tollbooth*1000 + @tollseg*10 + @useclass)
+        and one column per time period and vehicle group. Rows which are not in
+        the toll file are NaN; blank cells in the toll file are zero (no toll).
+
+        Returns:
+            The toll table array, and the mapping of (period, src_vehicle_group)
+            to column in the table.
+        """
+        if self._toll_table is not None:
+            return self._toll_table
         toll_file_path = self.get_abs_path(self.config.highway.tolls.file_path)
-        tolls = {}
-        with open(toll_file_path, "r", encoding="UTF8") as toll_file:
-            header = next(toll_file).split(",")
-            for line in toll_file:
-                data = dict(zip(header, line.split(",")))
-                tolls[int(data["fac_index"])] = data
-        return tolls
-
-    def _set_vdf_attributes(self, network: EmmeNetwork, time_period: str):
+        data = pd.read_csv(toll_file_path, float_precision="round_trip")
+        data.columns = data.columns.str.strip()
+        toll_columns = {}
+        column_names = []
+        for period in self.time_period_names():
+            for src_veh in self.config.highway.tolls.src_vehicle_group_names:
+                toll_columns[(period.lower(), src_veh)] = len(column_names)
+                column_names.append(f"toll{period.lower()}_{src_veh}")
+        missing = [name for name in column_names if name not in data.columns]
+        if missing:
+            raise Exception(
+                f"highway.tolls.file_path: missing columns {', '.join(missing)} "
+                f"in {toll_file_path}"
+            )
+        fac_index = data["fac_index"].to_numpy(dtype=np.int64)
+        toll_table = np.full((fac_index.max() + 1, len(column_names)), np.nan)
+        values = data[column_names].fillna(0).to_numpy(dtype=np.float64)
+        toll_table[fac_index] = values
+        self._toll_table = (toll_table, toll_columns)
+        return self._toll_table
+
+    def _set_vdf_attributes(self, links: Dict[str, NumpyArray], time_period: str):
         """Set capacity, VDF and critical speed on links"""
         capacity_map = {}
         critical_speed_map = {}
@@ -177,22 +281,46 @@ class PrepareNetwork(Component):
             tp.name: tp.highway_capacity_factor for tp in self.config.time_periods
         }
         period_capacity_factor = tp_mapping[time_period]
-        akcelik_vdfs = [3, 4, 5, 7, 8, 10, 11, 12, 13, 14]
-        for link in network.links():
-            cap_lanehour = capacity_map[link["@capclass"]]
-            link["@capacity"] = cap_lanehour * period_capacity_factor * link["@lanes"]
-            link.volume_delay_func = int(link["@ft"])
-            # re-mapping links with type 99 to type 7 "local road of minor importance"
-            if link.volume_delay_func == 99:
-                link.volume_delay_func = 7
-            # num_lanes not used directly, but set for reference
-            link.num_lanes = max(min(9.9, link["@lanes"]), 1.0)
-            if link.volume_delay_func in akcelik_vdfs and link["@free_flow_speed"] > 0:
-                dist = link.length
-                critical_speed = critical_speed_map[link["@capclass"]]
-                t_c = dist / critical_speed
-                t_o = dist / link["@free_flow_speed"]
-                link["@ja"] = 16 * (t_c - t_o) ** 2
+        capclass = links["@capclass"]
+        cap_lanehour = self._lookup(capacity_map, capclass, "capacity")
+        links["@capacity"] = cap_lanehour * period_capacity_factor * links["@lanes"]
+        vdf = np.trunc(links["@ft"])
+        # re-mapping links with type 99 to type 7 "local road of minor importance"
+        vdf[vdf == 99] = 7
+        links["volume_delay_func"] = vdf
+        # num_lanes not used directly, but set for reference
+        links["num_lanes"] = np.maximum(np.minimum(links["@lanes"], 9.9), 1.0)
+        is_akcelik = np.isin(vdf, _akcelik_vdfs) & (links["@free_flow_speed"] > 0)
+        dist = links["length"][is_akcelik]
+        critical_speed = self._lookup(
+            critical_speed_map, capclass[is_akcelik], "critical_speed"
+        )
+        t_c = dist / critical_speed
+        t_o = dist / links["@free_flow_speed"][is_akcelik]
+        links["@ja"][is_akcelik] = 16 * (t_c - t_o) ** 2
+
+    @staticmethod
+    def _lookup(mapping: Dict[int, float], keys: NumpyArray, name: str) -> NumpyArray:
+        """Return the array of mapping values for the array of keys.
+
+        Args:
+            mapping: lookup table of key to value
+            keys: array of keys to map to values
+            name: name of the value (for the error message)
+
+        Raises:
+            Exception: if any of the keys are not found in the mapping
+        """
+        map_keys = np.array(sorted(mapping), dtype=np.float64)
+        map_values = np.array([mapping[k] for k in sorted(mapping)], dtype=np.float64)
+        positions = np.searchsorted(map_keys, keys).clip(0, max(len(map_keys) - 1, 0))
+        found = map_keys[positions] == keys
+        if not found.all():
+            missing = ", ".join(str(k) for k in np.unique(keys[~found]))
+            raise Exception(
+                f"highway.capclass_lookup: no {name} value for @capclass {missing}"
+            )
+        return map_values[positions]
 
     def _set_link_modes(self, network: EmmeNetwork):
         """Set the link modes based on the per-class 'excluded_links' set."""
@@ -285,22 +413,19 @@ class PrepareNetwork(Component):
                 return
         modes_set.add(mode_code)
 
-    def _calc_link_skim_lengths(self, network: EmmeNetwork):
+    def _calc_link_skim_lengths(self, links: Dict[str, NumpyArray]):
         """Calculate the length attributes used in the highway skims."""
         tollbooth_start_index = self.config.highway.tolls.tollbooth_start_index
-        for link in network.links():
-            # distance in hov lanes / facilities
-            if 2 <= link["@useclass"] <= 3:
-                link["@hov_length"] = link.length
-            else:
-                link["@hov_length"] = 0
-            # distance on non-bridge toll facilities
-            if link["@tollbooth"] > tollbooth_start_index:
-                link["@toll_length"] = link.length
-            else:
-                link["@toll_length"] = 0
-
-    def _calc_link_class_costs(self, network: EmmeNetwork):
+        length = links["length"]
+        useclass = links["@useclass"]
+        # distance in hov lanes / facilities
+        is_hov = (2 <= useclass) & (useclass <= 3)
+        links["@hov_length"] = np.where(is_hov, length, 0.0)
+        # distance on non-bridge toll facilities
+        is_toll = links["@tollbooth"] > tollbooth_start_index
+        links["@toll_length"] = np.where(is_toll, length, 0.0)
+
+    def _calc_link_class_costs(self, links: Dict[str, NumpyArray]):
         """Calculate the per-class link cost from the tolls and operating costs."""
         for assign_class in self.config.highway.classes:
             cost_attr = f"@cost_{assign_class.name.lower()}"
@@ -308,6 +433,7 @@ class PrepareNetwork(Component):
             toll_factor = assign_class.get("toll_factor")
             if toll_factor is None:
                 toll_factor = 1.0
-            for link in network.links():
-                toll_value = sum(link[toll_attr] for toll_attr in assign_class["toll"])
-                link[cost_attr] = link.length * op_cost + toll_value * toll_factor
+            toll_value = np.zeros_like(links["length"])
+            for toll_attr in assign_class["toll"]:
+                toll_value += links[toll_attr]
+            links[cost_attr] = links["length"] * op_cost + toll_value * toll_factor
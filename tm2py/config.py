@@ -1,5 +1,5 @@
-"""Config implementation and schema.
-"""
+"""Config implementation and schema."""
+
 # pylint: disable=too-many-instance-attributes
 
 from abc import ABC
@@ -80,6 +80,9 @@ class RunConfig(ConfigItem):
         initial_components: list of components to run as initial (0) iteration
         global_iteration_components: list of component to run at every iteration, in order
         final_components: list of components to run after final iteration, in order
+        omx_read_cache_max_mb: optional, default 1024, the memory budget in MB
+            for the arrays cached from OMX files read during the model run
+            (e.g. demand), see tm2py.emme.matrix.OMXReadCache
     """
 
     initial_components: Tuple[ComponentNames, ...]
@@ -88,6 +91,7 @@ class RunConfig(ConfigItem):
     start_iteration: int = Field(ge=0)
     end_iteration: int = Field(gt=0)
     start_component: Optional[Union[ComponentNames, EmptyString]] = Field(default="")
+    omx_read_cache_max_mb: Optional[float] = Field(default=1024, ge=0)
 
     @classmethod
     @validator("end_iteration")
@@ -395,6 +399,30 @@ class HighwayMazToMazConfig(ConfigItem):
         skim_period: period name to use for the shotest path skims, must
             match one of the names listed in the time_periods
         output_skim_file: relative path to resulting MAZ-to-MAZ skims
+        output_skim_format: optional, default "csv", the file format for the
+            MAZ-to-MAZ skims, "csv", "npz" (Numpy compressed arrays) or
+            "parquet" (requires pyarrow), for npz and parquet the
+            output_skim_file extension is replaced with .npz / .parquet
+        shortest_path_backend: optional, default "emme", the shortest path
+            implementation used for the MAZ-to-MAZ demand assignment and skims:
+                - "emme": Emme shortest path tool, paths via file
+                - "numpy": Numpy / SciPy shortest paths (Dijkstra) in memory,
+                    see highway_graph.HighwayGraph, the skims for the
+                    counties are run in parallel worker processes
+        path_file_format: optional, default "binary", the format of the
+            path file output from the Emme shortest path tool, "binary"
+            (read via memory map, see tm2py.emme.paths) or "text"
+        distance_bins: optional, default "fixed", the method to define the
+            distance bins used to group the demand by origin:
+                - "fixed": predefined bin edges, see highway_maz
+                - "adaptive": derived for each period from the distribution
+                    of origin to furthest destination distance, minimizing
+                    the estimated shortest path search cost
+        max_distance_bins: optional, default 8, max number of bins for
+            distance_bins="adaptive"
+        output_skim_dtype: optional, default "float32", the floating point
+            type for the skim values in the npz and parquet formats, "float32"
+            or "float16" (parquet float16 requires a recent pyarrow version)
     """
 
     mode_code: str = Field(min_length=1, max_length=1)
@@ -406,6 +434,12 @@ class HighwayMazToMazConfig(ConfigItem):
     demand_county_groups: Tuple[DemandCountyGroupConfig, ...] = Field()
     skim_period: str = Field()
     output_skim_file: str = Field()
+    output_skim_format: Literal["csv", "npz", "parquet"] = Field(default="csv")
+    shortest_path_backend: Literal["emme", "numpy"] = Field(default="emme")
+    path_file_format: Literal["binary", "text"] = Field(default="binary")
+    distance_bins: Literal["fixed", "adaptive"] = Field(default="fixed")
+    max_distance_bins: int = Field(default=8, gt=0)
+    output_skim_dtype: Literal["float32", "float16"] = Field(default="float32")
 
     @classmethod
     @validator("demand_county_groups")
@@ -425,10 +459,43 @@ class HighwayConfig(ConfigItem):
             highway network (no excluded_links)
         relative_gap: target relative gap stopping criteria
         max_iterations: maximum iterations stopping criteria
+        assignment_backend: optional, default "emme", the traffic assignment
+            implementation:
+                - "emme": Emme SOLA traffic assignment
+                - "numpy": Numpy / SciPy equilibrium assignment in memory,
+                  see highway_equilibrium
+        assignment_algorithm: optional, default "cfw", the algorithm for
+            assignment_backend="numpy", "fw" (Frank-Wolfe) or "cfw"
+            (conjugate Frank-Wolfe)
+        warm_start_path: optional, default None (cold start), relative path
+            template (with {period}) of the file to save the assignment
+            state for a warm start in the next global iteration, used with
+            assignment_backend="numpy", see highway_equilibrium
+        convergence_log_path: optional, default None (not written), relative
+            path of the file (.json or .csv) for the assignment convergence
+            records (relative gap and time per iteration, total time and
+            stopping reason) by period and global iteration
+        period_workers: optional, default 1, number of time periods to
+            assign concurrently in worker processes, emme.num_processors is
+            split across the workers; each worker runs a period on a copy
+            of the highway Emme database (with assignment_backend="emme"
+            each worker starts an Emme Desktop, using an Emme license)
         area_type_buffer_dist_miles: used to in calculation to categorize link @areatype
             The area type is determined based on the average density of nearby
             (within this buffer distance) MAZs, using (pop+jobs*2.5)/acres
         output_skim_path: relative path template for output skims in OMX format
+        output_skim_complib: optional, default None (OMX default, zlib), HDF5
+            compression library for the output skims, "zlib", "blosc:lz4",
+            "blosc:lz4hc", "blosc:zlib" or "blosc:zstd" (note that blosc may
+            not be readable outside of PyTables)
+        output_skim_complevel: optional, default None (1), compression level
+            0 (none) to 9 for the output skims
+        output_skim_chunk_rows: optional, default 1, number of rows per HDF5
+            chunk for the output skims, see bin/benchmark_omx to compare the
+            settings for a zone system size
+        output_skim_queue_size: optional, default 1, max number of periods
+            of skims held for export in a background thread (while the next
+            period is assigned), 0 to export before the next period starts
         tolls: input toll specification, see HighwayTollsConfig
         maz_to_maz: maz-to-maz shortest path assignment and skim specification,
             see HighwayMazToMazConfig
@@ -436,17 +503,37 @@ class HighwayConfig(ConfigItem):
             see HighwayClassConfig
         capclass_lookup: index cross-reference table from the link @capclass value
             to the free-flow speed, capacity, and critical speed values
+        demand_averaging: optional, default "msa", the scheme to average the
+            demand with the previous iteration demand, "msa", "fixed",
+            "weighted" or "self_regulated", see demand.PrepareDemand
+        demand_averaging_step: optional, default 0.5, the step size for
+            demand_averaging="fixed"
     """
 
     generic_highway_mode_code: str = Field(min_length=1, max_length=1)
     relative_gap: float = Field(ge=0)
     max_iterations: int = Field(ge=0)
+    assignment_backend: Literal["emme", "numpy"] = Field(default="emme")
+    assignment_algorithm: Literal["fw", "cfw"] = Field(default="cfw")
+    warm_start_path: Optional[str] = Field(default=None)
+    convergence_log_path: Optional[str] = Field(default=None)
+    period_workers: int = Field(default=1, ge=1)
     area_type_buffer_dist_miles: float = Field(gt=0)
     output_skim_path: str = Field()
+    output_skim_complib: Optional[
+        Literal["zlib", "blosc:lz4", "blosc:lz4hc", "blosc:zlib", "blosc:zstd"]
+    ] = Field(default=None)
+    output_skim_complevel: Optional[int] = Field(default=None, ge=0, le=9)
+    output_skim_chunk_rows: Optional[int] = Field(default=1, gt=0)
+    output_skim_queue_size: int = Field(default=1, ge=0)
     tolls: HighwayTollsConfig = Field()
     maz_to_maz: HighwayMazToMazConfig = Field()
     classes: Tuple[HighwayClassConfig, ...] = Field()
     capclass_lookup: Tuple[HighwayCapClassConfig, ...] = Field()
+    demand_averaging: Literal["msa", "fixed", "weighted", "self_regulated"] = Field(
+        default="msa"
+    )
+    demand_averaging_step: float = Field(default=0.5, gt=0, le=1)
 
     @classmethod
     @validator("capclass_lookup")
@@ -608,6 +695,23 @@ class EmmeConfig(ConfigItem):
             either as an integer, or value MAX, MAX-N. Typically recommend
             using MAX-1 (on desktop systems) or MAX-2 (on servers with many
             logical processors) to leave capacity for background / other tasks.
+        matrix_cache_max_mb: optional, default None (no limit), the memory
+            budget in MB for the cache of matrix data used in post-assignment
+            processing and skim export, the least recently used matrices are
+            evicted from the cache (and re-read from the Emmebank if needed)
+        matrix_cache_spill_path: optional, default None (no spill), relative
+            path to a scratch directory, if specified the matrices evicted
+            from the cache are saved to (memory mapped) files in this
+            directory instead of being re-read from the Emmebank
+        matrix_cache_write_back: optional, default False, if True the matrix
+            data changed in post-assignment processing is kept in the cache and
+            written to the Emmebank once per time period, instead of on each
+            change
+        matrix_dtype: optional, default "float64", the floating point type
+            for the matrix data used in the demand import, the matrix cache
+            and written to the skim OMX files, "float32" halves the memory
+            and file size, see tm2py.emme.matrix.omx_precision_report to
+            compare the results with float64
     """
 
     all_day_scenario_id: int
@@ -616,6 +720,10 @@ class EmmeConfig(ConfigItem):
     active_database_paths: Tuple[str, ...]
     transit_database_path: str
     num_processors: str = Field(regex=r"(?i)^MAX$|^MAX[\s]*-[\s]*[\d]+$|^[\d]+$")
+    matrix_cache_max_mb: Optional[float] = Field(default=None, gt=0)
+    matrix_cache_spill_path: Optional[str] = Field(default=None)
+    matrix_cache_write_back: Optional[bool] = Field(default=False)
+    matrix_dtype: Optional[Literal["float64", "float32"]] = Field(default="float64")
 
 
 @dataclass(frozen=True)
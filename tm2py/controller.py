@@ -20,6 +20,7 @@ from typing import Union, List
 
 from tm2py.config import Configuration
 from tm2py.emme.manager import EmmeManager
+from tm2py.emme.matrix import OMXReadCache
 from tm2py.logger import Logger
 from tm2py.components.component import Component
 from tm2py.components.network.highway.highway_assign import HighwayAssignment
@@ -50,10 +51,13 @@ class RunController:
         top_sheet: placeholder for top sheet functionality (not implemented yet)
         trace: placeholder for trace functionality (not implemented yet)
         run_dir: root run directory for the model run
+        config_files: list of the config file paths for the model run
         iteration: current running (or last started) iteration
         component: current running (or last started) Component object
         emme_manager: EmmeManager object for centralized Emme-related (highway and
             transit assignments and skims) utilities.
+        omx_read_cache: OMXReadCache object shared by components to read OMX
+            files (e.g. demand) for the model run
         complete_components: list of components which have completed, tuple of
             (iteration, name, Component object)
     """
@@ -64,6 +68,7 @@ class RunController:
         if run_dir is None:
             run_dir = os.path.abspath(os.path.dirname(config_file[0]))
         self._run_dir = run_dir
+        self._config_files = [os.path.abspath(path) for path in config_file]
 
         self.config = Configuration.load_toml(config_file)
         self.logger = Logger(self)
@@ -74,6 +79,7 @@ class RunController:
         # mapping from defined names referenced in config to Component objects
         self._component_map = {k: v(self) for k, v in component_cls_map.items()}
         self._emme_manager = None
+        self._omx_read_cache = None
         self._iteration = None
         self._component = None
         self._queued_components = []
@@ -84,6 +90,11 @@ class RunController:
         """The root run directory of the model run"""
         return self._run_dir
 
+    @property
+    def config_files(self) -> List[str]:
+        """The config file paths of the model run"""
+        return self._config_files
+
     @property
     def iteration(self) -> int:
         """Current iteration of model"""
@@ -101,6 +112,16 @@ class RunController:
             self._init_emme_manager()
         return self._emme_manager
 
+    @property
+    def omx_read_cache(self) -> OMXReadCache:
+        """Cached OMX files and arrays shared across the model run"""
+        if self._omx_read_cache is None:
+            max_mb = self.config.run.omx_read_cache_max_mb
+            self._omx_read_cache = OMXReadCache(
+                max_bytes=None if max_mb is None else int(max_mb * 2**20)
+            )
+        return self._omx_read_cache
+
     def _init_emme_manager(self):
         """Initialize Emme manager, start Emme desktop App, and initialize Modeller"""
         self._emme_manager = EmmeManager()
@@ -68,6 +68,24 @@ class EmmeManager:
         emp_path = _app.create_project(project_dir, name)
         return self.project(emp_path)
 
+    def create_database_project(
+        self, project_dir: str, name: str, emmebank_path: str
+    ) -> EmmeDesktopApp:
+        """Create and open an Emme project with the Emmebank as its open database.
+
+        Args:
+            project_dir: path to Emme root directory for new Emme project
+            name: name for the Emme project
+            emmebank_path: path to the Emmebank file to add to the project
+
+        Returns:
+            Emme Desktop App object, see Emme API Reference, Desktop section for details.
+        """
+        emme_project = self.create_project(project_dir, name)
+        database = emme_project.data_explorer().add_database(emmebank_path)
+        database.open()
+        return emme_project
+
     def project(self, project_path: str) -> EmmeDesktopApp:
         """Return already open Emme project, or open new Desktop session if not found.
 
@@ -1,37 +1,128 @@
 """Module for Emme-related matrix management.
 
-Contains the MatrixCache class for write through matrix data management of Emme
-matrices (in Emmebank) to avoid repeated read-from-disk of skim matrices
-during post-assignment processing and export to OMX.
+Contains the MatrixCache class for write through (or write back) matrix data
+management of Emme matrices (in Emmebank) to avoid repeated read-from-disk of
+skim matrices during post-assignment processing and export to OMX, with
+optional memory budget (least recently used eviction) and spill of evicted
+matrices to memory mapped files.
 
 Contains the OMXManager which is a thin wrapper on the openmatrix (OMX)
 library for transfer between Emme (emmebank) <-> OMX files. Integrates with
 the MatrixCache to support easy write from Emmebank without re-reading data
 from disk.
+
+The OMXReadCache is a shared cache of open OMX files and arrays read, for
+use across components within a model run. The ZoneMapping maps matrix data
+between zone systems (e.g. from OMX to the Emme scenario).
+
+Both MatrixCache and OMXManager support a dtype to store / write the matrix
+data in reduced precision (e.g. float32), and the omx_precision_report
+function compares the matrices in two OMX files to check the differences
+against the full (float64) data.
+
+The OMXManager HDF5 compression filter and chunk shape (number of rows per
+chunk) are configurable, the benchmark_omx_settings function compares the
+write / read times and file sizes of these settings for a zone system size.
+
+The BackgroundOMXWriter writes OMX files from Numpy arrays in a background
+thread, with a limit on the number of files pending, such that the export
+overlaps with the next processing step.
 """
 
-from typing import List, Union, Dict
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager as _context
+import os
+import tempfile
+import time as _time
+from typing import List, Union, Dict, Tuple, TYPE_CHECKING
 
+import numpy as np
 from numpy import array as NumpyArray, resize
 import openmatrix as _omx
+import tables
 
 from tm2py.emme.manager import EmmeScenario, EmmeMatrix
 
+if TYPE_CHECKING:
+    from tm2py.logger import Logger
+
 
 class MatrixCache:
     """Write through cache of Emme matrix data via Numpy arrays
 
+    If max_bytes is specified the least recently used matrices are evicted
+    from the cache to keep the total size of the cached arrays within the
+    budget. Matrices can be pinned (see pinned) to exclude them from eviction
+    while in use. Counts of cache hits, misses and evictions are kept in
+    stats, and are reported via the logger (if specified) on clear.
+
+    If spill_dir is specified evicted matrices are saved to .npy files in
+    this directory and returned as (copy on write) memory mapped arrays
+    instead of re-reading from the Emmebank. Spilled files are invalidated
+    by the matrix timestamp, the same as the in-memory data, and are deleted
+    on clear.
+
+    If write_back is True set_data keeps the data in the cache only, and the
+    changed (dirty) matrices are written to the Emmebank on flush, or when
+    evicted. Dirty matrices must be flushed before the Emmebank data is used
+    outside of the cache (e.g. by an Emme tool), and clear discards unflushed
+    data. A dirty matrix which is changed in the Emmebank is an error.
+
     Args:
         scenario: reference scenario for the active Emmebank and matrix zone system
+        max_bytes: optional, max total size of the cached arrays in bytes,
+            default no limit
+        logger: optional, Logger object to report the cache statistics
+        spill_dir: optional, directory for spilled matrix files, default
+            no spill (evicted matrices are re-read from the Emmebank)
+        write_back: optional, default False, defer writing set_data to the
+            Emmebank until flush
+        dtype: optional, Numpy dtype to store the matrix data in the cache,
+            default as returned from the Emmebank
     """
 
-    def __init__(self, scenario: EmmeScenario):
+    def __init__(
+        self,
+        scenario: EmmeScenario,
+        max_bytes: int = None,
+        logger: "Logger" = None,
+        spill_dir: str = None,
+        write_back: bool = False,
+        dtype: str = None,
+    ):  # pylint: disable=R0913
         self._scenario = scenario
         self._emmebank = scenario.emmebank
+        self._max_bytes = max_bytes
+        self._logger = logger
+        self._spill_dir = spill_dir
+        self._write_back = write_back
+        self._dtype = dtype
         # mapping from matrix object to last read/write timestamp for cache invalidation
         self._timestamps = {}
         # cache of Emme matrix data, key: matrix object, value: numpy array of data
-        self._data = {}
+        # in least recently used order
+        self._data = OrderedDict()
+        # mapping from matrix object to pin count, pinned matrices are not evicted
+        self._pins = {}
+        self._num_bytes = 0
+        # mapping from matrix object to (file path, timestamp) of spilled data
+        self._spilled = {}
+        self._num_spill_files = 0
+        # matrices with data set in the cache and not yet written to the Emmebank
+        self._dirty = set()
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "spill_hits": 0,
+            "writes": 0,
+        }
+
+    @property
+    def num_bytes(self) -> int:
+        """Total size of the cached arrays in bytes."""
+        return self._num_bytes
 
     def get_data(self, matrix: Union[str, EmmeMatrix]) -> NumpyArray:
         """Get Emme matrix data as numpy array.
@@ -42,32 +133,176 @@ class MatrixCache:
         Returns:
             The Numpy array of values for this matrix / matrix ID.
         """
-        if isinstance(matrix, str):
-            matrix = self._emmebank.matrix(matrix)
+        matrix = self._get_matrix(matrix)
         timestamp = matrix.timestamp
         prev_timestamp = self._timestamps.get(matrix)
-        if prev_timestamp is None or (timestamp != prev_timestamp):
-            self._timestamps[matrix] = matrix.timestamp
-            self._data[matrix] = matrix.get_numpy_data(self._scenario.id)
-        return self._data[matrix]
+        if matrix in self._dirty and timestamp != prev_timestamp:
+            raise Exception(
+                f"matrix {matrix.name} changed in Emmebank with unflushed cache data"
+            )
+        if matrix in self._data and timestamp == prev_timestamp:
+            self.stats["hits"] += 1
+            self._data.move_to_end(matrix)
+            return self._data[matrix]
+        spill_path, spill_timestamp = self._spilled.get(matrix, (None, None))
+        if spill_path is not None and timestamp == spill_timestamp:
+            self.stats["spill_hits"] += 1
+            # copy on write, in-place changes are not saved to the file
+            return np.load(spill_path, mmap_mode="c")
+        self.stats["misses"] += 1
+        data = matrix.get_numpy_data(self._scenario.id)
+        if self._dtype is not None:
+            data = data.astype(self._dtype, copy=False)
+        self._add(matrix, data)
+        return data
 
     def set_data(self, matrix: Union[str, EmmeMatrix], data: NumpyArray):
-        """Set numpy array to Emme matrix (write through cache).
+        """Set numpy array to Emme matrix (write through, or write back, cache).
 
         Args:
             matrix: Emme matrix object or unique name / ID for Emme matrix in Emmebank
             data: Numpy array, must match the scenario zone system
         """
+        matrix = self._get_matrix(matrix)
+        if self._dtype is not None:
+            data = data.astype(self._dtype, copy=False)
+        if self._write_back:
+            if matrix in self._dirty and matrix.timestamp != self._timestamps[matrix]:
+                raise Exception(
+                    f"matrix {matrix.name} changed in Emmebank with unflushed cache data"
+                )
+            self._add(matrix, data)
+            self._dirty.add(matrix)
+        else:
+            self._write(matrix, data)
+            self._add(matrix, data)
+
+    def flush(self):
+        """Write the data for all dirty matrices to the Emmebank."""
+        for matrix in list(self._dirty):
+            self._write(matrix, self._data[matrix])
+            self._timestamps[matrix] = matrix.timestamp
+
+    @_context
+    def pinned(self, *matrices: Union[str, EmmeMatrix]):
+        """Pin the matrices in the cache (exclude from eviction) within the with block.
+
+        Args:
+            matrices: Emme matrix objects or unique names / IDs for Emme matrices
+                in Emmebank
+        """
+        matrices = [self._get_matrix(matrix) for matrix in matrices]
+        for matrix in matrices:
+            self._pins[matrix] = self._pins.get(matrix, 0) + 1
+        try:
+            yield
+        finally:
+            for matrix in matrices:
+                self._pins[matrix] -= 1
+                if self._pins[matrix] == 0:
+                    del self._pins[matrix]
+            self._evict()
+
+    def clear(self):
+        """Clear the cache and delete spilled matrix files.
+
+        Data for dirty matrices is discarded, use flush first to save.
+        """
+        self.log_stats()
+        for matrix in list(self._spilled):
+            self._remove_spilled(matrix)
+        self._dirty = set()
+        self._timestamps = {}
+        self._data = OrderedDict()
+        self._pins = {}
+        self._num_bytes = 0
+
+    def log_stats(self, level: str = "DEBUG"):
+        """Report the cache hits, misses and evictions via the logger (if any).
+
+        Args:
+            level: logging level for the message
+        """
+        if self._logger is None:
+            return
+        self._logger.log(
+            f"Matrix cache: {self.stats['hits']} hits, {self.stats['misses']} misses, "
+            f"{self.stats['evictions']} evictions, {self.stats['writes']} writes, "
+            f"{len(self._data)} matrices {self._num_bytes / 2**20:.1f} MB cached",
+            level=level,
+        )
+        if self._spill_dir is not None:
+            self._logger.log(
+                f"Matrix cache: {self.stats['spill_hits']} spill hits, "
+                f"{len(self._spilled)} matrices spilled to {self._spill_dir}",
+                level=level,
+            )
+
+    def _get_matrix(self, matrix: Union[str, EmmeMatrix]) -> EmmeMatrix:
         if isinstance(matrix, str):
             matrix = self._emmebank.matrix(matrix)
+        return matrix
+
+    def _write(self, matrix: EmmeMatrix, data: NumpyArray):
+        """Write the data to the Emmebank."""
         matrix.set_numpy_data(data, self._scenario.id)
+        self._dirty.discard(matrix)
+        self.stats["writes"] += 1
+
+    def _add(self, matrix: EmmeMatrix, data: NumpyArray):
+        """Add (or replace) the matrix data as the most recently used entry."""
+        self._remove(matrix)
+        self._remove_spilled(matrix)
         self._timestamps[matrix] = matrix.timestamp
         self._data[matrix] = data
+        self._num_bytes += data.nbytes
+        self._evict(keep=matrix)
+
+    def _remove(self, matrix: EmmeMatrix):
+        data = self._data.pop(matrix, None)
+        if data is not None:
+            self._num_bytes -= data.nbytes
+        self._timestamps.pop(matrix, None)
+
+    def _evict(self, keep: EmmeMatrix = None):
+        """Evict least recently used, unpinned matrices until within max_bytes."""
+        if self._max_bytes is None or self._num_bytes <= self._max_bytes:
+            return
+        for matrix in list(self._data):
+            if self._num_bytes <= self._max_bytes:
+                break
+            if matrix is keep or matrix in self._pins:
+                continue
+            if matrix in self._dirty:
+                self._write(matrix, self._data[matrix])
+                self._timestamps[matrix] = matrix.timestamp
+            if self._spill_dir is not None:
+                self._spill(matrix)
+            self._remove(matrix)
+            self.stats["evictions"] += 1
+
+    def _spill(self, matrix: EmmeMatrix):
+        """Save the matrix data to file, if not already saved for this timestamp."""
+        timestamp = self._timestamps[matrix]
+        if self._spilled.get(matrix, (None, None))[1] == timestamp:
+            return
+        self._remove_spilled(matrix)
+        # new file name for each spill, as a previous file may still be mapped
+        self._num_spill_files += 1
+        file_path = os.path.join(
+            self._spill_dir, f"matrix_cache_{self._num_spill_files}.npy"
+        )
+        np.save(file_path, self._data[matrix])
+        self._spilled[matrix] = (file_path, timestamp)
 
-    def clear(self):
-        """Clear the cache."""
-        self._timestamps = {}
-        self._data = {}
+    def _remove_spilled(self, matrix: EmmeMatrix):
+        file_path, _ = self._spilled.pop(matrix, (None, None))
+        if file_path is not None:
+            try:
+                os.remove(file_path)
+            except OSError:
+                # file is still mapped (on Windows), left in the spill_dir
+                pass
 
 
 # disable too-many-instance-attributes recommendation
@@ -89,6 +324,20 @@ class OMXManager:
             from cache (instead of always reading from Emmmebank)
         mask_max_value: optional, max value above which to write
             zero instead ("big to zero" behavior)
+        dtype: optional, Numpy dtype to write and read the matrix data,
+            default write float64 and read as stored in the file
+        complib: optional, HDF5 compression library for written matrices,
+            e.g. "zlib", "blosc:lz4", "blosc:zstd", default the OMX file
+            default (zlib level 1). Note that blosc may not be readable
+            outside of PyTables.
+        complevel: optional, compression level 0 (none) to 9, default 1
+            if complib is specified
+        chunk_rows: optional, default 1, number of rows in each HDF5 chunk
+            for written matrices; row chunks suit reading rows (origins),
+            more rows per chunk improves compression for full matrix reads
+        zone_numbers: optional, the zone numbers to write as the
+            "zone_number" mapping (in "a" or "w" mode), default the
+            scenario zone numbers
     """
 
     def __init__(
@@ -99,12 +348,26 @@ class OMXManager:
         omx_key: str = "NAME",
         matrix_cache: MatrixCache = None,
         mask_max_value: float = None,
+        dtype: str = None,
+        complib: str = None,
+        complevel: int = None,
+        chunk_rows: int = 1,
+        zone_numbers: List[int] = None,
     ):  # pylint: disable=R0913
         self._file_path = file_path
         self._mode = mode
         self._scenario = scenario
+        self._zone_numbers = zone_numbers
         self._omx_key = omx_key
         self._mask_max_value = mask_max_value
+        self._dtype = dtype
+        self._filters = None
+        if complib is not None or complevel is not None:
+            self._filters = tables.Filters(
+                complevel=1 if complevel is None else complevel,
+                complib=complib or "zlib",
+            )
+        self._chunk_rows = chunk_rows
         self._omx_file = None
         self._emme_matrix_cache = matrix_cache
         self._read_cache = {}
@@ -131,11 +394,12 @@ class OMXManager:
 
     def __enter__(self):
         self.open()
-        if self._mode in ["a", "w"] and self._scenario is not None:
+        zone_numbers = self._zone_numbers
+        if zone_numbers is None and self._scenario is not None:
+            zone_numbers = self._scenario.zone_numbers
+        if self._mode in ["a", "w"] and zone_numbers is not None:
             try:
-                self._omx_file.create_mapping(
-                    "zone_number", self._scenario.zone_numbers
-                )
+                self._omx_file.create_mapping("zone_number", zone_numbers)
             except LookupError:
                 pass
         return self
@@ -210,7 +474,11 @@ class OMXManager:
         self.write_array(numpy_array, name, attrs)
 
     def write_array(
-        self, numpy_array: NumpyArray, name: str, attrs: Dict[str, str] = None
+        self,
+        numpy_array: NumpyArray,
+        name: str,
+        attrs: Dict[str, str] = None,
+        dtype: str = None,
     ):
         """Write array with name and optional attrs to OMX file.
 
@@ -218,19 +486,28 @@ class OMXManager:
             numpy_array:: Numpy array
             name: name to use for the OMX key
             attrs: additional attribute key value pairs to write to OMX file
+            dtype: optional, Numpy dtype to write for this array, default
+                the dtype of the OMXManager (or float64)
         """
         if self._mode not in ["a", "w"]:
             raise Exception(f"{self._file_path}: open in read-only mode")
         shape = numpy_array.shape
         if len(shape) == 2:
-            chunkshape = (1, shape[0])
+            # single column (ORIGIN matrix) as one chunk
+            rows = shape[0] if shape[1] == 1 else min(self._chunk_rows, shape[0])
+            chunkshape = (rows, shape[1])
         else:
             chunkshape = None
         if self._mask_max_value:
             numpy_array[numpy_array > self._mask_max_value] = 0
-        numpy_array = numpy_array.astype(dtype="float64", copy=False)
+        dtype = dtype or self._dtype or "float64"
+        numpy_array = numpy_array.astype(dtype=dtype, copy=False)
         self._omx_file.create_matrix(
-            name, obj=numpy_array, chunkshape=chunkshape, attrs=attrs
+            name,
+            obj=numpy_array,
+            filters=self._filters,
+            chunkshape=chunkshape,
+            attrs=attrs,
         )
 
     def read(self, name: str) -> NumpyArray:
@@ -247,9 +524,38 @@ class OMXManager:
         if name in self._read_cache:
             return self._read_cache[name]
         data = self._omx_file[name].read()
+        if self._dtype is not None:
+            data = data.astype(self._dtype, copy=False)
         self._read_cache[name] = data
         return data
 
+    def read_rows(self, name: str, start: int, stop: int = None) -> NumpyArray:
+        """Read a block of rows of OMX data as numpy array (not cached).
+
+        Args:
+            name: name of OMX matrix
+            start: first row to read
+            stop: optional, row to stop reading (exclusive), default to the
+                last row
+
+        Returns:
+            Numpy array of the rows from OMX file
+        """
+        data = self._omx_file[name][start:stop]
+        if self._dtype is not None:
+            data = data.astype(self._dtype, copy=False)
+        return data
+
+    def list_matrices(self) -> List[str]:
+        """Return the list of the matrix names in the OMX file."""
+        return self._omx_file.list_matrices()
+
+    def zone_numbers(self) -> NumpyArray:
+        """Return the zone numbers from the zone_number mapping, None if not found."""
+        if "zone_number" not in self._omx_file.list_mappings():
+            return None
+        return np.asarray(self._omx_file.map_entries("zone_number"))
+
     def read_hdf5(self, path: str) -> NumpyArray:
         """Read data directly from PyTables interface.
 
@@ -262,3 +568,392 @@ class OMXManager:
             Numpy array from OMX file
         """
         return self._omx_file.get_node(path).read()
+
+
+class ZoneMapping:
+    """Mapping of (square) matrix data from a source to a target zone system.
+
+    The index arrays are computed once for the pair of zone systems. If the
+    source zones are the leading zones of the target (in the same order),
+    including the same zone system, the index is slices, and the mapped
+    data is a view (identical zones) or the data added to the top left of
+    the target. Otherwise the data is scattered to the target positions.
+
+    Args:
+        source_zones: zone numbers of the source data (e.g. OMX zone_number
+            mapping)
+        target_zones: zone numbers of the target (e.g. scenario.zone_numbers)
+    """
+
+    def __init__(self, source_zones: NumpyArray, target_zones: NumpyArray):
+        source_zones = np.asarray(source_zones)
+        target_zones = np.asarray(target_zones)
+        self.num_source = len(source_zones)
+        self.num_target = len(target_zones)
+        if self.num_source <= self.num_target and np.array_equal(
+            source_zones, target_zones[: self.num_source]
+        ):
+            self.index = (slice(0, self.num_source), slice(0, self.num_source))
+            return
+        order = np.argsort(target_zones)
+        positions = np.searchsorted(target_zones, source_zones, sorter=order)
+        positions = order[positions.clip(max=self.num_target - 1)]
+        missing = target_zones[positions] != source_zones
+        if missing.any():
+            raise Exception(
+                f"{missing.sum()} zones not in the target zone system, "
+                f"e.g. {source_zones[missing][:5].tolist()}"
+            )
+        self.index = np.ix_(positions, positions)
+
+    @property
+    def is_identity(self) -> bool:
+        """True if the source and target zone systems are the same."""
+        return isinstance(self.index[0], slice) and self.num_source == self.num_target
+
+    def check_shape(self, data: NumpyArray):
+        """Raise if the data shape does not match the source zone system."""
+        if data.shape != (self.num_source, self.num_source):
+            raise Exception(
+                f"matrix shape {data.shape} does not match the "
+                f"{self.num_source} source zones"
+            )
+
+    def apply(self, data: NumpyArray) -> NumpyArray:
+        """Return the data in the target zone system.
+
+        Args:
+            data: matrix in the source zone system
+
+        Returns:
+            The data (no copy) if the zone systems are the same, otherwise a new
+            array with zeros for the target zones not in the source
+        """
+        self.check_shape(data)
+        if self.is_identity:
+            return data
+        target = np.zeros((self.num_target, self.num_target), dtype=data.dtype)
+        target[self.index] = data
+        return target
+
+
+class BackgroundOMXWriter:
+    """Write OMX files from Numpy arrays in a background thread.
+
+    The files are written one at a time in the order submitted. If
+    max_pending files are already queued (or being written) submit waits
+    for the oldest to complete, which caps the memory held by the queued
+    arrays. Errors from the writer are raised on the next submit or on
+    close. Also supports with statement (close on exit).
+
+    The arrays must not be modified after they are submitted.
+
+    Args:
+        max_pending: optional, default 1, max number of files queued or
+            being written
+    """
+
+    def __init__(self, max_pending: int = 1):
+        self._max_pending = max(1, max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._pending = deque()
+
+    def submit(
+        self,
+        file_path: str,
+        arrays: Dict[str, Tuple[NumpyArray, Dict[str, str]]],
+        **omx_args,
+    ):
+        """Queue the arrays to write to a new OMX file.
+
+        Args:
+            file_path: path of OMX file, replaced if it exists
+            arrays: dictionary of OMX key to (array, attrs)
+            omx_args: additional OMXManager arguments, e.g. dtype, complib,
+                complevel, chunk_rows, zone_numbers
+        """
+        while len(self._pending) >= self._max_pending:
+            self._pending.popleft().result()
+        self._pending.append(
+            self._executor.submit(_write_omx_file, file_path, arrays, omx_args)
+        )
+
+    def wait(self):
+        """Wait for all of the queued files to be written."""
+        while self._pending:
+            self._pending.popleft().result()
+
+    def close(self):
+        """Wait for all of the queued files and stop the writer thread."""
+        try:
+            self.wait()
+        finally:
+            self._pending.clear()
+            self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def _write_omx_file(
+    file_path: str,
+    arrays: Dict[str, Tuple[NumpyArray, Dict[str, str]]],
+    omx_args: Dict,
+):
+    """Write the arrays to a new OMX file, see BackgroundOMXWriter.submit."""
+    with OMXManager(file_path, "w", **omx_args) as omx_file:
+        for name, (numpy_array, attrs) in arrays.items():
+            omx_file.write_array(numpy_array, name, attrs)
+
+
+class OMXReadCache:
+    """Shared cache of open OMX files and the arrays read from them.
+
+    Used to avoid re-opening the same OMX file (and re-reading the HDF5
+    metadata) and re-reading the same matrix for different users within a
+    model run. Open files are keyed by (absolute path, modification time)
+    and arrays by (absolute path, modification time, name, dtype), so a file
+    which is re-written is read again. The least recently used files are
+    closed over max_files, and arrays are evicted over max_bytes.
+
+    The returned arrays are shared and set as read-only, copy before
+    modifying in place.
+
+    Args:
+        max_bytes: optional, max total size of the cached arrays in bytes,
+            default no limit
+        max_files: optional, default 8, max number of open OMX files
+    """
+
+    def __init__(self, max_bytes: int = None, max_files: int = 8):
+        self._max_bytes = max_bytes
+        self._max_files = max_files
+        # open OMXManager objects in least recently used order
+        self._files = OrderedDict()
+        # cached arrays in least recently used order
+        self._data = OrderedDict()
+        self._num_bytes = 0
+        # zone numbers from the OMX zone_number mapping by (path, mtime)
+        self._zone_numbers = {}
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "opens": 0}
+
+    def read(self, file_path: str, name: str, dtype: str = None) -> NumpyArray:
+        """Read OMX data as (read-only) numpy array, from the cache if available.
+
+        Args:
+            file_path: path of OMX file
+            name: name of OMX matrix
+            dtype: optional, Numpy dtype for the matrix data, default as stored
+
+        Returns:
+            Numpy array from OMX file
+        """
+        file_path = os.path.abspath(file_path)
+        file_key = (file_path, os.path.getmtime(file_path))
+        key = file_key + (name, dtype)
+        if key in self._data:
+            self.stats["hits"] += 1
+            self._data.move_to_end(key)
+            return self._data[key]
+        self.stats["misses"] += 1
+        data = self._open(file_key).read_rows(name, 0)
+        if dtype is not None:
+            data = data.astype(dtype, copy=False)
+        data.flags.writeable = False
+        self._data[key] = data
+        self._num_bytes += data.nbytes
+        if self._max_bytes is not None:
+            for old_key in list(self._data):
+                if self._num_bytes <= self._max_bytes or old_key == key:
+                    break
+                self._num_bytes -= self._data.pop(old_key).nbytes
+                self.stats["evictions"] += 1
+        return data
+
+    def zone_numbers(self, file_path: str) -> NumpyArray:
+        """Return the zone numbers from the OMX zone_number mapping (cached).
+
+        Args:
+            file_path: path of OMX file
+
+        Returns:
+            Numpy array of zone numbers, None if the file has no zone_number
+            mapping
+        """
+        file_path = os.path.abspath(file_path)
+        file_key = (file_path, os.path.getmtime(file_path))
+        if file_key not in self._zone_numbers:
+            self._zone_numbers[file_key] = self._open(file_key).zone_numbers()
+        return self._zone_numbers[file_key]
+
+    def close_files(self):
+        """Close the open OMX files (the cached arrays are kept)."""
+        for omx_file in self._files.values():
+            omx_file.close()
+        self._files = OrderedDict()
+
+    def clear(self):
+        """Close the open OMX files and clear the cached arrays."""
+        self.close_files()
+        self._data = OrderedDict()
+        self._num_bytes = 0
+        self._zone_numbers = {}
+
+    def log_stats(self, logger: "Logger", level: str = "DEBUG"):
+        """Report the cache hits, misses, evictions and file opens.
+
+        Args:
+            logger: Logger object
+            level: logging level for the message
+        """
+        logger.log(
+            f"OMX read cache: {self.stats['hits']} hits, {self.stats['misses']} "
+            f"misses, {self.stats['evictions']} evictions, {self.stats['opens']} "
+            f"file opens, {len(self._data)} arrays "
+            f"{self._num_bytes / 2**20:.1f} MB cached",
+            level=level,
+        )
+
+    def _open(self, file_key: Tuple[str, float]) -> OMXManager:
+        """Return the open OMXManager for the file, open if not already open."""
+        if file_key in self._files:
+            self._files.move_to_end(file_key)
+            return self._files[file_key]
+        # close other (older) versions of this file and the least recently used
+        for old_key in list(self._files):
+            if old_key[0] == file_key[0] or len(self._files) >= self._max_files:
+                self._files.pop(old_key).close()
+        omx_file = OMXManager(file_key[0], "r")
+        omx_file.open()
+        self.stats["opens"] += 1
+        self._files[file_key] = omx_file
+        return omx_file
+
+
+def omx_precision_report(
+    reference_path: str, file_path: str
+) -> Dict[str, Dict[str, float]]:
+    """Compare the matrices in an OMX file against a reference OMX file.
+
+    Used to check the error from writing the matrices in reduced precision
+    (e.g. float32) against the same run with float64. Values are compared
+    as float64, the relative error is skipped for zero reference values.
+
+    Args:
+        reference_path: path of the reference (float64) OMX file
+        file_path: path of the OMX file to check, with the same matrix names
+
+    Returns:
+        Dictionary of matrix name to dictionary with the dtype, max_abs_error
+        and max_rel_error
+    """
+    report = {}
+    with OMXManager(reference_path, "r") as reference, OMXManager(
+        file_path, "r"
+    ) as omx_file:
+        for name in reference.list_matrices():
+            ref_data = reference.read(name).astype(np.float64, copy=False)
+            data = omx_file.read(name)
+            error = np.abs(data.astype(np.float64) - ref_data)
+            nonzero = ref_data != 0
+            report[name] = {
+                "dtype": str(data.dtype),
+                "max_abs_error": float(error.max(initial=0.0)),
+                "max_rel_error": float(
+                    (error[nonzero] / np.abs(ref_data[nonzero])).max(initial=0.0)
+                ),
+            }
+    return report
+
+
+# default settings for benchmark_omx_settings: (complib, complevel, chunk_rows)
+_OMX_BENCHMARK_SETTINGS = (
+    ("zlib", 1, 1),
+    ("zlib", 1, 64),
+    ("zlib", 4, 64),
+    ("blosc:lz4", 4, 1),
+    ("blosc:lz4", 4, 64),
+    ("blosc:zstd", 4, 64),
+)
+
+
+def benchmark_omx_settings(
+    num_zones: int,
+    settings: List[Tuple[str, int, int]] = _OMX_BENCHMARK_SETTINGS,
+    dtype: str = "float64",
+    num_matrices: int = 3,
+    row_block: int = 100,
+    seed: int = 0,
+) -> List[Dict[str, Union[str, int, float]]]:
+    """Benchmark the OMX compression and chunk settings for a zone system size.
+
+    Writes num_matrices test skims (distance based, similar in
+    compressibility to real skims) to a temporary OMX file with each
+    setting, then times the full matrix reads and the reads in blocks of
+    rows (e.g. by origin in downstream models).
+
+    Args:
+        num_zones: number of zones
+        settings: list of (complib, complevel, chunk_rows) to compare
+        dtype: Numpy dtype to write the matrices
+        num_matrices: number of matrices to write and read
+        row_block: number of rows per read for the row block read times
+        seed: random seed for the test zone coordinates
+
+    Returns:
+        List of result dictionaries, with the setting, file_size (bytes),
+        write_time, read_time, read_rows_time and total_time (seconds),
+        sorted by total_time (best setting first)
+    """
+    rng = np.random.default_rng(seed)
+    coords = rng.uniform(0, 50, (num_zones, 2))
+    diff = coords[:, np.newaxis, :] - coords[np.newaxis, :, :]
+    dist = np.hypot(diff[..., 0], diff[..., 1])
+    matrices = {
+        f"skim_{i}": (dist * (1 + 0.5 * i)).round(2) for i in range(num_matrices)
+    }
+    results = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for complib, complevel, chunk_rows in settings:
+            file_path = os.path.join(
+                temp_dir, f"{complib}_{complevel}_{chunk_rows}.omx"
+            )
+            start = _time.perf_counter()
+            with OMXManager(
+                file_path,
+                "w",
+                dtype=dtype,
+                complib=complib,
+                complevel=complevel,
+                chunk_rows=chunk_rows,
+            ) as omx_file:
+                for name, data in matrices.items():
+                    omx_file.write_array(data, name)
+            write_time = _time.perf_counter() - start
+            start = _time.perf_counter()
+            with OMXManager(file_path, "r") as omx_file:
+                for name in matrices:
+                    omx_file.read(name)
+            read_time = _time.perf_counter() - start
+            start = _time.perf_counter()
+            with OMXManager(file_path, "r") as omx_file:
+                for name in matrices:
+                    for row in range(0, num_zones, row_block):
+                        omx_file.read_rows(name, row, row + row_block)
+            read_rows_time = _time.perf_counter() - start
+            results.append(
+                {
+                    "complib": complib,
+                    "complevel": complevel,
+                    "chunk_rows": chunk_rows,
+                    "file_size": os.path.getsize(file_path),
+                    "write_time": write_time,
+                    "read_time": read_time,
+                    "read_rows_time": read_rows_time,
+                    "total_time": write_time + read_time + read_rows_time,
+                }
+            )
+    return sorted(results, key=lambda result: result["total_time"])
@@ -1,14 +1,19 @@
 """Module for Emme network calculations.
 
 Contains NetworkCalculator class to generate Emme format specifications for
-the Network calculator."""
+the Network calculator, and the get_attribute_arrays / set_attribute_arrays
+functions for columnar (Numpy) access to network attribute values."""
 
-from typing import Union, Dict, List
+from typing import Any, Union, Dict, List, Tuple
+
+import numpy as np
 
 import tm2py.emme.manager as _manager
 
 EmmeScenario = _manager.EmmeScenario
+EmmeNetwork = _manager.EmmeNetwork
 EmmeNetworkCalcSpecification = Dict[str, Union[str, Dict[str, str]]]
+NumpyArray = np.array
 
 
 class NetworkCalculator:
@@ -107,3 +112,85 @@ class NetworkCalculator:
         else:
             spec["selections"] = {"link": "all"}
         return spec
+
+
+def get_attribute_arrays(
+    src: Union[EmmeScenario, EmmeNetwork], domain: str, names: List[str]
+) -> Tuple[Any, Dict[str, NumpyArray]]:
+    """Read attribute values from Emme scenario or network as Numpy arrays.
+
+    Wrapper for get_attribute_values which loads all of the attributes in one
+    call and converts the values to float64 arrays, indexed in the Emme
+    element order.
+
+    Args:
+        src: source Emme scenario or network to load values from
+        domain: attribute domain, one of "NODE", "LINK", "TURN", "TRANSIT_LINE",
+            "TRANSIT_SEGMENT"
+        names: names of the attributes to load
+
+    Returns:
+        The Emme element index (used to save values back with
+        set_attribute_arrays) and a dictionary of attribute name to array
+        of values.
+    """
+    values = src.get_attribute_values(domain, names)
+    arrays = {
+        name: np.array(attr_values, dtype=np.float64)
+        for name, attr_values in zip(names, values[1:])
+    }
+    return values[0], arrays
+
+
+def set_attribute_arrays(
+    dst: Union[EmmeScenario, EmmeNetwork],
+    domain: str,
+    index: Any,
+    arrays: Dict[str, NumpyArray],
+):
+    """Save Numpy arrays of attribute values to Emme scenario or network.
+
+    Writes all of the attributes in one set_attribute_values call.
+
+    Args:
+        dst: destination Emme scenario or network to save values to
+        domain: attribute domain, one of "NODE", "LINK", "TURN", "TRANSIT_LINE",
+            "TRANSIT_SEGMENT"
+        index: the Emme element index as returned from get_attribute_arrays
+        arrays: dictionary of attribute name to array of values
+    """
+    names = list(arrays.keys())
+    dst.set_attribute_values(domain, names, [index] + [arrays[n] for n in names])
+
+
+def node_index_ids(index: Dict[int, int]) -> NumpyArray:
+    """Return the array of node IDs in the order of the Emme node index.
+
+    Args:
+        index: the NODE domain element index from get_attribute_arrays,
+            mapping of node ID to position
+    """
+    node_ids = np.zeros(len(index), dtype=np.int64)
+    node_ids[np.fromiter(index.values(), dtype=np.int64, count=len(index))] = (
+        np.fromiter(index.keys(), dtype=np.int64, count=len(index))
+    )
+    return node_ids
+
+
+def link_index_ids(index: Dict[int, Dict[int, int]]) -> Tuple[NumpyArray, NumpyArray]:
+    """Return the arrays of link i-node and j-node IDs in the order of the Emme link index.
+
+    Args:
+        index: the LINK domain element index from get_attribute_arrays,
+            mapping of i-node ID to mapping of j-node ID to position
+    """
+    num_links = sum(len(j_index) for j_index in index.values())
+    i_node_ids = np.zeros(num_links, dtype=np.int64)
+    j_node_ids = np.zeros(num_links, dtype=np.int64)
+    for i_node_id, j_index in index.items():
+        positions = np.fromiter(j_index.values(), dtype=np.int64, count=len(j_index))
+        i_node_ids[positions] = i_node_id
+        j_node_ids[positions] = np.fromiter(
+            j_index.keys(), dtype=np.int64, count=len(j_index)
+        )
+    return i_node_ids, j_node_ids
@@ -0,0 +1,172 @@
+"""Module for reading Emme shortest path files.
+
+Contains the PathFile class for memory mapped access to the binary path
+file (.ebp) output from the Emme shortest path tool
+(inro.emme.network_calculation.shortest_path), and the read_text_paths
+function for streaming the text format path file in blocks. See the Emme
+tool help for details on the formats.
+
+The binary file is:
+    header: 4 x 64-bit unsigned integers, the last two are the number of
+        roots and the number of leaves
+    path index: (roots x leaves + 1) x 64-bit unsigned integers, the start
+        position of the path for each root, leaf pair in the node stream,
+        the path ends at the start of the next pair
+    node stream: 32-bit unsigned integer node IDs for all paths, from
+        root to leaf
+
+The roots and leaves are in ascending order of node ID.
+
+The text file is one line per path, the sequence of node IDs from root to
+leaf separated by whitespace.
+"""
+
+import os
+from typing import Iterator, Tuple
+
+import numpy as np
+
+from tm2py.components.network.highway.highway_graph import concat_ranges
+
+NumpyArray = np.array
+
+_HEADER_SIZE = 4
+# bytes to read per block from the text path file
+_TEXT_BLOCK_SIZE = 2**26
+
+
+class PathFile:
+    """Memory mapped access to the Emme binary shortest path file.
+
+    The header, path_index and nodes arrays are read only views of the file,
+    (no copy), and are only valid while the file is open.
+
+    Args:
+        file_path: path to the .ebp file
+    """
+
+    def __init__(self, file_path: str):
+        self._file_path = file_path
+        self.header = None
+        self.path_index = None
+        self.nodes = None
+
+    def open(self):
+        """Open the file and map the header, path index and node stream."""
+        self.header = np.memmap(
+            self._file_path, dtype=np.uint64, mode="r", shape=(_HEADER_SIZE,)
+        )
+        num_paths = self.num_roots * self.num_leaves + 1
+        self.path_index = np.memmap(
+            self._file_path,
+            dtype=np.uint64,
+            mode="r",
+            offset=_HEADER_SIZE * 8,
+            shape=(num_paths,),
+        )
+        offset = (_HEADER_SIZE + num_paths) * 8
+        num_nodes = (os.path.getsize(self._file_path) - offset) // 4
+        if num_nodes > 0:
+            self.nodes = np.memmap(
+                self._file_path,
+                dtype=np.uint32,
+                mode="r",
+                offset=offset,
+                shape=(num_nodes,),
+            )
+        else:  # no paths found, cannot map zero length
+            self.nodes = np.zeros(0, dtype=np.uint32)
+
+    def close(self):
+        """Close the file (release the memory maps)."""
+        self.header = None
+        self.path_index = None
+        self.nodes = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def num_roots(self) -> int:
+        """Number of roots (origins) in the path file."""
+        return int(self.header[2])
+
+    @property
+    def num_leaves(self) -> int:
+        """Number of leaves (destinations) in the path file."""
+        return int(self.header[3])
+
+    def path_slices(
+        self, root_index: NumpyArray, leaf_index: NumpyArray
+    ) -> Tuple[NumpyArray, NumpyArray]:
+        """Return the start and end positions in the node stream for the paths.
+
+        Args:
+            root_index: position of each path root in the sorted roots
+            leaf_index: position of each path leaf in the sorted leaves
+
+        Returns:
+            Two arrays: start, end; start == end if there is no path
+        """
+        index = np.asarray(root_index, dtype=np.int64) * self.num_leaves + np.asarray(
+            leaf_index, dtype=np.int64
+        )
+        start = self.path_index[index].astype(np.int64)
+        end = self.path_index[index + 1].astype(np.int64)
+        return start, end
+
+    def path_nodes(self, start: NumpyArray, end: NumpyArray) -> NumpyArray:
+        """Return the concatenated node IDs of the paths (as a copy).
+
+        Args:
+            start: start positions of the paths in the node stream
+            end: end positions of the paths in the node stream
+        """
+        positions = concat_ranges(start, end - start)
+        return self.nodes[positions].astype(np.int64)
+
+
+def read_text_paths(
+    file_path: str, block_size: int = _TEXT_BLOCK_SIZE
+) -> Iterator[Tuple[NumpyArray, NumpyArray]]:
+    """Read the text format path file in blocks of complete lines.
+
+    The integers are parsed in bulk, so the memory used is bounded by the
+    block size rather than the size of the file.
+
+    Args:
+        file_path: path to the text path file
+        block_size: number of bytes to read per block
+
+    Yields:
+        Two arrays for each block: nodes, lengths
+        nodes: concatenated node IDs of all of the paths in the block
+        lengths: number of nodes in each path
+    """
+    remainder = b""
+    with open(file_path, "rb") as paths_file:
+        while True:
+            block = paths_file.read(block_size)
+            if not block:
+                break
+            block = remainder + block
+            last_line_end = block.rfind(b"\n") + 1
+            block, remainder = block[:last_line_end], block[last_line_end:]
+            if block:
+                yield _parse_text_paths(block)
+    if remainder.strip():
+        yield _parse_text_paths(remainder + b"\n")
+
+
+def _parse_text_paths(block: bytes) -> Tuple[NumpyArray, NumpyArray]:
+    """Parse block of complete lines of node IDs to (nodes, lengths) arrays."""
+    # mark end of each path with -1
+    values = np.fromstring(block.replace(b"\n", b" -1 "), dtype=np.int64, sep=" ")
+    path_ends = np.flatnonzero(values == -1)
+    lengths = np.diff(path_ends, prepend=-1) - 1
+    # skip blank lines
+    return values[values != -1], lengths[lengths > 0]
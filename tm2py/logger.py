@@ -1,5 +1,5 @@
-"""Logging module
-"""
+"""Logging module"""
+
 from contextlib import contextmanager as _context
 from datetime import datetime
 import functools
@@ -59,6 +59,16 @@ class Logger:
         self._indentation -= 1
         self.log_time(f"End {msg}", level, indent=True)
 
+    def log_messages(self, messages, prefix: str = ""):
+        """Log the (text, level) messages, e.g. from a BufferedLogger.
+
+        Args:
+            messages: list of (text, level) tuples
+            prefix (str): text to add at the start of each message
+        """
+        for text, level in messages:
+            self.log(f"{prefix}{text}", level)
+
     @_context
     def log_start_end(self, msg: str, level: str = "INFO"):
         """Use with 'with' statement to log the start and end time with message.
@@ -72,6 +82,30 @@ class Logger:
         self.log_end(msg, level)
 
 
+class BufferedLogger(Logger):
+    """Logger which collects the messages, to be logged later by another Logger.
+
+    Used in worker processes, the messages are returned to the parent
+    process and logged in order (see Logger.log_messages).
+
+    Properties:
+        messages: list of (text, level) tuples
+    """
+
+    def __init__(self, controller):
+        super().__init__(controller)
+        self.messages = []
+
+    def log(self, text: str, level: str = "INFO"):
+        """Collect the message text and level.
+
+        Args:
+            text (str): text to log
+            level (str): logging level of the message text
+        """
+        self.messages.append((text, level))
+
+
 # pylint: disable=too-few-public-methods
 
 